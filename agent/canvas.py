@@ -17,15 +17,21 @@ import asyncio
 import base64
 import inspect
 import binascii
+import contextvars
 import json
 import logging
+import os
 import re
+import threading
 import time
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from functools import partial
 from typing import Any, Union, Tuple
 
+import xxhash
+
 from agent.component import component_class
 from agent.component.base import ComponentBase
 from api.db.services.file_service import FileService
@@ -37,6 +43,97 @@ from common.exceptions import TaskCanceledException
 from rag.prompts.generator import chunks_format
 from rag.utils.redis_conn import REDIS_CONN
 
+CANVAS_MAX_WORKERS = int(os.environ.get("CANVAS_MAX_WORKERS", 32))
+# "native" awaits async components on the canvas's event loop; "thread" runs every component
+# in the executor, the async ones each in an event loop of their own.
+CANVAS_EXECUTION_MODE = os.environ.get("CANVAS_EXECUTION_MODE", "native").lower()
+COMPILED_CANVAS_CACHE_SIZE = int(os.environ.get("COMPILED_CANVAS_CACHE_SIZE", 128))
+# Keys of a DSL that change while a session runs; the rest is compiled once per agent version.
+SESSION_STATE_KEYS = ["path", "history", "retrieval", "memory", "globals", "task_id"]
+
+# Shared by all canvases of the process, so that concurrent sessions run a bounded number of threads.
+_thread_pool = ThreadPoolExecutor(max_workers=CANVAS_MAX_WORKERS, thread_name_prefix="canvas")
+
+
+class CompiledCanvas:
+    """
+    The part of a DSL that sessions of one agent version share.
+
+    Component params are parsed and checked once. Each canvas made from it gets
+    its own copies of them, since components keep their inputs and outputs in
+    their params while they run.
+    """
+
+    def __init__(self, dsl: dict, version: str):
+        self.version = version
+        self.dsl = {k: v for k, v in dsl.items() if k not in SESSION_STATE_KEYS}
+        self.components = {}
+        for k, cpn in dsl["components"].items():
+            component_name = cpn["obj"]["component_name"]
+            param = component_class(component_name + "Param")()
+            param.update(cpn["obj"]["params"])
+            try:
+                param.check()
+            except Exception as e:
+                raise ValueError(self.get_component_name(k) + f": {e}")
+            self.components[k] = ({c: v for c, v in cpn.items() if c != "obj"}, component_name, param)
+
+    def get_component_name(self, cid):
+        for n in self.dsl.get("graph", {}).get("nodes", []):
+            if cid == n["id"]:
+                return n["data"]["name"]
+        return ""
+
+    def instantiate(self, canvas) -> dict:
+        components = {}
+        for k, (cpn, component_name, param) in self.components.items():
+            components[k] = deepcopy(cpn)
+            components[k]["obj"] = component_class(component_name)(canvas, k, deepcopy(param))
+        return components
+
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def dsl_version(dsl: dict) -> str:
+    shared = {k: v for k, v in dsl.items() if k not in SESSION_STATE_KEYS}
+    return xxhash.xxh64(json.dumps(shared, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def get_compiled_canvas(agent_id: str, version: str | None) -> CompiledCanvas | None:
+    if not version:
+        return None
+    with _compiled_lock:
+        compiled = _compiled.get((agent_id, version))
+        if compiled is not None:
+            _compiled.move_to_end((agent_id, version))
+        return compiled
+
+
+def compile_canvas(agent_id: str, dsl: dict) -> CompiledCanvas:
+    """Compiles `dsl`, or returns the compiled canvas of an identical DSL of the agent."""
+    version = dsl_version(dsl)
+    compiled = get_compiled_canvas(agent_id, version)
+    if compiled is not None:
+        return compiled
+    compiled = CompiledCanvas(dsl, version)
+    if COMPILED_CANVAS_CACHE_SIZE > 0:
+        with _compiled_lock:
+            _compiled[(agent_id, version)] = compiled
+            while len(_compiled) > COMPILED_CANVAS_CACHE_SIZE:
+                _compiled.popitem(last=False)
+    return compiled
+
+
+def session_state(dsl: dict) -> dict:
+    """The session state kept in a full DSL, for sessions saved before CompiledCanvas."""
+    state = {k: dsl[k] for k in SESSION_STATE_KEYS if k in dsl}
+    for k in ["path", "history", "retrieval"]:
+        state.setdefault(k, [])
+    return state
+
+
 class Graph:
     """
         dsl = {
@@ -78,17 +175,31 @@ class Graph:
         }
         """
 
-    def __init__(self, dsl: str, tenant_id=None, task_id=None):
+    def __init__(self, dsl: str | None, tenant_id=None, task_id=None, compiled: CompiledCanvas | None = None, state: dict | None = None):
+        """
+        Loads `dsl`, or, when `compiled` is given, the compiled DSL with `state`
+        as the session state (see SESSION_STATE_KEYS).
+        """
         self.path = []
         self.components = {}
         self.error = ""
-        self.dsl = json.loads(dsl)
+        self._compiled = compiled
+        if compiled is None:
+            self.dsl = json.loads(dsl)
+        else:
+            self.dsl = {**compiled.dsl, **{k: v for k, v in (state or {}).items() if k in SESSION_STATE_KEYS}}
         self._tenant_id = tenant_id
         self.task_id = task_id if task_id else get_uuid()
-        self._thread_pool = ThreadPoolExecutor(max_workers=5)
+        self._thread_pool = _thread_pool
         self.load()
 
     def load(self):
+        if self._compiled is not None:
+            self.components = self._compiled.instantiate(self)
+            self.dsl["components"] = self.components
+            self.path = self.dsl.setdefault("path", [])
+            return
+
         self.components = self.dsl["components"]
         cpn_nms = set([])
         for k, cpn in self.components.items():
@@ -275,10 +386,22 @@ class Graph:
             return False
         return True
 
+    async def run_blocking(self, func, *args, **kwargs):
+        """
+        `asyncio.to_thread` for components. Called on the canvas's own loop, i.e. by an async
+        component in "native" mode, `func` takes a thread of the shared canvas executor instead
+        of one of the loop's small default executor; elsewhere it is `asyncio.to_thread`.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not getattr(self, "_loop", None):
+            return await asyncio.to_thread(func, *args, **kwargs)
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self._thread_pool, partial(ctx.run, func, *args, **kwargs))
+
 
 class Canvas(Graph):
 
-    def __init__(self, dsl: str, tenant_id=None, task_id=None):
+    def __init__(self, dsl: str | None, tenant_id=None, task_id=None, compiled: CompiledCanvas | None = None, state: dict | None = None):
         self.globals = {
             "sys.query": "",
             "sys.user_id": tenant_id,
@@ -286,7 +409,9 @@ class Canvas(Graph):
             "sys.files": []
         }
         self.variables = {}
-        super().__init__(dsl, tenant_id, task_id)
+        # Where and how long each component of the last run ran; see `_run_batch`.
+        self.component_timings = {}
+        super().__init__(dsl, tenant_id, task_id, compiled, state)
 
     def load(self):
         super().load()
@@ -314,6 +439,17 @@ class Canvas(Graph):
         self.dsl["memory"] = self.memory
         return super().__str__()
 
+    def get_session_state(self) -> dict:
+        """What a session saves after a turn instead of the whole DSL; see CompiledCanvas."""
+        return {
+            "dsl_version": self._compiled.version if self._compiled else None,
+            "path": self.path,
+            "history": self.history,
+            "retrieval": self.retrieval,
+            "memory": self.memory,
+            "globals": self.globals,
+        }
+
     def reset(self, mem=False):
         super().reset()
         if not mem:
@@ -361,6 +497,7 @@ class Canvas(Graph):
         st = time.perf_counter()
         self._loop = asyncio.get_running_loop()
         self.message_id = get_uuid()
+        self.component_timings = {}
         created_at = int(time.time())
         self.add_user_input(kwargs.get("query"))
         for k, cpn in self.components.items():
@@ -422,6 +559,20 @@ class Canvas(Graph):
             def _run_async_in_thread(coro_func, **call_kwargs):
                 return asyncio.run(coro_func(**call_kwargs))
 
+            def _timed(cpn, mode, aw):
+                submitted = time.perf_counter()
+
+                async def _wait():
+                    try:
+                        return await aw
+                    finally:
+                        finished = time.perf_counter()
+                        started = cpn.output("_created_time")
+                        started = started if isinstance(started, float) else submitted
+                        self.component_timings[cpn._id] = {"mode": mode, "queued": started - submitted, "elapsed": finished - started}
+                        logging.debug(f"Canvas {self.task_id}: {cpn._id} ran {mode} in {finished - started:.3f}s after {started - submitted:.3f}s queued")
+                return _wait()
+
             i = f
             while i < t:
                 cpn = self.get_component_obj(self.path[i])
@@ -446,11 +597,19 @@ class Canvas(Graph):
                 if task_fn is None:
                     continue
 
+                if CANVAS_EXECUTION_MODE == "native":
+                    # Coroutines run on this loop; only blocking `_invoke`s take a thread.
+                    if cpn.has_async_invoke():
+                        tasks.append(_timed(cpn, "async", cpn.invoke_async(**(call_kwargs or {}))))
+                    else:
+                        tasks.append(_timed(cpn, "thread", loop.run_in_executor(self._thread_pool, partial(task_fn, **(call_kwargs or {})))))
+                    continue
+
                 invoke_async = getattr(cpn, "invoke_async", None)
                 if invoke_async and asyncio.iscoroutinefunction(invoke_async):
-                    tasks.append(loop.run_in_executor(self._thread_pool, partial(_run_async_in_thread, invoke_async, **(call_kwargs or {}))))
+                    tasks.append(_timed(cpn, "thread", loop.run_in_executor(self._thread_pool, partial(_run_async_in_thread, invoke_async, **(call_kwargs or {})))))
                 else:
-                    tasks.append(loop.run_in_executor(self._thread_pool, partial(task_fn, **(call_kwargs or {}))))
+                    tasks.append(_timed(cpn, "thread", loop.run_in_executor(self._thread_pool, partial(task_fn, **(call_kwargs or {})))))
 
             if tasks:
                 await asyncio.gather(*tasks)
@@ -103,7 +103,7 @@ class Agent(LLM, ToolBase):
                 self.tool_meta.append(mcp_tool_metadata_to_openai_tool(meta))
                 self.tools[tnm] = tool_call_session
         self.callback = partial(self._canvas.tool_use_callback, id)
-        self.toolcall_session = LLMToolPluginCallSession(self.tools, self.callback)
+        self.toolcall_session = LLMToolPluginCallSession(self.tools, self.callback, self._canvas.run_blocking)
         #self.chat_mdl.bind_tools(self.toolcall_session, self.tool_metas)
 
     def _load_tool_obj(self, cpn: dict) -> object:
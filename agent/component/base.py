@@ -430,7 +430,7 @@ class ComponentBase(ABC):
             elif asyncio.iscoroutinefunction(self._invoke):
                 await self._invoke(**kwargs)
             else:
-                await asyncio.to_thread(self._invoke, **kwargs)
+                await self._canvas.run_blocking(self._invoke, **kwargs)
         except Exception as e:
             if self.get_exception_default_value():
                 self.set_exception_default_value()
@@ -441,6 +441,11 @@ class ComponentBase(ABC):
         self.set_output("_elapsed_time", time.perf_counter() - self.output("_created_time"))
         return self.output()
 
+    def has_async_invoke(self) -> bool:
+        """Whether `invoke_async` awaits the work itself rather than handing `_invoke` to a thread."""
+        fn_async = getattr(self, "_invoke_async", None)
+        return bool(fn_async and asyncio.iscoroutinefunction(fn_async)) or asyncio.iscoroutinefunction(self._invoke)
+
     @timeout(int(os.environ.get("COMPONENT_EXEC_TIMEOUT", 10 * 60)))
     def _invoke(self, **kwargs):
         raise NotImplementedError()
@@ -44,9 +44,10 @@ class ToolMeta(TypedDict):
 
 
 class LLMToolPluginCallSession(ToolCallSession):
-    def __init__(self, tools_map: dict[str, object], callback: partial):
+    def __init__(self, tools_map: dict[str, object], callback: partial, run_blocking=asyncio.to_thread):
         self.tools_map = tools_map
         self.callback = callback
+        self.run_blocking = run_blocking
 
     def tool_call(self, name: str, arguments: dict[str, Any]) -> Any:
         return asyncio.run(self.tool_call_async(name, arguments))
@@ -56,12 +57,12 @@ class LLMToolPluginCallSession(ToolCallSession):
         st = timer()
         tool_obj = self.tools_map[name]
         if isinstance(tool_obj, MCPToolCallSession):
-            resp = await asyncio.to_thread(tool_obj.tool_call, name, arguments, 60)
+            resp = await self.run_blocking(tool_obj.tool_call, name, arguments, 60)
         else:
             if hasattr(tool_obj, "invoke_async") and asyncio.iscoroutinefunction(tool_obj.invoke_async):
                 resp = await tool_obj.invoke_async(**arguments)
             else:
-                resp = await asyncio.to_thread(tool_obj.invoke, **arguments)
+                resp = await self.run_blocking(tool_obj.invoke, **arguments)
 
         self.callback(name, arguments, resp, elapsed_time=timer()-st)
         return resp
@@ -164,7 +165,7 @@ class ToolBase(ComponentBase):
             elif asyncio.iscoroutinefunction(self._invoke):
                 res = await self._invoke(**kwargs)
             else:
-                res = await asyncio.to_thread(self._invoke, **kwargs)
+                res = await self._canvas.run_blocking(self._invoke, **kwargs)
         except Exception as e:
             self._param.outputs["_ERROR"] = {"value": str(e)}
             logging.exception(e)
@@ -13,6 +13,7 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 #
+import asyncio
 import logging
 import re
 from functools import partial
@@ -217,7 +218,7 @@ class DeepResearcher:
                 truncated_prev_reasoning = self._truncate_previous_reasoning(all_reasoning_steps)
                 
                 # Step 4: Retrieve information
-                kbinfos = self._retrieve_information(search_query)
+                kbinfos = await asyncio.to_thread(self._retrieve_information, search_query)
                 
                 # Step 5: Update chunk information
                 self._update_chunk_info(chunk_info, kbinfos)
@@ -37,9 +37,10 @@ from peewee import MySQLDatabase, PostgresqlDatabase
 from api.db.db_models import APIToken, Task
 import time
 
-from rag.flow.pipeline import Pipeline
+from rag.flow.pipeline import Pipeline, pipeline_log_key, read_pipeline_logs
 from rag.nlp import search
 from rag.utils.redis_conn import REDIS_CONN
+from rag.utils.retrieval_cache import bump_index_generation
 from common import settings
 from api.apps import login_required, current_user
 
@@ -194,6 +195,7 @@ async def rerun():
 
     if settings.docStoreConn.indexExist(search.index_name(current_user.id), doc["kb_id"]):
         settings.docStoreConn.delete({"doc_id": doc["id"]}, search.index_name(current_user.id), doc["kb_id"])
+        bump_index_generation(doc["kb_id"])
     doc["progress_msg"] = ""
     doc["chunk_num"] = 0
     doc["token_num"] = 0
@@ -497,6 +499,10 @@ def trace():
     cvs_id = request.args.get("canvas_id")
     msg_id = request.args.get("message_id")
     try:
+        if REDIS_CONN.exist(pipeline_log_key(cvs_id, msg_id)):
+            count = request.args.get("count")
+            return get_json_result(data=read_pipeline_logs(cvs_id, msg_id, request.args.get("after"), int(count) if count else None))
+
         binary = REDIS_CONN.get(f"{cvs_id}-{msg_id}-logs")
         if not binary:
             return get_json_result(data={})
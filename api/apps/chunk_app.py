@@ -32,6 +32,7 @@ from api.utils.api_utils import get_data_error_result, get_json_result, server_e
 from rag.app.qa import beAdoc, rmPrefix
 from rag.app.tag import label_question
 from rag.nlp import rag_tokenizer, search
+from rag.utils.retrieval_cache import bump_index_generation
 from rag.prompts.generator import cross_languages, keyword_extraction
 from common.string_utils import remove_redundant_spaces
 from common.constants import RetCode, LLMType, ParserType, PAGERANK_FLD
@@ -175,6 +176,8 @@ async def set():
             v = 0.1 * v[0] + 0.9 * v[1] if doc.parser_id != ParserType.QA else v[1]
             _d["q_%d_vec" % len(v)] = v.tolist()
             settings.docStoreConn.update({"id": req["chunk_id"]}, _d, search.index_name(tenant_id), doc.kb_id)
+            settings.docStoreConn.refresh(search.index_name(tenant_id), doc.kb_id)
+            bump_index_generation(doc.kb_id)
 
             # update image
             image_base64 = req.get("image_base64", None)
@@ -205,6 +208,7 @@ async def switch():
                                                     search.index_name(DocumentService.get_tenant_id(req["doc_id"])),
                                                     doc.kb_id):
                     return get_data_error_result(message="Index updating failure")
+            bump_index_generation(doc.kb_id)
             return get_json_result(data=True)
 
         return await asyncio.to_thread(_switch_sync)
@@ -226,6 +230,7 @@ async def rm():
                                                 search.index_name(DocumentService.get_tenant_id(req["doc_id"])),
                                                 doc.kb_id):
                 return get_data_error_result(message="Chunk deleting failure")
+            bump_index_generation(doc.kb_id)
             deleted_chunk_ids = req["chunk_ids"]
             chunk_number = len(deleted_chunk_ids)
             DocumentService.decrement_chunk_num(doc.id, doc.kb_id, 1, chunk_number, 0)
@@ -290,6 +295,8 @@ async def create():
             v = 0.1 * v[0] + 0.9 * v[1]
             d["q_%d_vec" % len(v)] = v.tolist()
             settings.docStoreConn.insert([d], search.index_name(tenant_id), doc.kb_id)
+            settings.docStoreConn.refresh(search.index_name(tenant_id), doc.kb_id)
+            bump_index_generation(doc.kb_id)
 
             DocumentService.increment_chunk_num(
                 doc.id, doc.kb_id, c, 1, 0)
@@ -21,7 +21,7 @@ from copy import deepcopy
 import tempfile
 from quart import Response, request
 from api.apps import current_user, login_required
-from api.db.db_models import APIToken
+from api.db.db_models import APIToken, Conversation
 from api.db.services.conversation_service import ConversationService, structure_answer
 from api.db.services.dialog_service import DialogService, async_ask, async_chat, gen_mindmap
 from api.db.services.llm_service import LLMBundle
@@ -107,6 +107,32 @@ async def get():
         return server_error_response(e)
 
 
+@manager.route("/messages", methods=["GET"])  # noqa: F821
+@login_required
+async def list_messages():
+    conv_id = request.args["conversation_id"]
+    page_number = int(request.args.get("page", 1))
+    items_per_page = int(request.args.get("page_size", 30))
+    try:
+        convs = list(ConversationService.get_by_ids([conv_id], cols=[Conversation.dialog_id]))
+        if not convs:
+            return get_data_error_result(message="Conversation not found!")
+        tenants = UserTenantService.query(user_id=current_user.id)
+        if not any(DialogService.query(tenant_id=tenant.tenant_id, id=convs[0].dialog_id) for tenant in tenants):
+            return get_json_result(data=False, message="Only owner of conversation authorized for this operation.", code=RetCode.OPERATING_ERROR)
+
+        total, page = ConversationService.get_messages(conv_id, page_number, items_per_page)
+        messages = []
+        for msg, ref in page:
+            if ref:
+                ref["chunks"] = chunks_format(ref)
+                msg = {**msg, "reference": ref}
+            messages.append(msg)
+        return get_json_result(data={"total": total, "messages": messages})
+    except Exception as e:
+        return server_error_response(e)
+
+
 @manager.route("/getsse/<dialog_id>", methods=["GET"])  # type: ignore # noqa: F821
 def getsse(dialog_id):
     token = request.headers.get("Authorization").split()
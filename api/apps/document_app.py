@@ -46,6 +46,7 @@ from common.constants import RetCode, VALID_TASK_STATUS, ParserType, TaskStatus
 from api.utils.web_utils import CONTENT_TYPE_MAP, html2pdf, is_valid_url
 from deepdoc.parser.html_parser import RAGFlowHtmlParser
 from rag.nlp import search, rag_tokenizer
+from rag.utils.retrieval_cache import bump_index_generation
 from common import settings
 
 
@@ -499,6 +500,7 @@ async def change_status():
             status_int = int(status)
             if not settings.docStoreConn.update({"doc_id": doc_id}, {"available_int": status_int}, search.index_name(kb.tenant_id), doc.kb_id):
                 result[doc_id] = {"error": "Database error (docStore update)!"}
+            bump_index_generation(doc.kb_id)
             result[doc_id] = {"status": status}
         except Exception as e:
             result[doc_id] = {"error": f"Internal server error: {str(e)}"}
@@ -566,6 +568,7 @@ async def run():
                     TaskService.filter_delete([Task.doc_id == id])
                     if settings.docStoreConn.indexExist(search.index_name(tenant_id), doc.kb_id):
                         settings.docStoreConn.delete({"doc_id": id}, search.index_name(tenant_id), doc.kb_id)
+                        bump_index_generation(doc.kb_id)
 
                 if str(req["run"]) == TaskStatus.RUNNING.value:
                     doc_dict = doc.to_dict()
@@ -622,6 +625,7 @@ async def rename():
                     search.index_name(tenant_id),
                     doc.kb_id,
                 )
+                bump_index_generation(doc.kb_id)
             return get_json_result(data=True)
 
         return await asyncio.to_thread(_rename_sync)
@@ -698,6 +702,7 @@ async def change_parser():
                 return get_data_error_result(message="Tenant not found!")
             if settings.docStoreConn.indexExist(search.index_name(tenant_id), doc.kb_id):
                 settings.docStoreConn.delete({"doc_id": doc.id}, search.index_name(tenant_id), doc.kb_id)
+                bump_index_generation(doc.kb_id)
         return None
 
     try:
@@ -40,6 +40,7 @@ from rag.nlp import search
 from api.constants import DATASET_NAME_LIMIT
 from rag.utils.redis_conn import REDIS_CONN
 from rag.utils.doc_store_conn import OrderByExpr
+from rag.utils.retrieval_cache import bump_index_generation
 from common.constants import RetCode, PipelineTaskType, StatusEnum, VALID_TASK_STATUS, FileSource, LLMType, PAGERANK_FLD
 from common import settings
 from api.apps import login_required, current_user
@@ -133,6 +134,7 @@ async def update():
                     search.index_name(kb.tenant_id),
                     kb.id,
                 )
+            bump_index_generation(kb.id)
 
         e, kb = KnowledgebaseService.get_by_id(kb.id)
         if not e:
@@ -267,6 +269,7 @@ async def rm():
             for kb in kbs:
                 settings.docStoreConn.delete({"kb_id": kb.id}, search.index_name(kb.tenant_id), kb.id)
                 settings.docStoreConn.deleteIdx(search.index_name(kb.tenant_id), kb.id)
+                bump_index_generation(kb.id)
                 if hasattr(settings.STORAGE_IMPL, 'remove_bucket'):
                     settings.STORAGE_IMPL.remove_bucket(kb.id)
             return get_json_result(data=True)
@@ -329,6 +332,7 @@ async def rm_tags(kb_id):
                                      {"remove": {"tag_kwd": t}},
                                      search.index_name(kb.tenant_id),
                                      kb_id)
+    bump_index_generation(kb_id)
     return get_json_result(data=True)
 
 
@@ -348,6 +352,7 @@ async def rename_tags(kb_id):
                                      {"remove": {"tag_kwd": req["from_tag"].strip()}, "add": {"tag_kwd": req["to_tag"]}},
                                      search.index_name(kb.tenant_id),
                                      kb_id)
+    bump_index_generation(kb_id)
     return get_json_result(data=True)
 
 
@@ -402,6 +407,7 @@ def delete_knowledge_graph(kb_id):
         )
     _, kb = KnowledgebaseService.get_by_id(kb_id)
     settings.docStoreConn.delete({"knowledge_graph_kwd": ["graph", "subgraph", "entity", "relation"]}, search.index_name(kb.tenant_id), kb_id)
+    bump_index_generation(kb_id)
 
     return get_json_result(data=True)
 
@@ -776,12 +782,14 @@ def delete_kb_task():
             kb_task_finish_at = "graphrag_task_finish_at"
             cancel_task(task_id)
             settings.docStoreConn.delete({"knowledge_graph_kwd": ["graph", "subgraph", "entity", "relation"]}, search.index_name(kb.tenant_id), kb_id)
+            bump_index_generation(kb_id)
         case PipelineTaskType.RAPTOR:
             kb_task_id_field = "raptor_task_id"
             task_id = kb.raptor_task_id
             kb_task_finish_at = "raptor_task_finish_at"
             cancel_task(task_id)
             settings.docStoreConn.delete({"raptor_kwd": ["raptor"]}, search.index_name(kb.tenant_id), kb_id)
+            bump_index_generation(kb_id)
         case PipelineTaskType.MINDMAP:
             kb_task_id_field = "mindmap_task_id"
             task_id = kb.mindmap_task_id
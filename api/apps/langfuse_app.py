@@ -20,6 +20,7 @@ from langfuse import Langfuse
 
 from api.db.db_models import DB
 from api.db.services.langfuse_service import TenantLangfuseService
+from api.db.services.tenant_llm_service import model_pool
 from api.utils.api_utils import get_error_data_result, get_json_result, get_request_json, server_error_response, validate_request
 
 
@@ -53,6 +54,7 @@ async def set_api_key():
                 TenantLangfuseService.save(**langfuse_keys)
             else:
                 TenantLangfuseService.update_by_tenant(tenant_id=current_user_id, langfuse_keys=langfuse_keys)
+            model_pool.invalidate(current_user_id)
             return get_json_result(data=langfuse_keys)
         except Exception as e:
             return server_error_response(e)
@@ -94,6 +96,7 @@ def delete_api_key():
     with DB.atomic():
         try:
             TenantLangfuseService.delete_model(langfuse_entry)
+            model_pool.invalidate(current_user_id)
             return get_json_result(data=True)
         except Exception as e:
             return server_error_response(e)
@@ -19,7 +19,7 @@ import os
 from quart import request
 
 from api.apps import login_required, current_user
-from api.db.services.tenant_llm_service import LLMFactoriesService, TenantLLMService
+from api.db.services.tenant_llm_service import LLMFactoriesService, TenantLLMService, model_pool
 from api.db.services.llm_service import LLMService
 from api.utils.api_utils import get_allowed_llm_factories, get_data_error_result, get_json_result, get_request_json, server_error_response, validate_request
 from common.constants import StatusEnum, LLMType
@@ -121,6 +121,7 @@ async def set_api_key():
                 api_base=llm_config["api_base"],
                 max_tokens=llm_config["max_tokens"],
             )
+    model_pool.invalidate(current_user.id)
 
     return get_json_result(data=True)
 
@@ -291,6 +292,7 @@ async def add_llm():
 
     if not TenantLLMService.filter_update([TenantLLM.tenant_id == current_user.id, TenantLLM.llm_factory == factory, TenantLLM.llm_name == llm["llm_name"]], llm):
         TenantLLMService.save(**llm)
+    model_pool.invalidate(current_user.id)
 
     return get_json_result(data=True)
 
@@ -301,6 +303,7 @@ async def add_llm():
 async def delete_llm():
     req = await get_request_json()
     TenantLLMService.filter_delete([TenantLLM.tenant_id == current_user.id, TenantLLM.llm_factory == req["llm_factory"], TenantLLM.llm_name == req["llm_name"]])
+    model_pool.invalidate(current_user.id)
     return get_json_result(data=True)
 
 
@@ -312,6 +315,7 @@ async def enable_llm():
     TenantLLMService.filter_update(
         [TenantLLM.tenant_id == current_user.id, TenantLLM.llm_factory == req["llm_factory"], TenantLLM.llm_name == req["llm_name"]], {"status": str(req.get("status", "1"))}
     )
+    model_pool.invalidate(current_user.id)
     return get_json_result(data=True)
 
 
@@ -321,6 +325,7 @@ async def enable_llm():
 async def delete_factory():
     req = await get_request_json()
     TenantLLMService.filter_delete([TenantLLM.tenant_id == current_user.id, TenantLLM.llm_factory == req["llm_factory"]])
+    model_pool.invalidate(current_user.id)
     return get_json_result(data=True)
 
 
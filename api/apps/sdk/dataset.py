@@ -48,6 +48,7 @@ from api.utils.validation_utils import (
     validate_and_parse_request_args,
 )
 from rag.nlp import search
+from rag.utils.retrieval_cache import bump_index_generation
 from common.constants import PAGERANK_FLD
 from common import settings
 
@@ -368,6 +369,7 @@ async def update(tenant_id, dataset_id):
                 # Elasticsearch requires PAGERANK_FLD be non-zero!
                 settings.docStoreConn.update({"exists": PAGERANK_FLD}, {"remove": PAGERANK_FLD},
                                              search.index_name(kb.tenant_id), kb.id)
+            bump_index_generation(kb.id)
 
         if not KnowledgebaseService.update_by_id(kb.id, req):
             return get_error_data_result(message="Update dataset error.(Database error)")
@@ -532,6 +534,7 @@ def delete_knowledge_graph(tenant_id, dataset_id):
     _, kb = KnowledgebaseService.get_by_id(dataset_id)
     settings.docStoreConn.delete({"knowledge_graph_kwd": ["graph", "subgraph", "entity", "relation"]},
                                  search.index_name(kb.tenant_id), dataset_id)
+    bump_index_generation(dataset_id)
 
     return get_result(data=True)
 
@@ -34,6 +34,7 @@ from common.time_utils import current_timestamp, datetime_format
 from timeit import default_timer as timer
 
 from rag.utils.redis_conn import REDIS_CONN
+from rag.utils.retrieval_cache import retrieval_cache
 from quart import jsonify
 from api.utils.health_utils import run_health_checks
 from common import settings
@@ -87,6 +88,9 @@ def status():
             database:
               type: object
               description: Database status.
+            retrieval_cache:
+              type: object
+              description: Hit/miss counters of this worker's retrieval cache.
       503:
         description: Service unavailable.
         schema:
@@ -167,6 +171,7 @@ def status():
     except Exception:
         logging.exception("get task executor heartbeats failed!")
     res["task_executor_heartbeats"] = task_executor_heartbeats
+    res["retrieval_cache"] = retrieval_cache.stats()
 
     return get_json_result(data=res)
 
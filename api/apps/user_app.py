@@ -31,7 +31,7 @@ from api.db import FileType, UserTenantRole
 from api.db.db_models import TenantLLM
 from api.db.services.file_service import FileService
 from api.db.services.llm_service import get_init_tenant_llm
-from api.db.services.tenant_llm_service import TenantLLMService
+from api.db.services.tenant_llm_service import TenantLLMService, model_pool
 from api.db.services.user_service import TenantService, UserService, UserTenantService
 from common.time_utils import current_timestamp, datetime_format, get_format_time
 from common.misc_utils import download_img, get_uuid
@@ -844,6 +844,7 @@ async def set_tenant_info():
     try:
         tid = req.pop("tenant_id")
         TenantService.update_by_id(tid, req)
+        model_pool.invalidate(tid)
         return get_json_result(data=True)
     except Exception as e:
         return server_error_response(e)
@@ -886,6 +886,18 @@ class Conversation(DataBaseModel):
         db_table = "conversation"
 
 
+class ConversationMessage(DataBaseModel):
+    id = CharField(max_length=32, primary_key=True)
+    conversation_id = CharField(max_length=32, null=False, index=True, help_text="conversation or api_4_conversation id")
+    seq = BigIntegerField(null=False, index=True, help_text="order of the message in its conversation")
+    message = JSONField(null=False, default={})
+    has_reference = BooleanField(default=False, help_text="whether reference is appended to the conversation's references")
+    reference = JSONField(null=True, default={})
+
+    class Meta:
+        db_table = "conversation_message"
+
+
 class APIToken(DataBaseModel):
     tenant_id = CharField(max_length=32, null=False, index=True)
     token = CharField(max_length=255, null=False, index=True)
@@ -907,6 +919,7 @@ class API4Conversation(DataBaseModel):
     tokens = IntegerField(default=0)
     source = CharField(max_length=16, null=True, help_text="none|agent|dialog", index=True)
     dsl = JSONField(null=True, default={})
+    canvas_state = JSONField(null=True, default={}, help_text="agent session state saved after each turn; overrides the same keys of dsl")
     duration = FloatField(default=0, index=True)
     round = IntegerField(default=0, index=True)
     thumb_up = IntegerField(default=0, index=True)
@@ -1416,5 +1429,9 @@ def migrate_db():
         migrate(migrator.add_column("evaluation_datasets", "status", IntegerField(null=False, default=1)))
     except Exception:
         pass
+    try:
+        migrate(migrator.add_column("api_4_conversation", "canvas_state", JSONField(null=True, default={}, help_text="agent session state saved after each turn; overrides the same keys of dsl")))
+    except Exception:
+        pass
 
     logging.disable(logging.NOTSET)
@@ -31,10 +31,11 @@ from api.db.services.file_service import FileService
 from api.db.services.mcp_server_service import MCPServerService
 from api.db.services.search_service import SearchService
 from api.db.services.task_service import TaskService
-from api.db.services.tenant_llm_service import TenantLLMService
+from api.db.services.tenant_llm_service import TenantLLMService, model_pool
 from api.db.services.user_canvas_version import UserCanvasVersionService
 from api.db.services.user_service import TenantService, UserService, UserTenantService
 from rag.nlp import search
+from rag.utils.retrieval_cache import bump_index_generation
 from common.constants import ActiveEnum
 from common import settings
 
@@ -180,6 +181,7 @@ def delete_user_data(user_id: str) -> dict:
                 # step1.1.3 delete chunk in es
                 r = settings.docStoreConn.delete({"kb_id": kb_ids},
                                          search.index_name(tenant_id), kb_ids)
+                bump_index_generation(kb_ids)
                 done_msg += f"- Deleted {r} chunk records.\n"
                 kb_delete_res = KnowledgebaseService.delete_by_ids(kb_ids)
                 done_msg += f"- Deleted {kb_delete_res} dataset records.\n"
@@ -200,6 +202,7 @@ def delete_user_data(user_id: str) -> dict:
             done_msg += f"- Deleted {llm_delete_res} tenant-LLM records.\n"
             langfuse_delete_res = TenantLangfuseService.delete_ty_tenant_id(tenant_id)
             done_msg += f"- Deleted {langfuse_delete_res} langfuse records.\n"
+            model_pool.invalidate(tenant_id)
             # step1.3 delete own tenant
             tenant_delete_res = TenantService.delete_by_id(tenant_id)
             done_msg += f"- Deleted {tenant_delete_res} tenant.\n"
@@ -240,6 +243,7 @@ def delete_user_data(user_id: str) -> dict:
                                 {"doc_id": [d["id"] for d in docs]},
                                 search.index_name(_tenant_id), _kb_id
                             )
+                            bump_index_generation(_kb_id)
                             # record doc info
                             if _kb_id in kb_doc_info.keys():
                                 kb_doc_info[_kb_id]['doc_num'] += 1
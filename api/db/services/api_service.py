@@ -17,8 +17,9 @@ from datetime import datetime
 
 import peewee
 
-from api.db.db_models import DB, API4Conversation, APIToken, Dialog
+from api.db.db_models import DB, API4Conversation, APIToken, ConversationMessage, Dialog
 from api.db.services.common_service import CommonService
+from api.db.services.conversation_message_service import ConversationMessageService, MessageLogMixin
 from common.time_utils import current_timestamp, datetime_format
 
 
@@ -41,7 +42,7 @@ class APITokenService(CommonService):
         return cls.model.delete().where(cls.model.tenant_id == tenant_id).execute()
 
 
-class API4ConversationService(CommonService):
+class API4ConversationService(MessageLogMixin, CommonService):
     model = API4Conversation
 
     @classmethod
@@ -54,14 +55,16 @@ class API4ConversationService(CommonService):
         if include_dsl:
             sessions = cls.model.select().where(cls.model.dialog_id == dialog_id)
         else:
-            fields = [field for field in cls.model._meta.fields.values() if field.name != 'dsl']
+            fields = [field for field in cls.model._meta.fields.values() if field.name not in ['dsl', 'canvas_state']]
             sessions = cls.model.select(*fields).where(cls.model.dialog_id == dialog_id)
         if id:
             sessions = sessions.where(cls.model.id == id)
         if user_id:
             sessions = sessions.where(cls.model.user_id == user_id)
         if keywords:
-            sessions = sessions.where(peewee.fn.LOWER(cls.model.message).contains(keywords.lower()))
+            appended = ConversationMessage.select(ConversationMessage.conversation_id).where(
+                peewee.fn.LOWER(ConversationMessage.message).contains(keywords.lower()))
+            sessions = sessions.where(peewee.fn.LOWER(cls.model.message).contains(keywords.lower()) | cls.model.id.in_(appended))
         if from_date:
             sessions = sessions.where(cls.model.create_date >= from_date)
         if to_date:
@@ -73,7 +76,34 @@ class API4ConversationService(CommonService):
         count = sessions.count()
         sessions = sessions.paginate(page_number, items_per_page)
 
-        return count, list(sessions.dicts())
+        sessions = cls.with_appended(list(sessions.dicts()))
+        if include_dsl:
+            for s in sessions:
+                cls.merge_canvas_state(s)
+        return count, sessions
+
+    @classmethod
+    def merge_canvas_state(cls, session):
+        """Brings the `dsl` of a session dict up to date with the state saved after its last turn."""
+        state = session.pop("canvas_state", None)
+        if state and isinstance(session.get("dsl"), dict):
+            session["dsl"].update({k: v for k, v in state.items() if k != "dsl_version"})
+        return session
+
+    @classmethod
+    @DB.connection_context()
+    def get_canvas_state(cls, id):
+        """The canvas state of a session, or None if there is no such session; `message` and `dsl` are not read."""
+        session = cls.model.select(cls.model.id, cls.model.canvas_state).where(cls.model.id == id).first()
+        if not session:
+            return None
+        return session.canvas_state or {}
+
+    @classmethod
+    @DB.connection_context()
+    def get_dsl(cls, id):
+        session = cls.model.select(cls.model.id, cls.model.dsl).where(cls.model.id == id).first()
+        return session.dsl if session else None
 
     @classmethod
     @DB.connection_context()
@@ -81,6 +111,12 @@ class API4ConversationService(CommonService):
         cls.update_by_id(id, conversation)
         return cls.model.update(round=cls.model.round + 1).where(cls.model.id == id).execute()
 
+    @classmethod
+    @DB.connection_context()
+    def append_turn(cls, id, messages, references=None, **fields):
+        cls.append_messages(id, messages, references, **fields)
+        return cls.model.update(round=cls.model.round + 1).where(cls.model.id == id).execute()
+
     @classmethod
     @DB.connection_context()
     def stats(cls, tenant_id, from_date, to_date, source=None):
@@ -109,4 +145,6 @@ class API4ConversationService(CommonService):
     @classmethod
     @DB.connection_context()
     def delete_by_dialog_ids(cls, dialog_ids):
+        ids = [c.id for c in cls.model.select(cls.model.id).where(cls.model.dialog_id.in_(dialog_ids))]
+        ConversationMessageService.delete_by_conversation_ids(ids)
         return cls.model.delete().where(cls.model.dialog_id.in_(dialog_ids)).execute()
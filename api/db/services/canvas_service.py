@@ -17,9 +17,9 @@ import json
 import logging
 import time
 from uuid import uuid4
-from agent.canvas import Canvas
+from agent.canvas import Canvas, compile_canvas, get_compiled_canvas, session_state
 from api.db import CanvasCategory, TenantPermission
-from api.db.db_models import DB, CanvasTemplate, User, UserCanvas, API4Conversation
+from api.db.db_models import DB, CanvasTemplate, User, UserCanvas
 from api.db.services.api_service import API4ConversationService
 from api.db.services.common_service import CommonService
 from common.misc_utils import get_uuid
@@ -184,21 +184,25 @@ async def completion(tenant_id, agent_id, session_id=None, **kwargs):
     user_id = kwargs.get("user_id", "")
 
     if session_id:
-        e, conv = API4ConversationService.get_by_id(session_id)
-        assert e, "Session not found!"
-        if not conv.message:
-            conv.message = []
-        if not isinstance(conv.dsl, str):
-            conv.dsl = json.dumps(conv.dsl, ensure_ascii=False)
-        canvas = Canvas(conv.dsl, tenant_id, agent_id)
+        state = API4ConversationService.get_canvas_state(session_id)
+        assert state is not None, "Session not found!"
+        compiled = get_compiled_canvas(agent_id, state.get("dsl_version"))
+        if compiled is None:
+            dsl = API4ConversationService.get_dsl(session_id)
+            if isinstance(dsl, str):
+                dsl = json.loads(dsl)
+            compiled = compile_canvas(agent_id, dsl)
+            if not state.get("dsl_version"):
+                # Saved before sessions kept their state apart from the DSL.
+                state = session_state(dsl)
+        canvas = Canvas(None, tenant_id, agent_id, compiled=compiled, state=state)
     else:
         e, cvs = UserCanvasService.get_by_id(agent_id)
         assert e, "Agent not found."
         assert cvs.user_id == tenant_id, "You do not own the agent."
-        if not isinstance(cvs.dsl, str):
-            cvs.dsl = json.dumps(cvs.dsl, ensure_ascii=False)
+        dsl = cvs.dsl if not isinstance(cvs.dsl, str) else json.loads(cvs.dsl)
         session_id=get_uuid()
-        canvas = Canvas(cvs.dsl, tenant_id, agent_id)
+        canvas = Canvas(None, tenant_id, agent_id, compiled=compile_canvas(agent_id, dsl), state=session_state(dsl))
         canvas.reset()
         conv = {
             "id": session_id,
@@ -206,18 +210,18 @@ async def completion(tenant_id, agent_id, session_id=None, **kwargs):
             "user_id": user_id,
             "message": [],
             "source": "agent",
-            "dsl": cvs.dsl,
+            "dsl": dsl,
+            "canvas_state": canvas.get_session_state(),
             "reference": []
         }
         API4ConversationService.save(**conv)
-        conv = API4Conversation(**conv)
 
     message_id = str(uuid4())
-    conv.message.append({
+    question = {
         "role": "user",
         "content": query,
         "id": message_id
-    })
+    }
     txt = ""
     async for ans in canvas.run(query=query, files=files, user_id=user_id, inputs=inputs):
         ans["session_id"] = session_id
@@ -229,12 +233,8 @@ async def completion(tenant_id, agent_id, session_id=None, **kwargs):
                 txt += "</think>"
         yield "data:" + json.dumps(ans, ensure_ascii=False) + "\n\n"
 
-    conv.message.append({"role": "assistant", "content": txt, "created_at": time.time(), "id": message_id})
-    conv.reference = canvas.get_reference()
-    conv.errors = canvas.error
-    conv.dsl = str(canvas)
-    conv = conv.to_dict()
-    API4ConversationService.append_message(conv["id"], conv)
+    answer = {"role": "assistant", "content": txt, "created_at": time.time(), "id": message_id}
+    API4ConversationService.append_turn(session_id, [question, answer], reference=canvas.get_reference(), errors=canvas.error, canvas_state=canvas.get_session_state())
 
 
 async def completion_openai(tenant_id, agent_id, question, session_id=None, stream=True, **kwargs):
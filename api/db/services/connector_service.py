@@ -195,6 +195,27 @@ class SyncLogsService(CommonService):
                          )\
             .where(cls.model.id == id).execute()
 
+    @staticmethod
+    def _skip_ingested(kb, docs, src):
+        """
+        Drop the documents that this source already put into the KB, with the same size, after
+        they were last updated; a sync rescheduled after a timeout sees them again.
+        """
+        named = [(d["semantic_identifier"]+(f"{d['extension']}" if d["semantic_identifier"][::-1].find(d['extension'][::-1])<0 else ""), d) for d in docs]
+        existing = {}
+        for r in DocumentService.model.select(DocumentService.model.name, DocumentService.model.size, DocumentService.model.create_time)\
+                .where(DocumentService.model.kb_id == kb.id, DocumentService.model.source_type == src, DocumentService.model.name.in_([n for n, _ in named])).dicts():
+            existing.setdefault(r["name"], []).append(r)
+
+        def ingested(name, d):
+            updated_at = d.get("doc_updated_at")
+            return bool(updated_at) and any(r["size"] == len(d["blob"] or b"") and updated_at.timestamp() * 1000 <= r["create_time"] for r in existing.get(name, []))
+
+        kept = [d for n, d in named if not ingested(n, d)]
+        if len(kept) < len(docs):
+            logging.info(f"[SyncLogService] Skipped {len(docs) - len(kept)} document(s) ingested already from {src}")
+        return kept
+
     @classmethod
     def duplicate_and_parse(cls, kb, docs, tenant_id, src, auto_parse=True):
         from api.db.services.file_service import FileService
@@ -209,6 +230,9 @@ class SyncLogsService(CommonService):
                 return self.blob
 
         errs = []
+        docs = cls._skip_ingested(kb, docs, src)
+        if not docs:
+            return errs, []
         files = [FileObj(filename=d["semantic_identifier"]+(f"{d['extension']}" if d["semantic_identifier"][::-1].find(d['extension'][::-1])<0 else ""), blob=d["blob"]) for d in docs]
         doc_ids = []
         err, doc_blob_pairs = FileService.upload_document(kb, files, tenant_id, src)
@@ -0,0 +1,186 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+import time
+
+from api.db.db_models import DB, ConversationMessage
+from api.db.services.common_service import CommonService
+from common.misc_utils import get_uuid
+
+
+class ConversationMessageService(CommonService):
+    """
+    Messages appended to a conversation after its `message` column was last written.
+
+    A turn inserts its new messages, and the reference of its answer, as rows here
+    instead of rewriting the conversation's whole message and reference JSON. Reads
+    through MessageLogMixin return the column followed by these rows, so callers
+    keep seeing complete `message` and `reference` lists.
+    """
+
+    model = ConversationMessage
+
+    @classmethod
+    @DB.connection_context()
+    def append(cls, conversation_id, messages, references=None):
+        """
+        Appends `messages` to the conversation. `references`, when given, pairs one
+        reference with each message; None entries add no reference.
+        """
+        references = references or [None] * len(messages)
+        seq = time.time_ns()
+        rows = []
+        for i, (m, r) in enumerate(zip(messages, references)):
+            rows.append({
+                "id": get_uuid(),
+                "conversation_id": conversation_id,
+                "seq": seq + i,
+                "message": m,
+                "has_reference": r is not None,
+                "reference": r if r is not None else {},
+            })
+        if rows:
+            cls.insert_many(rows)
+
+    @classmethod
+    @DB.connection_context()
+    def get_appended(cls, conversation_ids):
+        """Appended rows of each conversation, in order."""
+        res = {cid: [] for cid in conversation_ids}
+        if not conversation_ids:
+            return res
+        rows = cls.model.select().where(cls.model.conversation_id.in_(list(conversation_ids))).order_by(cls.model.seq)
+        for r in rows:
+            res[r.conversation_id].append(r)
+        return res
+
+    @classmethod
+    @DB.connection_context()
+    def count(cls, conversation_id):
+        return cls.model.select().where(cls.model.conversation_id == conversation_id).count()
+
+    @classmethod
+    @DB.connection_context()
+    def page(cls, conversation_id, offset, limit):
+        """Appended rows from the newest, skipping `offset` of them."""
+        return list(cls.model.select().where(cls.model.conversation_id == conversation_id).order_by(cls.model.seq.desc()).offset(offset).limit(limit))
+
+    @classmethod
+    @DB.connection_context()
+    def delete_by_conversation_ids(cls, conversation_ids):
+        if not conversation_ids:
+            return 0
+        return cls.model.delete().where(cls.model.conversation_id.in_(list(conversation_ids))).execute()
+
+
+def _merge(conv, rows):
+    """Extends the message and reference lists of `conv`, a model or a dict, with appended rows."""
+    if not rows:
+        return conv
+    is_dict = isinstance(conv, dict)
+    message = (conv.get("message") if is_dict else conv.message) or []
+    reference = conv.get("reference") if is_dict else conv.reference
+    message = message + [r.message for r in rows]
+    appended = [r.reference for r in rows if r.has_reference]
+    # Agent sessions keep a single reference dict, which turns do not append to.
+    if appended and (isinstance(reference, list) or not reference):
+        reference = (reference or []) + appended
+    if is_dict:
+        conv["message"] = message
+        conv["reference"] = reference
+    else:
+        conv.message = message
+        conv.reference = reference
+    return conv
+
+
+class MessageLogMixin:
+    """
+    Makes a conversation service read messages appended through `append_messages`.
+
+    Models and dicts returned by its getters carry the stored `message` and
+    `reference` columns extended with the appended messages. Writing `message`
+    with `update_by_id` stores the complete history again and drops the appended
+    rows it now contains.
+    """
+
+    @classmethod
+    def with_appended(cls, convs):
+        appended = ConversationMessageService.get_appended([c["id"] if isinstance(c, dict) else c.id for c in convs])
+        for c in convs:
+            _merge(c, appended[c["id"] if isinstance(c, dict) else c.id])
+        return convs
+
+    @classmethod
+    def append_messages(cls, conversation_id, messages, references=None, **fields):
+        """
+        Stores the messages of a turn, and the references of its answers, without
+        rewriting the conversation's history. `fields` updates other columns of the
+        conversation in the same call.
+        """
+        ConversationMessageService.append(conversation_id, messages, references)
+        return super().update_by_id(conversation_id, fields)
+
+    @classmethod
+    def get_messages(cls, conversation_id, page_number=1, items_per_page=30):
+        """
+        One page of a conversation's messages, counting pages from the newest.
+
+        Returns the total number of messages and the page's messages with their
+        references, oldest first. The `message` column is only read when the page
+        reaches past the appended messages.
+        """
+        total_appended = ConversationMessageService.count(conversation_id)
+        offset = max(0, page_number - 1) * items_per_page
+        rows = ConversationMessageService.page(conversation_id, offset, items_per_page)
+        page = [(r.message, r.reference if r.has_reference else None) for r in reversed(rows)]
+        e, conv = super().get_by_id(conversation_id)
+        if not e:
+            return 0, []
+        stored = conv.message or []
+        total = len(stored) + total_appended
+        missing = items_per_page - len(rows)
+        if missing > 0 and offset + len(rows) < total:
+            end = len(stored) - max(0, offset - total_appended)
+            page = [(m, None) for m in stored[max(0, end - missing):end]] + page
+        return total, page
+
+    @classmethod
+    def get_by_id(cls, pid):
+        e, obj = super().get_by_id(pid)
+        if e:
+            cls.with_appended([obj])
+        return e, obj
+
+    @classmethod
+    def query(cls, cols=None, reverse=None, order_by=None, **kwargs):
+        return cls.with_appended(super().query(cols=cols, reverse=reverse, order_by=order_by, **kwargs))
+
+    @classmethod
+    def update_by_id(cls, pid, data):
+        num = super().update_by_id(pid, data)
+        if "message" in data:
+            ConversationMessageService.delete_by_conversation_ids([pid])
+        return num
+
+    @classmethod
+    def delete_by_id(cls, pid):
+        ConversationMessageService.delete_by_conversation_ids([pid])
+        return super().delete_by_id(pid)
+
+    @classmethod
+    def delete_by_ids(cls, pids):
+        ConversationMessageService.delete_by_conversation_ids(pids)
+        return super().delete_by_ids(pids)
@@ -19,6 +19,7 @@ from common.constants import StatusEnum
 from api.db.db_models import Conversation, DB
 from api.db.services.api_service import API4ConversationService
 from api.db.services.common_service import CommonService
+from api.db.services.conversation_message_service import MessageLogMixin
 from api.db.services.dialog_service import DialogService, async_chat
 from common.misc_utils import get_uuid
 import json
@@ -26,7 +27,7 @@ import json
 from rag.prompts.generator import chunks_format
 
 
-class ConversationService(CommonService):
+class ConversationService(MessageLogMixin, CommonService):
     model = Conversation
 
     @classmethod
@@ -46,7 +47,7 @@ class ConversationService(CommonService):
 
         sessions = sessions.paginate(page_number, items_per_page)
 
-        return list(sessions.dicts())
+        return cls.with_appended(list(sessions.dicts()))
 
     @classmethod
     @DB.connection_context()
@@ -62,7 +63,7 @@ class ConversationService(CommonService):
                 break
             res.extend(_temp)
             offset += limit
-        return res
+        return cls.with_appended(res)
 
 def structure_answer(conv, ans, message_id, session_id):
     reference = ans["reference"]
@@ -150,7 +151,7 @@ async def async_completion(tenant_id, chat_id, question, name="New session", ses
             async for ans in async_chat(dia, msg, True, **kwargs):
                 ans = structure_answer(conv, ans, message_id, session_id)
                 yield "data:" + json.dumps({"code": 0, "data": ans}, ensure_ascii=False) + "\n\n"
-            ConversationService.update_by_id(conv.id, conv.to_dict())
+            ConversationService.append_messages(conv.id, [question, conv.message[-1]], [None, conv.reference[-1]])
         except Exception as e:
             yield "data:" + json.dumps({"code": 500, "message": str(e),
                                         "data": {"answer": "**ERROR**: " + str(e), "reference": []}},
@@ -161,7 +162,7 @@ async def async_completion(tenant_id, chat_id, question, name="New session", ses
         answer = None
         async for ans in async_chat(dia, msg, False, **kwargs):
             answer = structure_answer(conv, ans, message_id, session_id)
-            ConversationService.update_by_id(conv.id, conv.to_dict())
+            ConversationService.append_messages(conv.id, [question, conv.message[-1]], [None, conv.reference[-1]])
             break
         yield answer
 
@@ -224,7 +225,7 @@ async def async_iframe_completion(dialog_id, question, session_id=None, stream=T
                 ans = structure_answer(conv, ans, message_id, session_id)
                 yield "data:" + json.dumps({"code": 0, "message": "", "data": ans},
                                            ensure_ascii=False) + "\n\n"
-            API4ConversationService.append_message(conv.id, conv.to_dict())
+            API4ConversationService.append_turn(conv.id, [question, conv.message[-1]], [None, conv.reference[-1]])
         except Exception as e:
             yield "data:" + json.dumps({"code": 500, "message": str(e),
                                         "data": {"answer": "**ERROR**: " + str(e), "reference": []}},
@@ -235,6 +236,6 @@ async def async_iframe_completion(dialog_id, question, session_id=None, stream=T
         answer = None
         async for ans in async_chat(dia, msg, False, **kwargs):
             answer = structure_answer(conv, ans, message_id, session_id)
-            API4ConversationService.append_message(conv.id, conv.to_dict())
+            API4ConversationService.append_turn(conv.id, [question, conv.message[-1]], [None, conv.reference[-1]])
             break
         yield answer
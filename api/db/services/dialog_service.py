@@ -13,8 +13,10 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 #
+import asyncio
 import binascii
 import logging
+import os
 import re
 import time
 from copy import deepcopy
@@ -46,6 +48,11 @@ from rag.utils.tavily_conn import Tavily
 from common.string_utils import remove_redundant_spaces
 from common import settings
 
+# Seconds each retrieval source of a chat may take before the answer goes on without it.
+RETRIEVAL_TIMEOUT = float(os.environ.get("RETRIEVAL_TIMEOUT", 60))
+WEB_SEARCH_TIMEOUT = float(os.environ.get("WEB_SEARCH_TIMEOUT", 20))
+KG_RETRIEVAL_TIMEOUT = float(os.environ.get("KG_RETRIEVAL_TIMEOUT", 60))
+
 
 class DialogService(CommonService):
     model = Dialog
@@ -278,6 +285,74 @@ def repair_bad_citation_formats(answer: str, kbinfos: dict, idx: set):
     return answer, idx
 
 
+async def _retrieve_from(source, limit_s, func, *args, **kwargs):
+    """Runs a blocking retrieval in a worker thread, giving up on it after `limit_s` seconds."""
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), limit_s)
+    except asyncio.TimeoutError:
+        # The thread cannot be interrupted; its result is dropped when it finishes.
+        logging.warning(f"{source} retrieval took longer than {limit_s}s, answering without it")
+        return None
+
+
+async def async_retrieval(dialog, question, kbs, tenant_ids, embd_mdl, rerank_mdl, chat_mdl, doc_ids):
+    """
+    Retrieves the chunks a chat answers from.
+
+    The knowledge bases, Tavily and the knowledge graph are searched at the same
+    time in worker threads, so the event loop keeps streaming other answers. A
+    source that outlasts its timeout is left out of the result.
+    """
+    retriever = settings.retriever
+    prompt_config = dialog.prompt_config
+
+    def search_kbs():
+        kbinfos = retriever.retrieval(
+            question,
+            embd_mdl,
+            tenant_ids,
+            dialog.kb_ids,
+            1,
+            dialog.top_n,
+            dialog.similarity_threshold,
+            dialog.vector_similarity_weight,
+            doc_ids=doc_ids,
+            top=dialog.top_k,
+            aggs=False,
+            rerank_mdl=rerank_mdl,
+            rank_feature=label_question(question, kbs),
+        )
+        if prompt_config.get("toc_enhance"):
+            cks = retriever.retrieval_by_toc(question, kbinfos["chunks"], tenant_ids, chat_mdl, dialog.top_n)
+            if cks:
+                kbinfos["chunks"] = cks
+        kbinfos["chunks"] = retriever.retrieval_by_children(kbinfos["chunks"], tenant_ids)
+        return kbinfos
+
+    def search_web():
+        return Tavily(prompt_config["tavily_api_key"]).retrieve_chunks(question)
+
+    def search_kg():
+        return settings.kg_retriever.retrieval(question, tenant_ids, dialog.kb_ids, embd_mdl, LLMBundle(dialog.tenant_id, LLMType.CHAT))
+
+    sources = {}
+    if embd_mdl:
+        sources["kb"] = _retrieve_from("Knowledge base", RETRIEVAL_TIMEOUT, search_kbs)
+    if prompt_config.get("tavily_api_key"):
+        sources["web"] = _retrieve_from("Tavily", WEB_SEARCH_TIMEOUT, search_web)
+    if prompt_config.get("use_kg"):
+        sources["kg"] = _retrieve_from("Knowledge graph", KG_RETRIEVAL_TIMEOUT, search_kg)
+    res = dict(zip(sources.keys(), await asyncio.gather(*sources.values())))
+
+    kbinfos = res.get("kb") or {"total": 0, "chunks": [], "doc_aggs": []}
+    if res.get("web"):
+        kbinfos["chunks"].extend(res["web"]["chunks"])
+        kbinfos["doc_aggs"].extend(res["web"]["doc_aggs"])
+    if res.get("kg") and res["kg"]["content_with_weight"]:
+        kbinfos["chunks"].insert(0, res["kg"])
+    return kbinfos
+
+
 async def async_chat(dialog, messages, stream=True, **kwargs):
     assert messages[-1]["role"] == "user", "The last content of this conversation is not from user."
     if not dialog.kb_ids and not dialog.prompt_config.get("tavily_api_key"):
@@ -394,38 +469,7 @@ async def async_chat(dialog, messages, stream=True, **kwargs):
                 elif stream:
                     yield think
         else:
-            if embd_mdl:
-                kbinfos = retriever.retrieval(
-                    " ".join(questions),
-                    embd_mdl,
-                    tenant_ids,
-                    dialog.kb_ids,
-                    1,
-                    dialog.top_n,
-                    dialog.similarity_threshold,
-                    dialog.vector_similarity_weight,
-                    doc_ids=attachments,
-                    top=dialog.top_k,
-                    aggs=False,
-                    rerank_mdl=rerank_mdl,
-                    rank_feature=label_question(" ".join(questions), kbs),
-                )
-                if prompt_config.get("toc_enhance"):
-                    cks = retriever.retrieval_by_toc(" ".join(questions), kbinfos["chunks"], tenant_ids, chat_mdl, dialog.top_n)
-                    if cks:
-                        kbinfos["chunks"] = cks
-                kbinfos["chunks"] = retriever.retrieval_by_children(kbinfos["chunks"], tenant_ids)
-            if prompt_config.get("tavily_api_key"):
-                tav = Tavily(prompt_config["tavily_api_key"])
-                tav_res = tav.retrieve_chunks(" ".join(questions))
-                kbinfos["chunks"].extend(tav_res["chunks"])
-                kbinfos["doc_aggs"].extend(tav_res["doc_aggs"])
-            if prompt_config.get("use_kg"):
-                ck = settings.kg_retriever.retrieval(" ".join(questions), tenant_ids, dialog.kb_ids, embd_mdl,
-                                                       LLMBundle(dialog.tenant_id, LLMType.CHAT))
-                if ck["content_with_weight"]:
-                    kbinfos["chunks"].insert(0, ck)
-
+            kbinfos = await async_retrieval(dialog, " ".join(questions), kbs, tenant_ids, embd_mdl, rerank_mdl, chat_mdl, attachments)
             knowledges = kb_prompt(kbinfos, max_tokens)
 
     logging.debug("{}->{}".format(" ".join(questions), "\n->".join(knowledges)))
@@ -758,7 +802,8 @@ async def async_ask(question, kb_ids, tenant_id, chat_llm_name=None, search_conf
         metas = DocumentService.get_meta_by_kbs(kb_ids)
         doc_ids = await apply_meta_data_filter(meta_data_filter, metas, question, chat_mdl, doc_ids)
 
-    kbinfos = retriever.retrieval(
+    kbinfos = await asyncio.to_thread(
+        retriever.retrieval,
         question=question,
         embd_mdl=embd_mdl,
         tenant_ids=tenant_ids,
@@ -771,7 +816,7 @@ async def async_ask(question, kb_ids, tenant_id, chat_llm_name=None, search_conf
         doc_ids=doc_ids,
         aggs=False,
         rerank_mdl=rerank_mdl,
-        rank_feature=label_question(question, kbs)
+        rank_feature=await asyncio.to_thread(label_question, question, kbs)
     )
 
     knowledges = kb_prompt(kbinfos, max_tokens)
@@ -825,7 +870,8 @@ async def gen_mindmap(question, kb_ids, tenant_id, search_config={}):
         metas = DocumentService.get_meta_by_kbs(kb_ids)
         doc_ids = await apply_meta_data_filter(meta_data_filter, metas, question, chat_mdl, doc_ids)
 
-    ranks = settings.retriever.retrieval(
+    ranks = await asyncio.to_thread(
+        settings.retriever.retrieval,
         question=question,
         embd_mdl=embd_mdl,
         tenant_ids=tenant_ids,
@@ -838,7 +884,7 @@ async def gen_mindmap(question, kb_ids, tenant_id, search_config={}):
         doc_ids=doc_ids,
         aggs=False,
         rerank_mdl=rerank_mdl,
-        rank_feature=label_question(question, kbs),
+        rank_feature=await asyncio.to_thread(label_question, question, kbs),
     )
     mindmap = MindMapExtractor(chat_mdl)
     mind_map = await mindmap([c["content_with_weight"] for c in ranks["chunks"]])
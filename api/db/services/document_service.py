@@ -16,6 +16,7 @@
 import asyncio
 import json
 import logging
+import math
 import random
 import re
 from concurrent.futures import ThreadPoolExecutor
@@ -34,13 +35,17 @@ from api.db.db_utils import bulk_insert_into_db
 from api.db.services.common_service import CommonService
 from api.db.services.knowledgebase_service import KnowledgebaseService
 from common.misc_utils import get_uuid
-from common.time_utils import current_timestamp, get_format_time
+from common.time_utils import current_timestamp, datetime_format, get_format_time
 from common.constants import LLMType, ParserType, StatusEnum, TaskStatus, SVR_CONSUMER_GROUP_NAME
 from rag.nlp import rag_tokenizer, search
 from rag.utils.redis_conn import REDIS_CONN
+from rag.utils.retrieval_cache import bump_index_generation
 from rag.utils.doc_store_conn import OrderByExpr
 from common import settings
 
+# Documents whose progress is synchronized per round of queries and updates.
+SYNC_PROGRESS_BATCH_SIZE = 500
+
 
 class DocumentService(CommonService):
     model = Document
@@ -357,6 +362,7 @@ class DocumentService(CommonService):
                 if settings.STORAGE_IMPL.obj_exist(doc.kb_id, doc.thumbnail):
                     settings.STORAGE_IMPL.rm(doc.kb_id, doc.thumbnail)
             settings.docStoreConn.delete({"doc_id": doc.id}, search.index_name(tenant_id), doc.kb_id)
+            bump_index_generation(doc.kb_id)
 
             graph_source = settings.docStoreConn.get_fields(
                 settings.docStoreConn.search(["source_id"], [], {"kb_id": doc.kb_id, "knowledge_graph_kwd": ["graph"]}, [], OrderByExpr(), 0, 1, search.index_name(tenant_id), [doc.kb_id]), ["source_id"]
@@ -370,6 +376,7 @@ class DocumentService(CommonService):
                                              search.index_name(tenant_id), doc.kb_id)
                 settings.docStoreConn.delete({"kb_id": doc.kb_id, "knowledge_graph_kwd": ["entity", "relation", "graph", "subgraph", "community_report"], "must_not": {"exists": "source_id"}},
                                              search.index_name(tenant_id), doc.kb_id)
+                bump_index_generation(doc.kb_id)
         except Exception:
             pass
         return cls.delete_by_id(doc.id)
@@ -887,67 +894,132 @@ class DocumentService(CommonService):
     @classmethod
     @DB.connection_context()
     def _sync_progress(cls, docs:list[dict]):
-        from api.db.services.task_service import TaskService
+        """
+        Aggregate the tasks of `docs` into their progress, status and messages.
+
+        Tasks and current document states are read with one query per batch of
+        documents, queue lengths once per priority, and the documents whose
+        state changed are written with one CASE update per batch.
+        """
+        for i in range(0, len(docs), SYNC_PROGRESS_BATCH_SIZE):
+            try:
+                cls._sync_progress_batch(docs[i:i + SYNC_PROGRESS_BATCH_SIZE])
+            except Exception as e:
+                if str(e).find("'0'") < 0:
+                    logging.exception("fetch task exception")
 
+    @classmethod
+    def _sync_progress_batch(cls, docs:list[dict]):
+        doc_ids = [d["id"] for d in docs]
+        tasks = {}
+        for t in Task.select(Task.doc_id, Task.task_type, Task.progress, Task.progress_msg, Task.priority) \
+                .where(Task.doc_id.in_(doc_ids)).order_by(Task.doc_id, Task.create_time):
+            tasks.setdefault(t.doc_id, []).append(t)
+        current = {
+            r["id"]: r for r in cls.model.select(cls.model.id, cls.model.run, cls.model.progress, cls.model.progress_msg)
+            .where(cls.model.id.in_(doc_ids)).dicts()
+        }
+        queue_lengths = {}
+
+        def queue_length(priority):
+            if priority not in queue_lengths:
+                queue_lengths[priority] = get_queue_length(priority)
+            return queue_lengths[priority]
+
+        now = datetime.now()
+        no_begin_at = []
+        changes = {}
         for d in docs:
             try:
-                tsks = TaskService.query(doc_id=d["id"], order_by=Task.create_time)
-                if not tsks:
+                tsks = tasks.get(d["id"])
+                doc = current.get(d["id"])
+                if not tsks or not doc:
                     continue
-                msg = []
-                prg = 0
-                finished = True
-                bad = 0
-                e, doc = DocumentService.get_by_id(d["id"])
-                status = doc.run  # TaskStatus.RUNNING.value
-                doc_progress = doc.progress if doc and doc.progress else 0.0
-                special_task_running = False
-                priority = 0
-                for t in tsks:
-                    task_type = (t.task_type or "").lower()
-                    if task_type in PIPELINE_SPECIAL_PROGRESS_FREEZE_TASK_TYPES:
-                        special_task_running = True
-                    if 0 <= t.progress < 1:
-                        finished = False
-                    if t.progress == -1:
-                        bad += 1
-                    prg += t.progress if t.progress >= 0 else 0
-                    if t.progress_msg.strip():
-                        msg.append(t.progress_msg)
-                    priority = max(priority, t.priority)
-                prg /= len(tsks)
-                if finished and bad:
-                    prg = -1
-                    status = TaskStatus.FAIL.value
-                elif finished:
-                    prg = 1
-                    status = TaskStatus.DONE.value
-
-                # only for special task and parsed docs and unfinished
-                freeze_progress = special_task_running and doc_progress >= 1 and not finished
-                msg = "\n".join(sorted(msg))
                 begin_at = d.get("process_begin_at")
                 if not begin_at:
-                    begin_at = datetime.now()
+                    begin_at = now
                     # fallback
-                    cls.update_by_id(d["id"], {"process_begin_at": begin_at})
-
-                info = {
-                    "process_duration": max(datetime.timestamp(datetime.now()) - begin_at.timestamp(), 0),
-                    "run": status}
-                if prg != 0 and not freeze_progress:
-                    info["progress"] = prg
-                if msg:
-                    info["progress_msg"] = msg
-                    if msg.endswith("created task graphrag") or msg.endswith("created task raptor") or msg.endswith("created task mindmap"):
-                        info["progress_msg"] += "\n%d tasks are ahead in the queue..."%get_queue_length(priority)
-                else:
-                    info["progress_msg"] = "%d tasks are ahead in the queue..."%get_queue_length(priority)
-                cls.update_by_id(d["id"], info)
+                    no_begin_at.append(d["id"])
+                info = cls._aggregate_progress(doc, tsks, queue_length)
+                # The duration is only written along with a change, which includes the document finishing.
+                if any(cls._differs(doc.get(k), v) for k, v in info.items()):
+                    changes[d["id"]] = {**info, "process_duration": max(datetime.timestamp(now) - begin_at.timestamp(), 0)}
             except Exception as e:
                 if str(e).find("'0'") < 0:
                     logging.exception("fetch task exception")
 
+        if no_begin_at:
+            cls.model.update(process_begin_at=now).where(cls.model.id.in_(no_begin_at)).execute()
+        if changes:
+            cls._update_by_ids(changes)
+
+    @staticmethod
+    def _differs(stored, value) -> bool:
+        # progress is a single-precision FLOAT on MySQL, so 1/3 never reads back equal.
+        if isinstance(stored, float) and isinstance(value, float):
+            return not math.isclose(stored, value, abs_tol=1e-6)
+        return stored != value
+
+    @staticmethod
+    def _aggregate_progress(doc:dict, tsks:list, queue_length) -> dict:
+        """The run, progress and progress_msg of a document given its tasks in creation order."""
+        msg = []
+        prg = 0
+        finished = True
+        bad = 0
+        status = doc["run"]  # TaskStatus.RUNNING.value
+        doc_progress = doc["progress"] or 0.0
+        special_task_running = False
+        priority = 0
+        for t in tsks:
+            task_type = (t.task_type or "").lower()
+            if task_type in PIPELINE_SPECIAL_PROGRESS_FREEZE_TASK_TYPES:
+                special_task_running = True
+            if 0 <= t.progress < 1:
+                finished = False
+            if t.progress == -1:
+                bad += 1
+            prg += t.progress if t.progress >= 0 else 0
+            if t.progress_msg.strip():
+                msg.append(t.progress_msg)
+            priority = max(priority, t.priority)
+        prg /= len(tsks)
+        if finished and bad:
+            prg = -1
+            status = TaskStatus.FAIL.value
+        elif finished:
+            prg = 1
+            status = TaskStatus.DONE.value
+
+        # only for special task and parsed docs and unfinished
+        freeze_progress = special_task_running and doc_progress >= 1 and not finished
+        msg = "\n".join(sorted(msg))
+
+        info = {"run": status}
+        if prg != 0 and not freeze_progress:
+            info["progress"] = prg
+        if msg:
+            info["progress_msg"] = msg
+            if msg.endswith("created task graphrag") or msg.endswith("created task raptor") or msg.endswith("created task mindmap"):
+                info["progress_msg"] += "\n%d tasks are ahead in the queue..."%queue_length(priority)
+        else:
+            info["progress_msg"] = "%d tasks are ahead in the queue..."%queue_length(priority)
+        return info
+
+    @classmethod
+    def _update_by_ids(cls, updates:dict[str, dict]):
+        """Write per-document field values with one UPDATE: each field is a CASE over the document ids."""
+        if not updates:
+            return 0
+        fields = {}
+        for doc_id, info in updates.items():
+            for k, v in info.items():
+                fields.setdefault(k, []).append((cls.model.id == doc_id, v))
+        data = {k: Case(None, whens, getattr(cls.model, k)) for k, whens in fields.items()}
+        data["update_time"] = current_timestamp()
+        data["update_date"] = datetime_format(datetime.now())
+        return cls.model.update(data).where(cls.model.id.in_(list(updates.keys()))).execute()
+
     @classmethod
     @DB.connection_context()
     def get_kb_doc_count(cls, kb_id):
@@ -1234,6 +1306,8 @@ def doc_upload_and_parse(conversation_id, file_objs, user_id):
                     settings.docStoreConn.createIdx(idxnm, kb_id, len(vectors[0]))
                 try_create_idx = False
             settings.docStoreConn.insert(cks[b:b + es_bulk_size], idxnm, kb_id)
+        settings.docStoreConn.refresh(idxnm, kb_id)
+        bump_index_generation(kb_id)
 
         DocumentService.increment_chunk_num(
             doc_id, kb.id, token_counts[doc_id], chunk_counts[doc_id], 0)
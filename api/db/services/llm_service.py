@@ -14,6 +14,7 @@
 #  limitations under the License.
 #
 import asyncio
+import copy
 import inspect
 import logging
 import queue
@@ -22,11 +23,14 @@ import threading
 from functools import partial
 from typing import Generator
 
+import numpy as np
+
 from api.db.db_models import LLM
 from api.db.services.common_service import CommonService
 from api.db.services.tenant_llm_service import LLM4Tenant, TenantLLMService
 from common.constants import LLMType
 from common.token_utils import num_tokens_from_string
+from rag.utils.embed_cache import EMBEDDING_CACHE_ENABLED, mget_embed_cache, mset_embed_cache
 
 
 class LLMService(CommonService):
@@ -90,6 +94,8 @@ class LLMBundle(LLM4Tenant):
         if not self.is_tools:
             logging.warning(f"Model {self.llm_name} does not support tool call, but you have assigned one or more tools to it!")
             return
+        # The model instance may be shared through the model pool; bind the tools to a copy of it.
+        self.mdl = copy.copy(self.mdl)
         self.mdl.bind_tools(toolcall_session, tools)
 
     def encode(self, texts: list):
@@ -105,7 +111,10 @@ class LLMBundle(LLM4Tenant):
             else:
                 safe_texts.append(text)
 
-        embeddings, used_tokens = self.mdl.encode(safe_texts)
+        if EMBEDDING_CACHE_ENABLED and self.llm_name:
+            embeddings, used_tokens = self._encode_with_cache(safe_texts)
+        else:
+            embeddings, used_tokens = self.mdl.encode(safe_texts)
 
         llm_name = getattr(self, "llm_name", None)
         if not TenantLLMService.increase_usage(self.tenant_id, self.llm_type, used_tokens, llm_name):
@@ -117,6 +126,19 @@ class LLMBundle(LLM4Tenant):
 
         return embeddings, used_tokens
 
+    def _encode_with_cache(self, texts: list):
+        # Only cache misses are sent to the provider; cached vectors cost no tokens.
+        vectors = mget_embed_cache(self.llm_name, texts)
+        misses = [i for i, v in enumerate(vectors) if v is None]
+        used_tokens = 0
+        if misses:
+            miss_texts = [texts[i] for i in misses]
+            embeddings, used_tokens = self.mdl.encode(miss_texts)
+            mset_embed_cache(self.llm_name, miss_texts, embeddings)
+            for i, v in zip(misses, embeddings):
+                vectors[i] = v
+        return np.array(vectors), used_tokens
+
     def encode_queries(self, query: str):
         if self.langfuse:
             generation = self.langfuse.start_generation(trace_context=self.trace_context, name="encode_queries", model=self.llm_name, input={"query": query})
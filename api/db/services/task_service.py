@@ -13,15 +13,18 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 #
+import atexit
 import logging
 import os
 import random
+import threading
+import time
 import xxhash
 from datetime import datetime
 
 from api.db.db_utils import bulk_insert_into_db
 from deepdoc.parser import PdfParser
-from peewee import JOIN
+from peewee import JOIN, Case
 from api.db.db_models import DB, File2Document, File
 from api.db import FileType
 from api.db.db_models import Task, Document, Knowledgebase, Tenant
@@ -32,11 +35,13 @@ from common.time_utils import current_timestamp
 from common.constants import StatusEnum, TaskStatus
 from deepdoc.parser.excel_parser import RAGFlowExcelParser
 from rag.utils.redis_conn import REDIS_CONN
+from rag.utils.retrieval_cache import bump_index_generation
 from common import settings
 from rag.nlp import search
 
 CANVAS_DEBUG_DOC_ID = "dataflow_x"
 GRAPH_RAPTOR_FAKE_DOC_ID = "graph_raptor_x"
+PROGRESS_FLUSH_INTERVAL = float(os.environ.get("PROGRESS_FLUSH_INTERVAL", 1))
 
 def trim_header_by_lines(text: str, max_length) -> str:
     # Trim header text to maximum length while preserving line breaks
@@ -267,13 +272,21 @@ class TaskService(CommonService):
         return doc.run == TaskStatus.CANCEL.value or doc.progress < 0
 
     @classmethod
-    @DB.connection_context()
     def update_progress(cls, id, info):
         """Update the progress information for a task.
 
-        This method updates both the progress message and completion percentage of a task.
-        It handles platform-specific behavior (macOS vs others) and uses database locking
-        when necessary to ensure thread safety.
+        Updates are coalesced per task by `task_progress_buffer` and written every
+        PROGRESS_FLUSH_INTERVAL seconds; a progress of 1.0 or -1 is written at once.
+        See `update_progress_now` for the update rules.
+        """
+        if PROGRESS_FLUSH_INTERVAL > 0:
+            return task_progress_buffer.add(id, info)
+        return cls.update_progress_now(id, info)
+
+    @classmethod
+    @DB.connection_context()
+    def update_progress_now(cls, id, info):
+        """Update the progress information for a task.
 
         Update Rules:
             - progress_msg: Always appends the new message to the existing one, and trims the result to max 3000 lines.
@@ -281,47 +294,38 @@ class TaskService(CommonService):
                         (the new progress is -1 OR greater than the existing progress),
                         to avoid overwriting valid progress with invalid or regressive values.
 
+        The message, progress and process duration are written by one UPDATE, which
+        only applies if the message was not changed since it was read, and is retried
+        otherwise. No lock is taken.
+
         Args:
             id (str): The unique identifier of the task to update.
             info (dict): Dictionary containing progress information with keys:
                         - progress_msg (str, optional): Progress message to append
                         - progress (float, optional): Progress percentage (0.0 to 1.0)
         """
-        task = cls.model.get_by_id(id)
-        if not task:
-            logging.warning("Update_progress error: task not found")
-            return
-
-        if os.environ.get("MACOS"):
-            if info["progress_msg"]:
-                progress_msg = trim_header_by_lines(task.progress_msg + "\n" + info["progress_msg"], 3000)
-                cls.model.update(progress_msg=progress_msg).where(cls.model.id == id).execute()
+        for _ in range(5):
+            task = cls.model.get_or_none(cls.model.id == id)
+            if not task:
+                logging.warning("Update_progress error: task not found")
+                return
+            fields = {}
+            if info.get("progress_msg"):
+                fields["progress_msg"] = trim_header_by_lines((task.progress_msg or "") + "\n" + info["progress_msg"], 3000)
             if "progress" in info:
                 prog = info["progress"]
-                cls.model.update(progress=prog).where(
-                    (cls.model.id == id) &
-                    (
-                            (cls.model.progress != -1) &
-                            ((prog == -1) | (prog > cls.model.progress))
-                    )
-                ).execute()
-        else:
-            with DB.lock("update_progress", -1):
-                if info["progress_msg"]:
-                    progress_msg = trim_header_by_lines(task.progress_msg + "\n" + info["progress_msg"], 3000)
-                    cls.model.update(progress_msg=progress_msg).where(cls.model.id == id).execute()
-                if "progress" in info:
-                    prog = info["progress"]
-                    cls.model.update(progress=prog).where(
-                        (cls.model.id == id) &
-                        (
-                            (cls.model.progress != -1) &
-                            ((prog == -1) | (prog > cls.model.progress))
-                        )
-                    ).execute()
-
-        process_duration = (datetime.now() - task.begin_at).total_seconds()
-        cls.model.update(process_duration=process_duration).where(cls.model.id == id).execute()
+                applies = cls.model.progress != -1
+                if prog != -1:
+                    applies = applies & (cls.model.progress < prog)
+                fields["progress"] = Case(None, [(applies, prog)], cls.model.progress)
+            if task.begin_at:
+                fields["process_duration"] = (datetime.now() - task.begin_at).total_seconds()
+            if not fields:
+                return
+            cond = cls.model.progress_msg.is_null() if task.progress_msg is None else cls.model.progress_msg == task.progress_msg
+            if cls.model.update(**fields).where((cls.model.id == id) & cond).execute():
+                return
+        logging.warning(f"Update_progress of task {id} kept conflicting with concurrent updates")
 
     @classmethod
     @DB.connection_context()
@@ -425,6 +429,7 @@ def queue_tasks(doc: dict, bucket: str, name: str, priority: int):
         if pre_chunk_ids:
             settings.docStoreConn.delete({"id": pre_chunk_ids}, search.index_name(chunking_config["tenant_id"]),
                                          chunking_config["kb_id"])
+            bump_index_generation(chunking_config["kb_id"])
     DocumentService.update_by_id(doc["id"], {"chunk_num": ck_num})
 
     bulk_insert_into_db(Task, parse_task_array, True)
@@ -528,3 +533,75 @@ def queue_dataflow(tenant_id:str, flow_id:str, task_id:str, doc_id:str=CANVAS_DE
         return False, "Can't access Redis. Please check the Redis' status."
 
     return True, ""
+
+
+class TaskProgressBuffer:
+    """
+    Coalesces progress updates of tasks in memory and writes them in batches.
+
+    All messages of a task since the last flush become one appended message and
+    its progress values one conditional update, so a task costs one UPDATE per
+    `interval` seconds however often it reports. A progress of 1.0 or -1 flushes
+    the task at once, so finished, failed and cancelled tasks are visible without delay.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    @staticmethod
+    def _merge(pending, info):
+        if info.get("progress_msg"):
+            pending["progress_msg"] = pending["progress_msg"] + "\n" + info["progress_msg"] if pending.get("progress_msg") else info["progress_msg"]
+        if "progress" in info:
+            # Same outcome as applying the values one by one: -1 sticks, otherwise the largest wins.
+            prog, prev = info["progress"], pending.get("progress")
+            if prev is None or (prev != -1 and (prog == -1 or prog > prev)):
+                pending["progress"] = prog
+
+    def add(self, task_id, info):
+        with self._lock:
+            self._merge(self._pending.setdefault(task_id, {}), info)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="task_progress_flusher", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        if info.get("progress") in (1, -1):
+            self.flush(task_id)
+
+    def flush(self, task_id=None):
+        with self._flush_lock:
+            with self._lock:
+                if task_id is None:
+                    pending, self._pending = self._pending, {}
+                else:
+                    pending = {task_id: self._pending.pop(task_id)} if task_id in self._pending else {}
+            failed = {}
+            for tid, info in pending.items():
+                try:
+                    TaskService.update_progress_now(tid, info)
+                except Exception:
+                    logging.exception(f"TaskProgressBuffer.flush({tid}) got exception")
+                    failed[tid] = info
+            if failed:
+                with self._lock:
+                    for tid, info in failed.items():
+                        newer = self._pending.get(tid)
+                        self._pending[tid] = dict(info)
+                        if newer:
+                            self._merge(self._pending[tid], newer)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+task_progress_buffer = TaskProgressBuffer(PROGRESS_FLUSH_INTERVAL)
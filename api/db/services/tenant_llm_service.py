@@ -13,9 +13,14 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 #
+import atexit
 import os
 import json
 import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+import xxhash
 from peewee import IntegrityError
 from langfuse import Langfuse
 from common import settings
@@ -24,8 +29,15 @@ from api.db.db_models import DB, LLMFactories, TenantLLM
 from api.db.services.common_service import CommonService
 from api.db.services.langfuse_service import TenantLangfuseService
 from api.db.services.user_service import TenantService
+from rag.utils.redis_conn import REDIS_CONN
 from rag.llm import ChatModel, CvModel, EmbeddingModel, OcrModel, RerankModel, Seq2txtModel, TTSModel
 
+# Constructed model clients are reused for MODEL_POOL_TTL seconds; 0 builds one per LLMBundle.
+MODEL_POOL_SIZE = int(os.environ.get("MODEL_POOL_SIZE", 256))
+MODEL_POOL_TTL = float(os.environ.get("MODEL_POOL_TTL", 300))
+# Seconds between writes of buffered token usage to the database; 0 writes on every model call.
+TOKEN_USAGE_FLUSH_INTERVAL = float(os.environ.get("TOKEN_USAGE_FLUSH_INTERVAL", 5))
+
 
 class LLMFactoriesService(CommonService):
     model = LLMFactories
@@ -188,14 +200,8 @@ class TenantLLMService(CommonService):
 
         return None
 
-    @classmethod
-    @DB.connection_context()
-    def increase_usage(cls, tenant_id, llm_type, used_tokens, llm_name=None):
-        e, tenant = TenantService.get_by_id(tenant_id)
-        if not e:
-            logging.error(f"Tenant not found: {tenant_id}")
-            return 0
-
+    @staticmethod
+    def usage_model_name(tenant, llm_type, llm_name=None):
         llm_map = {
             LLMType.EMBEDDING.value: tenant.embd_id if not llm_name else llm_name,
             LLMType.SPEECH2TEXT.value: tenant.asr_id,
@@ -205,8 +211,42 @@ class TenantLLMService(CommonService):
             LLMType.TTS.value: tenant.tts_id if not llm_name else llm_name,
             LLMType.OCR.value: llm_name,
         }
+        return llm_map.get(llm_type)
+
+    @classmethod
+    def increase_usage(cls, tenant_id, llm_type, used_tokens, llm_name=None):
+        if TOKEN_USAGE_FLUSH_INTERVAL > 0:
+            # Resolved now: the tenant may change its default models before the buffer is flushed.
+            mdlnm = cls.resolve_usage_model_name(tenant_id, llm_type, llm_name)
+            if mdlnm is None:
+                return 0
+            return token_usage_buffer.add(tenant_id, mdlnm, used_tokens)
+        return cls.increase_usage_now(tenant_id, llm_type, used_tokens, llm_name)
+
+    @classmethod
+    def resolve_usage_model_name(cls, tenant_id, llm_type, llm_name=None):
+        """The model `increase_usage_now` would charge; the tenant is only read when its defaults decide it."""
+        if llm_type == LLMType.OCR.value or (llm_name and llm_type in [LLMType.EMBEDDING.value, LLMType.CHAT.value, LLMType.RERANK.value, LLMType.TTS.value]):
+            mdlnm = llm_name
+        else:
+            e, tenant = TenantService.get_by_id(tenant_id)
+            if not e:
+                logging.error(f"Tenant not found: {tenant_id}")
+                return None
+            mdlnm = cls.usage_model_name(tenant, llm_type, llm_name)
+        if mdlnm is None:
+            logging.error(f"LLM type error: {llm_type}")
+        return mdlnm
 
-        mdlnm = llm_map.get(llm_type)
+    @classmethod
+    @DB.connection_context()
+    def increase_usage_now(cls, tenant_id, llm_type, used_tokens, llm_name=None):
+        e, tenant = TenantService.get_by_id(tenant_id)
+        if not e:
+            logging.error(f"Tenant not found: {tenant_id}")
+            return 0
+
+        mdlnm = cls.usage_model_name(tenant, llm_type, llm_name)
         if mdlnm is None:
             logging.error(f"LLM type error: {llm_type}")
             return 0
@@ -228,6 +268,31 @@ class TenantLLMService(CommonService):
 
         return num
 
+    @classmethod
+    @DB.connection_context()
+    def apply_usage_deltas(cls, deltas: dict) -> dict:
+        """
+        Add buffered token counts, keyed by (tenant_id, model name), in one transaction.
+
+        Returns the deltas that were not written because the database failed, for
+        the caller to retry.
+        """
+        merged = {}
+        for (tenant_id, mdlnm), used_tokens in deltas.items():
+            key = (tenant_id, *TenantLLMService.split_model_name_and_factory(mdlnm))
+            merged[key] = merged.get(key, 0) + used_tokens
+
+        try:
+            with DB.atomic():
+                for (tenant_id, llm_name, llm_factory), used_tokens in merged.items():
+                    cls.model.update(used_tokens=cls.model.used_tokens + used_tokens).where(
+                        cls.model.tenant_id == tenant_id, cls.model.llm_name == llm_name,
+                        cls.model.llm_factory == llm_factory if llm_factory else True).execute()
+        except Exception:
+            logging.exception("TenantLLMService.apply_usage_deltas got exception, will retry %d deltas", len(deltas))
+            return deltas
+        return {}
+
     @classmethod
     @DB.connection_context()
     def get_openai_models(cls):
@@ -324,25 +389,177 @@ class TenantLLMService(CommonService):
         return None
 
 
+class TokenUsageBuffer:
+    """
+    Accumulates token usage in memory and writes it to TenantLLM in batches.
+
+    Model calls only add to a counter; a background thread flushes the sums every
+    `interval` seconds, and once more at interpreter exit. A delta is removed only
+    after its transaction committed, so a failed flush is retried with the next one.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._deltas = defaultdict(int)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def add(self, tenant_id, llm_name, used_tokens):
+        """Count `used_tokens` against the tenant's model `llm_name`, as resolved when the call was made."""
+        with self._lock:
+            self._deltas[(tenant_id, llm_name)] += int(used_tokens or 0)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="token_usage_flusher", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        return 1
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                deltas, self._deltas = self._deltas, defaultdict(int)
+            deltas = {k: v for k, v in deltas.items() if v}
+            if not deltas:
+                return
+            try:
+                failed = TenantLLMService.apply_usage_deltas(deltas)
+            except Exception:
+                logging.exception("TokenUsageBuffer.flush got exception")
+                failed = deltas
+            if failed:
+                with self._lock:
+                    for k, v in failed.items():
+                        self._deltas[k] += v
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(self._deltas.values())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+token_usage_buffer = TokenUsageBuffer(TOKEN_USAGE_FLUSH_INTERVAL)
+
+
+class TenantModelPool:
+    """
+    Constructed model clients, their configs and Langfuse clients, shared across requests.
+
+    Building an LLM4Tenant costs several DB queries, a fresh HTTP client and a
+    Langfuse `auth_check()` round trip. Entries are keyed by tenant, model type,
+    name and constructor arguments, and live for `ttl` seconds. Editing a tenant's
+    models bumps the tenant's generation in Redis through `invalidate`, which
+    makes every process drop its entries for that tenant.
+    """
+
+    GENERATION_PREFIX = "llm_pool_gen:"
+
+    def __init__(self, capacity: int, ttl: float):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._models = OrderedDict()
+        self._langfuse = {}
+
+    @staticmethod
+    def _generation(tenant_id):
+        try:
+            return REDIS_CONN.get(TenantModelPool.GENERATION_PREFIX + str(tenant_id))
+        except Exception:
+            return None
+
+    @staticmethod
+    def _key(tenant_id, llm_type, llm_name, lang, kwargs):
+        params = json.dumps(kwargs, sort_keys=True, default=str)
+        return str(tenant_id), str(llm_type), llm_name, lang, xxhash.xxh64(params).hexdigest()
+
+    def _lookup(self, cache, key, generation):
+        with self._lock:
+            entry = cache.get(key)
+            if entry is None:
+                return None
+            expire_at, gen, value = entry
+            if expire_at < time.time() or gen != generation:
+                del cache[key]
+                return None
+            if cache is self._models:
+                cache.move_to_end(key)
+            return value
+
+    def model(self, tenant_id, llm_type, llm_name=None, lang="Chinese", **kwargs):
+        """Returns (model instance, model config); the instance may be shared, so don't mutate it."""
+        if self.ttl <= 0:
+            return self._build(tenant_id, llm_type, llm_name, lang, **kwargs)
+        key = self._key(tenant_id, llm_type, llm_name, lang, kwargs)
+        generation = self._generation(tenant_id)
+        hit = self._lookup(self._models, key, generation)
+        if hit is not None:
+            return hit
+        value = self._build(tenant_id, llm_type, llm_name, lang, **kwargs)
+        if value[0] is not None:
+            with self._lock:
+                self._models[key] = (time.time() + self.ttl, generation, value)
+                self._models.move_to_end(key)
+                while len(self._models) > self.capacity:
+                    self._models.popitem(last=False)
+        return value
+
+    @staticmethod
+    def _build(tenant_id, llm_type, llm_name, lang, **kwargs):
+        mdl = TenantLLMService.model_instance(tenant_id, llm_type, llm_name, lang=lang, **kwargs)
+        model_config = TenantLLMService.get_model_config(tenant_id, llm_type, llm_name)
+        return mdl, model_config
+
+    def langfuse(self, tenant_id):
+        """The tenant's authenticated Langfuse client, or None."""
+        generation = self._generation(tenant_id)
+        if self.ttl > 0:
+            hit = self._lookup(self._langfuse, str(tenant_id), generation)
+            if hit is not None:
+                return hit[0]
+        langfuse = None
+        langfuse_keys = TenantLangfuseService.filter_by_tenant(tenant_id=tenant_id)
+        if langfuse_keys:
+            client = Langfuse(public_key=langfuse_keys.public_key, secret_key=langfuse_keys.secret_key,
+                              host=langfuse_keys.host)
+            if client.auth_check():
+                langfuse = client
+        if self.ttl > 0:
+            with self._lock:
+                # Wrapped in a tuple so that "no Langfuse" is cached as well.
+                self._langfuse[str(tenant_id)] = (time.time() + self.ttl, generation, (langfuse,))
+        return langfuse
+
+    def invalidate(self, tenant_id):
+        """Call after a tenant's models, default models or Langfuse keys changed."""
+        REDIS_CONN.incrby(self.GENERATION_PREFIX + str(tenant_id), 1)
+        tenant_id = str(tenant_id)
+        with self._lock:
+            for k in [k for k in self._models if k[0] == tenant_id]:
+                del self._models[k]
+            self._langfuse.pop(tenant_id, None)
+
+
+model_pool = TenantModelPool(MODEL_POOL_SIZE, MODEL_POOL_TTL)
+
+
 class LLM4Tenant:
     def __init__(self, tenant_id, llm_type, llm_name=None, lang="Chinese", **kwargs):
         self.tenant_id = tenant_id
         self.llm_type = llm_type
         self.llm_name = llm_name
-        self.mdl = TenantLLMService.model_instance(tenant_id, llm_type, llm_name, lang=lang, **kwargs)
+        self.mdl, model_config = model_pool.model(tenant_id, llm_type, llm_name, lang=lang, **kwargs)
         assert self.mdl, "Can't find model for {}/{}/{}".format(tenant_id, llm_type, llm_name)
-        model_config = TenantLLMService.get_model_config(tenant_id, llm_type, llm_name)
         self.max_length = model_config.get("max_tokens", 8192)
 
         self.is_tools = model_config.get("is_tools", False)
         self.verbose_tool_use = kwargs.get("verbose_tool_use")
 
-        langfuse_keys = TenantLangfuseService.filter_by_tenant(tenant_id=tenant_id)
-        self.langfuse = None
-        if langfuse_keys:
-            langfuse = Langfuse(public_key=langfuse_keys.public_key, secret_key=langfuse_keys.secret_key,
-                                host=langfuse_keys.host)
-            if langfuse.auth_check():
-                self.langfuse = langfuse
-                trace_id = self.langfuse.create_trace_id()
-                self.trace_context = {"trace_id": trace_id}
+        self.langfuse = model_pool.langfuse(tenant_id)
+        if self.langfuse:
+            trace_id = self.langfuse.create_trace_id()
+            self.trace_context = {"trace_id": trace_id}
@@ -0,0 +1,107 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Page images of a PDF, rendered when first used and kept in a bounded window.
+
+A 300-page document rendered at 216 DPI takes about 4 GB when every page is held
+as a PIL image. `PdfPageImages` behaves like the list of those images, but renders
+a page on first access and keeps only the `window` most recently used ones. A page
+that fell out of the window is rendered again; that is cheaper than writing it to
+disk as PNG and reading it back.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pdfplumber
+
+# Page images held in memory per document; 0 keeps them all.
+PDF_PAGE_WINDOW = int(os.environ.get("PDF_PAGE_WINDOW", 32))
+
+
+class PdfPageImages:
+    def __init__(self, fnm, resolution: int, page_from: int, page_to: int, lock, window: int = PDF_PAGE_WINDOW):
+        """
+        Pages `page_from` to `page_to` (exclusive) of `fnm`, a path or the PDF bytes.
+        `lock` serializes pdfplumber, which is not thread safe.
+        """
+        self._lock = lock
+        self._resolution = resolution
+        self._window = window
+        with self._lock:
+            self._pdf = pdfplumber.open(fnm) if isinstance(fnm, str) else pdfplumber.open(BytesIO(fnm))
+        self._pages = list(range(len(self._pdf.pages)))[page_from:page_to]
+        self._cache = OrderedDict()
+        self._sizes = {}
+        self._mutex = threading.RLock()
+
+    @property
+    def pdf(self):
+        """The open pdfplumber document; use it while holding the lock."""
+        return self._pdf
+
+    def __len__(self):
+        return len(self._pages)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("page image index out of range")
+        with self._mutex:
+            img = self._cache.get(i)
+            if img is not None:
+                self._cache.move_to_end(i)
+                return img
+            img = self._render(i)
+            self._sizes[i] = img.size
+            self._cache[i] = img
+            while 0 < self._window < len(self._cache):
+                self._cache.popitem(last=False)
+            return img
+
+    def size(self, i):
+        """Size of page `i`'s image, rendering it only if it never was."""
+        with self._mutex:
+            if i not in self._sizes:
+                self[i]
+            return self._sizes[i]
+
+    def _render(self, i):
+        with self._lock:
+            page = self._pdf.pages[self._pages[i]]
+            img = page.to_image(resolution=self._resolution, antialias=True).annotated
+            # Drop the layout objects pdfplumber caches for the page.
+            page.close()
+        return img
+
+    def close(self):
+        with self._mutex:
+            self._cache.clear()
+        try:
+            with self._lock:
+                self._pdf.close()
+        except Exception:
+            logging.exception("PdfPageImages.close")
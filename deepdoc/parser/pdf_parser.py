@@ -24,6 +24,8 @@ import sys
 import threading
 from collections import Counter, defaultdict
 from copy import deepcopy
+from functools import wraps
+from inspect import signature
 from io import BytesIO
 from timeit import default_timer as timer
 
@@ -38,8 +40,10 @@ from sklearn.metrics import silhouette_score
 
 from common.file_utils import get_project_base_directory
 from common.misc_utils import pip_install_torch
-from deepdoc.vision import OCR, AscendLayoutRecognizer, LayoutRecognizer, Recognizer, TableStructureRecognizer
+from deepdoc.parser.pdf_page_images import PdfPageImages
+from deepdoc.vision import OCR, AscendLayoutRecognizer, LayoutRecognizer, RecognitionBatcher, Recognizer, TableStructureRecognizer
 from rag.nlp import rag_tokenizer
+from rag.utils.parse_cache import get_parse_cache, parse_cache_enabled, parse_cache_key, set_parse_cache, state_digest
 from rag.prompts.generator import vision_llm_describe_prompt
 from common import settings
 
@@ -48,6 +52,39 @@ if LOCK_KEY_pdfplumber not in sys.modules:
     sys.modules[LOCK_KEY_pdfplumber] = threading.Lock()
 
 
+def parse_cached(stage, attrs):
+    """
+    Caches a vision stage of RAGFlowPdfParser in the parse cache.
+
+    The entry is keyed by the file `__images__` hashed, the stage, its arguments and
+    the boxes it starts from, which earlier stages and their options shape. On a
+    hit, `attrs` are restored and the stage does not run; otherwise they are stored
+    once it ran.
+    """
+
+    def decorator(func):
+        sig = signature(func)
+
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            bound = sig.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = self._stage_cache_key(stage, state_digest(getattr(self, "boxes", None)), *list(bound.arguments.values())[1:])
+            state = get_parse_cache(key) if key else None
+            if state is not None:
+                for a in attrs:
+                    setattr(self, a, state[a])
+                logging.info(f"{func.__name__} restored from the parse cache")
+                return
+            func(self, *args, **kwargs)
+            if key:
+                set_parse_cache(key, {a: getattr(self, a) for a in attrs})
+
+        return wrapper
+
+    return decorator
+
+
 class RAGFlowPdfParser:
     def __init__(self, **kwargs):
         """
@@ -192,6 +229,7 @@ class RAGFlowPdfParser:
                     return False
         return True
 
+    @parse_cached("tsr", ["boxes", "tb_cpns"])
     def _table_transformer_job(self, ZM):
         logging.debug("Table processing...")
         imgs, pos = [], []
@@ -285,7 +323,7 @@ class RAGFlowPdfParser:
 
         start = timer()
         if not bxs:
-            self.boxes.append([])
+            self.boxes[pagenum - 1] = []
             return
         bxs = [(line[0], line[1][0]) for line in bxs]
         bxs = Recognizer.sort_Y_firstly(
@@ -324,7 +362,6 @@ class RAGFlowPdfParser:
             del b["chars"]
 
         logging.info(f"__ocr sorting {len(chars)} chars cost {timer() - start}s")
-        start = timer()
         boxes_to_reg = []
         img_np = np.array(img)
         for b in bxs:
@@ -333,16 +370,20 @@ class RAGFlowPdfParser:
                 b["box_image"] = self.ocr.get_rotate_crop_image(img_np, np.array([[left, top], [right, top], [right, bott], [left, bott]], dtype=np.float32))
                 boxes_to_reg.append(b)
             del b["txt"]
-        texts = self.ocr.recognize_batch([b["box_image"] for b in boxes_to_reg], device_id)
-        for i in range(len(boxes_to_reg)):
-            boxes_to_reg[i]["text"] = texts[i]
-            del boxes_to_reg[i]["box_image"]
-        logging.info(f"__ocr recognize {len(bxs)} boxes cost {timer() - start}s")
-        bxs = [b for b in bxs if b["text"]]
-        if self.mean_height[pagenum - 1] == 0:
-            self.mean_height[pagenum - 1] = np.median([b["bottom"] - b["top"] for b in bxs])
-        self.boxes.append(bxs)
 
+        def __recognized(texts):
+            for b, t in zip(boxes_to_reg, texts):
+                b["text"] = t
+                del b["box_image"]
+            page_bxs = [b for b in bxs if b["text"]]
+            if self.mean_height[pagenum - 1] == 0:
+                self.mean_height[pagenum - 1] = np.median([b["bottom"] - b["top"] for b in page_bxs])
+            self.boxes[pagenum - 1] = page_bxs
+
+        # Text lines are recognized together with those of the next pages.
+        self.rec_batchers[device_id or 0].add([b["box_image"] for b in boxes_to_reg], __recognized)
+
+    @parse_cached("layout", ["boxes", "page_layout"])
     def _layouts_rec(self, ZM, drop=True):
         assert len(self.page_images) == len(self.boxes)
         self.boxes, self.page_layout = self.layouter(self.page_images, self.boxes, ZM, drop=drop)
@@ -951,6 +992,12 @@ class RAGFlowPdfParser:
                 return j
         return
 
+    def _page_image_size(self, i):
+        """Size of page image `i`; a PdfPageImages knows it without rendering the page again."""
+        if isinstance(self.page_images, PdfPageImages):
+            return self.page_images.size(i)
+        return self.page_images[i].size
+
     def _line_tag(self, bx, ZM):
         pn = [bx["page_number"]]
         top = bx["top"] - self.page_cum_height[pn[0] - 1]
@@ -958,8 +1005,8 @@ class RAGFlowPdfParser:
         page_images_cnt = len(self.page_images)
         if pn[-1] - 1 >= page_images_cnt:
             return ""
-        while bott * ZM > self.page_images[pn[-1] - 1].size[1]:
-            bott -= self.page_images[pn[-1] - 1].size[1] / ZM
+        while bott * ZM > self._page_image_size(pn[-1] - 1)[1]:
+            bott -= self._page_image_size(pn[-1] - 1)[1] / ZM
             pn.append(pn[-1] + 1)
             if pn[-1] - 1 >= page_images_cnt:
                 return ""
@@ -976,7 +1023,7 @@ class RAGFlowPdfParser:
         def usefull(b):
             if b.get("layout_type"):
                 return True
-            if width(b) > self.page_images[b["page_number"] - 1].size[0] / ZM / 3:
+            if width(b) > self._page_image_size(b["page_number"] - 1)[0] / ZM / 3:
                 return True
             if b["bottom"] - b["top"] > self.mean_height[b["page_number"] - 1]:
                 return True
@@ -986,7 +1033,7 @@ class RAGFlowPdfParser:
         while boxes:
             lines = []
             widths = []
-            pw = self.page_images[boxes[0]["page_number"] - 1].size[0] / ZM
+            pw = self._page_image_size(boxes[0]["page_number"] - 1)[0] / ZM
             mh = self.mean_height[boxes[0]["page_number"] - 1]
             mj = self.proj_match(boxes[0]["text"]) or boxes[0].get("layout_type", "") == "title"
 
@@ -1037,7 +1084,49 @@ class RAGFlowPdfParser:
         except Exception:
             logging.exception("total_page_number")
 
+    # What __images__ leaves for the later stages, apart from the page images.
+    OCR_STATE = ["boxes", "lefted_chars", "mean_height", "mean_width", "page_cum_height", "is_english", "outlines", "total_page", "page_zoomin"]
+
+    def _stage_cache_key(self, stage, *args):
+        if not getattr(self, "_parse_cache_key", None):
+            return None
+        return parse_cache_key(self._parse_cache_key.encode("utf-8"), stage, *args)
+
     def __images__(self, fnm, zoomin=3, page_from=0, page_to=299, callback=None):
+        self._parse_cache_key = None
+        if parse_cache_enabled():
+            if isinstance(fnm, str):
+                with open(fnm, "rb") as f:
+                    binary = f.read()
+            else:
+                binary = fnm
+            self._parse_cache_key = parse_cache_key(binary, type(self.layouter).__name__, getattr(self, "model_speciess", ""), page_from, page_to)
+
+        key = self._stage_cache_key("ocr", zoomin)
+        state = get_parse_cache(key) if key else None
+        if state is None:
+            self._ocr_images(fnm, zoomin, page_from, page_to, callback)
+            if key:
+                set_parse_cache(key, {a: getattr(self, a) for a in self.OCR_STATE})
+            return
+
+        for a in self.OCR_STATE:
+            setattr(self, a, state[a])
+        self.page_cum_height = np.array(self.page_cum_height)
+        self.page_chars = []
+        self.garbages = {}
+        self.page_layout = []
+        self.page_from = page_from
+        if isinstance(getattr(self, "page_images", None), PdfPageImages):
+            self.page_images.close()
+        # Only the pages that get cropped later are rendered.
+        self.page_images = PdfPageImages(fnm, 72 * self.page_zoomin, page_from, page_to, sys.modules[LOCK_KEY_pdfplumber])
+        logging.info(f"__images__ restored {len(self.page_images)} pages from the parse cache")
+        if callback:
+            callback(0.6, "OCR results reused from the parse cache.")
+
+    def _ocr_images(self, fnm, zoomin=3, page_from=0, page_to=299, callback=None):
+        self.page_zoomin = zoomin
         self.lefted_chars = []
         self.mean_height = []
         self.mean_width = []
@@ -1047,19 +1136,23 @@ class RAGFlowPdfParser:
         self.page_layout = []
         self.page_from = page_from
         start = timer()
+        if isinstance(getattr(self, "page_images", None), PdfPageImages):
+            self.page_images.close()
         try:
+            # Pages are rendered when first used and only a window of them stays in memory.
+            self.page_images = PdfPageImages(fnm, 72 * zoomin, page_from, page_to, sys.modules[LOCK_KEY_pdfplumber])
             with sys.modules[LOCK_KEY_pdfplumber]:
-                with pdfplumber.open(fnm) if isinstance(fnm, str) else pdfplumber.open(BytesIO(fnm)) as pdf:
-                    self.pdf = pdf
-                    self.page_images = [p.to_image(resolution=72 * zoomin, antialias=True).annotated for i, p in enumerate(self.pdf.pages[page_from:page_to])]
-
-                    try:
-                        self.page_chars = [[c for c in page.dedupe_chars().chars if self._has_color(c)] for page in self.pdf.pages[page_from:page_to]]
-                    except Exception as e:
-                        logging.warning(f"Failed to extract characters for pages {page_from}-{page_to}: {str(e)}")
-                        self.page_chars = [[] for _ in range(page_to - page_from)]  # If failed to extract, using empty list instead.
+                pdf = self.page_images.pdf
+                try:
+                    self.page_chars = []
+                    for page in pdf.pages[page_from:page_to]:
+                        self.page_chars.append([c for c in page.dedupe_chars().chars if self._has_color(c)])
+                        page.close()
+                except Exception as e:
+                    logging.warning(f"Failed to extract characters for pages {page_from}-{page_to}: {str(e)}")
+                    self.page_chars = [[] for _ in range(page_to - page_from)]  # If failed to extract, using empty list instead.
 
-                    self.total_page = len(self.pdf.pages)
+                self.total_page = len(pdf.pages)
 
         except Exception:
             logging.exception("RAGFlowPdfParser __images__")
@@ -1111,6 +1204,8 @@ class RAGFlowPdfParser:
 
             if limiter:
                 async with limiter:
+                    if img is None:
+                        img = await asyncio.to_thread(self.page_images.__getitem__, i)
                     await asyncio.to_thread(self.__ocr, i + 1, img, chars, zoomin, id)
             else:
                 self.__ocr(i + 1, img, chars, zoomin, id)
@@ -1123,22 +1218,22 @@ class RAGFlowPdfParser:
                 chars = self.page_chars[i] if not self.is_english else []
                 self.mean_height.append(np.median(sorted([c["height"] for c in chars])) if chars else 0)
                 self.mean_width.append(np.median(sorted([c["width"] for c in chars])) if chars else 8)
-                self.page_cum_height.append(img.size[1] / zoomin)
                 return chars
 
             if self.parallel_limiter:
                 tasks = []
 
-                for i, img in enumerate(self.page_images):
+                for i in range(len(self.page_images)):
                     chars = __ocr_preprocess()
 
                     semaphore = self.parallel_limiter[i % settings.PARALLEL_DEVICES]
 
-                    async def wrapper(i=i, img=img, chars=chars, semaphore=semaphore):
+                    # The page is fetched by the task, so only pages being recognized are rendered.
+                    async def wrapper(i=i, chars=chars, semaphore=semaphore):
                         await __img_ocr(
                             i,
                             i % settings.PARALLEL_DEVICES,
-                            img,
+                            None,
                             chars,
                             semaphore,
                         )
@@ -1162,7 +1257,11 @@ class RAGFlowPdfParser:
 
         start = timer()
 
+        self.boxes = [[] for _ in range(len(self.page_images))]
+        self.rec_batchers = [RecognitionBatcher(self.ocr, device_id) for device_id in range(max(1, settings.PARALLEL_DEVICES))]
         asyncio.run(__img_ocr_launcher())
+        for batcher in self.rec_batchers:
+            batcher.flush()
 
         logging.info(f"__images__ {len(self.page_images)} pages cost {timer() - start}s")
 
@@ -1172,10 +1271,12 @@ class RAGFlowPdfParser:
 
         logging.debug(f"Is it English: {self.is_english}")
 
+        self.is_english = bool(self.is_english)
+        self.page_cum_height.extend(self.page_images.size(i)[1] / zoomin for i in range(len(self.page_images)))
         self.page_cum_height = np.cumsum(self.page_cum_height)
         assert len(self.page_cum_height) == len(self.page_images) + 1
         if len(self.boxes) == 0 and zoomin < 9:
-            self.__images__(fnm, zoomin * 3, page_from, page_to, callback)
+            self._ocr_images(fnm, zoomin * 3, page_from, page_to, callback)
 
     def __call__(self, fnm, need_image=True, zoomin=3, return_html=False):
         self.__images__(fnm, zoomin)
@@ -1330,7 +1431,7 @@ class RAGFlowPdfParser:
             if need_position:
                 return None, None
             return
-        last_page_height = self.page_images[last_page_idx].size[1] / ZM
+        last_page_height = self._page_image_size(last_page_idx)[1] / ZM
         poss.append(
             (
                 [last_page_idx],
@@ -1350,7 +1451,7 @@ class RAGFlowPdfParser:
             bottom *= ZM
             for pn in pns[1:]:
                 if 0 <= pn - 1 < page_count:
-                    bottom += self.page_images[pn - 1].size[1]
+                    bottom += self._page_image_size(pn - 1)[1]
                 else:
                     logging.warning(f"Page index {pn}-1 out of range for {page_count} pages during crop; skipping height accumulation.")
 
@@ -19,7 +19,7 @@ import threading
 
 import pdfplumber
 
-from .ocr import OCR
+from .ocr import OCR, RecognitionBatcher
 from .recognizer import Recognizer
 from .layout_recognizer import AscendLayoutRecognizer
 from .layout_recognizer import LayoutRecognizer4YOLOv10 as LayoutRecognizer
@@ -82,6 +82,7 @@ def init_in_out(args):
 
 __all__ = [
     "OCR",
+    "RecognitionBatcher",
     "Recognizer",
     "LayoutRecognizer",
     "AscendLayoutRecognizer",
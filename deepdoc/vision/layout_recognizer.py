@@ -30,6 +30,14 @@ from deepdoc.vision import Recognizer
 from deepdoc.vision.operators import nms
 
 
+def _page_height(image_list, pn):
+    """Height of page `pn`'s image; a PdfPageImages knows it without rendering the page again."""
+    if callable(getattr(image_list, "size", None)):
+        return image_list.size(pn)[1]
+    img = image_list[pn]
+    return img.shape[0] if isinstance(img, np.ndarray) else img.size[1]
+
+
 class LayoutRecognizer(Recognizer):
     labels = [
         "_background_",
@@ -79,6 +87,7 @@ class LayoutRecognizer(Recognizer):
         page_layout = []
         for pn, lts in enumerate(layouts):
             bxs = ocr_res[pn]
+            page_h = _page_height(image_list, pn)
             lts = [
                 {
                     "type": b["type"],
@@ -115,8 +124,8 @@ class LayoutRecognizer(Recognizer):
                         continue
                     lts_[ii]["visited"] = True
                     keep_feats = [
-                        lts_[ii]["type"] == "footer" and bxs[i]["bottom"] < image_list[pn].size[1] * 0.9 / scale_factor,
-                        lts_[ii]["type"] == "header" and bxs[i]["top"] > image_list[pn].size[1] * 0.1 / scale_factor,
+                        lts_[ii]["type"] == "footer" and bxs[i]["bottom"] < page_h * 0.9 / scale_factor,
+                        lts_[ii]["type"] == "header" and bxs[i]["top"] > page_h * 0.1 / scale_factor,
                     ]
                     if drop and lts_[ii]["type"] in self.garbage_layouts and not any(keep_feats):
                         if lts_[ii]["type"] not in garbages:
@@ -342,16 +351,15 @@ class AscendLayoutRecognizer(Recognizer):
 
         assert len(image_list) == len(ocr_res)
 
-        images = [np.array(im) if not isinstance(im, np.ndarray) else im for im in image_list]
         layouts_all_pages = []  # list of list[{"type","score","bbox":[x1,y1,x2,y2]}]
 
         conf_thr = max(thr, 0.08)
 
-        batch_loop_cnt = math.ceil(float(len(images)) / batch_size)
+        batch_loop_cnt = math.ceil(float(len(image_list)) / batch_size)
         for bi in range(batch_loop_cnt):
             s = bi * batch_size
-            e = min((bi + 1) * batch_size, len(images))
-            batch_images = images[s:e]
+            e = min((bi + 1) * batch_size, len(image_list))
+            batch_images = [np.array(im) if not isinstance(im, np.ndarray) else im for im in image_list[s:e]]
 
             inputs_list = self.preprocess(batch_images)
             logging.debug("preprocess done")
@@ -394,6 +402,7 @@ class AscendLayoutRecognizer(Recognizer):
                 lts = self.sort_Y_firstly(lts, avg_h / 2 if avg_h > 0 else 0)
 
             bxs = ocr_res[pn]
+            page_h = _page_height(image_list, pn)
             lts = self.layouts_cleanup(bxs, lts)
             page_layout.append(lts)
 
@@ -418,8 +427,8 @@ class AscendLayoutRecognizer(Recognizer):
                     lts_of_ty[ii]["visited"] = True
 
                     keep_feats = [
-                        lts_of_ty[ii]["type"] == "footer" and bxs[i]["bottom"] < image_list[pn].shape[0] * 0.9 / scale_factor,
-                        lts_of_ty[ii]["type"] == "header" and bxs[i]["top"] > image_list[pn].shape[0] * 0.1 / scale_factor,
+                        lts_of_ty[ii]["type"] == "footer" and bxs[i]["bottom"] < page_h * 0.9 / scale_factor,
+                        lts_of_ty[ii]["type"] == "header" and bxs[i]["top"] > page_h * 0.1 / scale_factor,
                     ]
                     if drop and lts_of_ty[ii]["type"] in self.garbage_layouts and not any(keep_feats):
                         garbages.setdefault(lts_of_ty[ii]["type"], []).append(bxs[i].get("text", ""))
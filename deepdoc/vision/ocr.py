@@ -16,6 +16,8 @@
 import gc
 import logging
 import copy
+import queue
+import threading
 import time
 import os
 
@@ -35,6 +37,31 @@ from .postprocess import build_post_process
 
 loaded_models = {}
 
+# CPU sessions kept per model. Defaults to MAX_CONCURRENT_TASKS so that every task
+# the executor runs at once has its own session, and the cores are split between them.
+DEEPDOC_SESSION_POOL_SIZE = max(1, int(os.environ.get("DEEPDOC_SESSION_POOL_SIZE", os.environ.get("MAX_CONCURRENT_TASKS", 5))))
+DEEPDOC_INTRA_OP_THREADS = int(os.environ.get("DEEPDOC_INTRA_OP_THREADS", max(1, (os.cpu_count() or 1) // DEEPDOC_SESSION_POOL_SIZE)))
+DEEPDOC_INTER_OP_THREADS = int(os.environ.get("DEEPDOC_INTER_OP_THREADS", 1))
+# disable, basic, extended or all.
+DEEPDOC_GRAPH_OPT_LEVEL = os.environ.get("DEEPDOC_GRAPH_OPT_LEVEL", "all").lower()
+# Pin the intra-op threads of each pooled CPU session to their own cores.
+DEEPDOC_PIN_THREADS = os.environ.get("DEEPDOC_PIN_THREADS", "false").lower() in ["true", "1", "yes"]
+# ONNX Runtime's CPU memory arena: "shrink" releases it after every run, "keep" holds
+# the buffers for the next run at the cost of memory, "off" allocates per operator.
+DEEPDOC_CPU_MEM_ARENA = os.environ.get("DEEPDOC_CPU_MEM_ARENA", "shrink").lower()
+
+GRAPH_OPT_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+# Text lines are recognized in batches of OCR_REC_BATCH_SIZE crops, gathered from
+# up to OCR_REC_PAGES pages by RecognitionBatcher.
+OCR_REC_BATCH_SIZE = int(os.environ.get("OCR_REC_BATCH_SIZE", 32))
+OCR_REC_PAGES = int(os.environ.get("OCR_REC_PAGES", 8))
+
 def transform(data, ops=None):
     """ transform """
     if ops is None:
@@ -68,6 +95,76 @@ def create_operators(op_param_list, global_config=None):
     return ops
 
 
+class SessionPool:
+    """
+    Up to `size` InferenceSessions of one model, used like a single session.
+
+    `run` takes an idle session, creating one while fewer than `size` exist and
+    waiting for one otherwise. Pages parsed at the same time thus run on separate
+    sessions with their own intra-op threads instead of contending for one.
+    """
+
+    def __init__(self, create, size: int):
+        self._create = create
+        self._size = max(1, size)
+        self._lock = threading.Lock()
+        # Last in, first out, so that the most recently used sessions stay warm.
+        self._idle = queue.LifoQueue()
+        self._session = create(0)
+        self._created = 1
+        self._idle.put(self._session)
+
+    def get_inputs(self):
+        return self._session.get_inputs()
+
+    def get_outputs(self):
+        return self._session.get_outputs()
+
+    def run(self, output_names, input_feed, run_options=None):
+        if self._size == 1:
+            # A single session is shared; InferenceSession.run is thread safe.
+            return self._session.run(output_names, input_feed, run_options)
+        sess = self._acquire()
+        try:
+            return sess.run(output_names, input_feed, run_options)
+        finally:
+            self._idle.put(sess)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            slot = self._created if self._created < self._size else None
+            if slot is not None:
+                self._created += 1
+        if slot is None:
+            return self._idle.get()
+        try:
+            return self._create(slot)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+
+def session_options(slot: int = 0, pin_threads: bool = False):
+    options = ort.SessionOptions()
+    options.enable_cpu_mem_arena = DEEPDOC_CPU_MEM_ARENA != "off"
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = DEEPDOC_INTRA_OP_THREADS
+    options.inter_op_num_threads = DEEPDOC_INTER_OP_THREADS
+    options.graph_optimization_level = GRAPH_OPT_LEVELS.get(DEEPDOC_GRAPH_OPT_LEVEL, ort.GraphOptimizationLevel.ORT_ENABLE_ALL)
+    if pin_threads and DEEPDOC_INTRA_OP_THREADS > 1:
+        # The calling thread runs as intra-op thread 0 and is not pinned; the others
+        # get one logical processor each (1-based), disjoint between pool slots.
+        first = slot * DEEPDOC_INTRA_OP_THREADS % (os.cpu_count() or 1)
+        cpus = [(first + i) % (os.cpu_count() or 1) + 1 for i in range(1, DEEPDOC_INTRA_OP_THREADS)]
+        options.add_session_config_entry("session.intra_op_thread_affinities", ";".join(str(c) for c in cpus))
+    return options
+
+
 def load_model(model_dir, nm, device_id: int | None = None):
     model_file_path = os.path.join(model_dir, nm + ".onnx")
     model_cached_tag = model_file_path + str(device_id) if device_id is not None else model_file_path
@@ -93,12 +190,6 @@ def load_model(model_dir, nm, device_id: int | None = None):
             return False
         return False
 
-    options = ort.SessionOptions()
-    options.enable_cpu_mem_arena = False
-    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
-    options.intra_op_num_threads = 2
-    options.inter_op_num_threads = 2
-
     # https://github.com/microsoft/onnxruntime/issues/9509#issuecomment-951546580
     # Shrink GPU memory after execution
     run_options = ort.RunOptions()
@@ -111,20 +202,22 @@ def load_model(model_dir, nm, device_id: int | None = None):
             "gpu_mem_limit": max(gpu_mem_limit_mb, 0) * 1024 * 1024,
             "arena_extend_strategy": arena_strategy,  # gpu memory allocation strategy
         }
-        sess = ort.InferenceSession(
+        # One session per GPU: every session would reserve its own gpu_mem_limit.
+        sess = SessionPool(lambda slot: ort.InferenceSession(
             model_file_path,
-            options=options,
+            sess_options=session_options(slot),
             providers=['CUDAExecutionProvider'],
             provider_options=[cuda_provider_options]
-            )
+            ), 1)
         logging.info(f"load_model {model_file_path} uses GPU (device {provider_device_id}, gpu_mem_limit={cuda_provider_options['gpu_mem_limit']}, arena_strategy={arena_strategy})")
     else:
-        sess = ort.InferenceSession(
+        sess = SessionPool(lambda slot: ort.InferenceSession(
             model_file_path,
-            options=options,
-            providers=['CPUExecutionProvider'])
-        run_options.add_run_config_entry("memory.enable_memory_arena_shrinkage", "cpu")
-        logging.info(f"load_model {model_file_path} uses CPU")
+            sess_options=session_options(slot, DEEPDOC_PIN_THREADS),
+            providers=['CPUExecutionProvider']), DEEPDOC_SESSION_POOL_SIZE)
+        if DEEPDOC_CPU_MEM_ARENA == "shrink":
+            run_options.add_run_config_entry("memory.enable_memory_arena_shrinkage", "cpu")
+        logging.info(f"load_model {model_file_path} uses CPU (pool of {DEEPDOC_SESSION_POOL_SIZE} sessions, {DEEPDOC_INTRA_OP_THREADS} intra-op threads each)")
     loaded_model = (sess, run_options)
     loaded_models[model_cached_tag] = loaded_model
     return loaded_model
@@ -360,7 +453,7 @@ class TextRecognizer:
             del self.predictor
         gc.collect()
 
-    def __call__(self, img_list):
+    def __call__(self, img_list, batch_size: int | None = None):
         img_num = len(img_list)
         # Calculate the aspect ratio of all text bars
         width_list = []
@@ -369,7 +462,7 @@ class TextRecognizer:
         # Sorting can speed up the recognition process
         indices = np.argsort(np.array(width_list))
         rec_res = [['', 0.0]] * img_num
-        batch_num = self.rec_batch_num
+        batch_num = batch_size or self.rec_batch_num
         st = time.time()
 
         for beg_img_no in range(0, img_num, batch_num):
@@ -693,10 +786,10 @@ class OCR:
             return ""
         return text
 
-    def recognize_batch(self, img_list, device_id: int | None = None):
+    def recognize_batch(self, img_list, device_id: int | None = None, batch_size: int | None = None):
         if device_id is None:
             device_id = 0
-        rec_res, elapse = self.text_recognizer[device_id](img_list)
+        rec_res, elapse = self.text_recognizer[device_id](img_list, batch_size)
         texts = []
         for i in range(len(rec_res)):
             text, score = rec_res[i]
@@ -749,3 +842,53 @@ class OCR:
         #    print(f"{bno}, {rec_res[bno]}")
 
         return list(zip([a.tolist() for a in filter_boxes], filter_rec_res))
+
+
+class RecognitionBatcher:
+    """
+    Recognizes the text-line crops of several pages together.
+
+    `add` queues the crops of one page with a callback taking their texts. Once
+    `max_pages` pages are queued, or on `flush`, all their crops go through the
+    text recognizer of `device_id` in one call: it sorts them by aspect ratio, so
+    lines of similar width from any page share a batch, and runs batches of
+    `batch_size`. Each page's callback is then called, in the order pages were
+    added, from the thread that triggered recognition.
+    """
+
+    def __init__(self, ocr: OCR, device_id: int | None = None, batch_size: int = OCR_REC_BATCH_SIZE, max_pages: int = OCR_REC_PAGES):
+        self.ocr = ocr
+        self.device_id = device_id or 0
+        self.batch_size = batch_size
+        self.max_pages = max(1, max_pages)
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        # One recognition at a time, so that batches do not compete for the session.
+        self._run_lock = threading.Lock()
+
+    def add(self, crops, callback):
+        with self._pending_lock:
+            self._pending.append((crops, callback))
+            if len(self._pending) < self.max_pages:
+                return
+            pending, self._pending = self._pending, []
+        self._recognize(pending)
+
+    def flush(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            self._recognize(pending)
+
+    def _recognize(self, pending):
+        crops = [c for page_crops, _ in pending for c in page_crops]
+        texts = []
+        if crops:
+            start = time.time()
+            with self._run_lock:
+                texts = self.ocr.recognize_batch(crops, self.device_id, self.batch_size)
+            logging.info(f"RecognitionBatcher recognized {len(crops)} boxes of {len(pending)} pages cost {time.time() - start}s")
+        offset = 0
+        for page_crops, callback in pending:
+            callback(texts[offset:offset + len(page_crops)])
+            offset += len(page_crops)
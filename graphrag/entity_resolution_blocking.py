@@ -0,0 +1,202 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Candidate pairs for entity resolution without comparing every pair of names.
+
+`is_similarity` only accepts names whose 2-grams containing a digit are the same,
+and among those:
+
+* two English names whose edit distance is at most half the shorter length. They
+  differ in length by at most that much and share at least max(len) - min(len) // 2
+  characters, counted with multiplicity;
+* any other two names whose character sets overlap by at least 80% of the larger
+  set, or by 2 characters when both sets are smaller than 4.
+
+Names are grouped by digit 2-grams, and within a group the overlap thresholds
+allow prefix filtering: with each name's tokens sorted rarest first, two names of
+sizes n and m reaching an overlap of t share a token among the first n - t + 1
+tokens of either. Only such names are compared, so the result is exactly the set
+of pairs the all-pairs scan finds.
+"""
+
+import os
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import editdistance
+
+from rag.nlp import is_english
+
+# Worker processes used to verify candidates of large entity types; 0 verifies in process.
+ENTITY_RESOLUTION_WORKERS = int(os.environ.get("ENTITY_RESOLUTION_WORKERS", 0))
+PARALLEL_MIN_NODES = 5000
+
+
+def _has_digit_in_2gram_diff(a, b):
+    def to_2gram_set(s):
+        return {s[i:i+2] for i in range(len(s) - 1)}
+
+    set_a = to_2gram_set(a)
+    set_b = to_2gram_set(b)
+    diff = set_a ^ set_b
+
+    return any(any(c.isdigit() for c in pair) for pair in diff)
+
+
+def is_similarity(a, b):
+    if _has_digit_in_2gram_diff(a, b):
+        return False
+
+    if is_english(a) and is_english(b):
+        if editdistance.eval(a, b) <= min(len(a), len(b)) // 2:
+            return True
+        return False
+
+    a, b = set(a), set(b)
+    max_l = max(len(a), len(b))
+    if max_l < 4:
+        return len(a & b) > 1
+
+    return len(a & b)*1./max_l >= 0.8
+
+
+def _charset_overlap(n, m):
+    """Smallest character set overlap `is_similarity` accepts for sets of sizes n and m."""
+    max_l = max(n, m)
+    if max_l < 4:
+        return 2
+    t = (4 * max_l) // 5
+    while t * 1. / max_l < 0.8:
+        t += 1
+    return t
+
+
+def _english_overlap(n, m):
+    """Smallest multiset overlap of two names of lengths n and m within edit distance min(n, m) // 2."""
+    return max(n, m) - min(n, m) // 2
+
+
+class _PrefixIndex:
+    """
+    Names bucketed by size, each listed under the tokens of its prefix.
+
+    `overlap(n, m)` is the smallest overlap a similar pair of sizes n and m has.
+    """
+
+    def __init__(self, names, tokenize, overlap):
+        self.overlap = overlap
+        self.tokens = {}
+        freq = Counter()
+        for name in names:
+            tokens = tokenize(name)
+            self.tokens[name] = tokens
+            freq.update(tokens)
+        self.postings = defaultdict(list)
+        for name, tokens in self.tokens.items():
+            tokens = self.tokens[name] = sorted(tokens, key=lambda tk: (freq[tk], str(tk)))
+            n = len(tokens)
+            for tk in tokens[:n - overlap(n, n) + 1]:
+                self.postings[(tk, n)].append(name)
+        self.sizes = sorted({len(t) for t in self.tokens.values()})
+
+    def candidates(self, name, tokens=None, within=None):
+        """Names of `within` (default all) sharing a prefix token with `name`, tokenized as `tokens`."""
+        tokens = self.tokens[name] if tokens is None else tokens
+        n = len(tokens)
+        res = set()
+        for m in self.sizes:
+            t = self.overlap(n, m)
+            if t > min(n, m):
+                continue
+            for tk in tokens[:n - t + 1]:
+                res.update(self.postings.get((tk, m), []))
+        if within is not None:
+            res &= within
+        res.discard(name)
+        return res
+
+
+def _charset_tokens(name):
+    return set(name)
+
+
+def _multiset_tokens(name):
+    return {(c, i) for c, cnt in Counter(name).items() for i in range(cnt)}
+
+
+def _digit_2grams(name):
+    return frozenset(g for g in (name[i:i+2] for i in range(len(name) - 1)) if any(c.isdigit() for c in g))
+
+
+def _group_pairs(names, probes, pairs):
+    """`is_similarity` of names sharing their digit 2-grams, which then only compares the names themselves."""
+    english = {n for n in names if is_english(n)}
+    others = set(names) - english
+    charset = _PrefixIndex(names, _charset_tokens, _charset_overlap)
+    multiset = _PrefixIndex(english, _multiset_tokens, _english_overlap)
+    chars = {n: set(n) for n in names}
+    for p in probes:
+        if p in english:
+            # Two English names are compared by edit distance only.
+            seen = charset.candidates(p, within=others)
+            for q in multiset.candidates(p):
+                k = min(len(p), len(q)) // 2
+                if abs(len(p) - len(q)) <= k and editdistance.eval(p, q) <= k:
+                    pairs.add((p, q) if p < q else (q, p))
+        else:
+            seen = charset.candidates(p)
+        for q in seen:
+            overlap = len(chars[p] & chars[q])
+            max_l = max(len(chars[p]), len(chars[q]))
+            if overlap > 1 if max_l < 4 else overlap * 1. / max_l >= 0.8:
+                pairs.add((p, q) if p < q else (q, p))
+
+
+def _pairs_for(names, probes):
+    """Similar pairs among `names` with at least one member in `probes`."""
+    # The 2-grams only one of two names has contain a digit iff their digit 2-grams
+    # differ, so only names with the same digit 2-grams can be similar.
+    groups = defaultdict(list)
+    for n in names:
+        groups[_digit_2grams(n)].append(n)
+    probes = set(probes)
+    pairs = set()
+    for group in groups.values():
+        group_probes = [n for n in group if n in probes]
+        if group_probes and len(group) > 1:
+            _group_pairs(group, group_probes, pairs)
+    return pairs
+
+
+def candidate_pairs(names: list[str], probe_nodes: set[str], workers: int = ENTITY_RESOLUTION_WORKERS) -> list[tuple[str, str]]:
+    """
+    Pairs (a, b) of `names` with `is_similarity(a, b)` and a or b in `probe_nodes`.
+
+    Same pairs, in the same order, as filtering `itertools.combinations(names, 2)`.
+    """
+    probes = [n for n in names if n in probe_nodes]
+    if workers > 1 and len(names) >= PARALLEL_MIN_NODES and len(probes) > 1:
+        step = (len(probes) + workers - 1) // workers
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_pairs_for, names, probes[i:i + step]) for i in range(0, len(probes), step)]
+            pairs = set()
+            for f in futures:
+                pairs |= f.result()
+    else:
+        pairs = _pairs_for(names, probes)
+    rank = {n: i for i, n in enumerate(names)}
+    pairs = sorted((rank[a], rank[b]) if rank[a] < rank[b] else (rank[b], rank[a]) for a, b in pairs)
+    return [(names[a], names[b]) for a, b in pairs]
@@ -311,23 +311,14 @@ async def run_graphrag_for_kb(
         raise TaskCanceledException(f"Task {row['id']} was cancelled")
 
     try:
-        union_nodes: set = set()
-        final_graph = None
-
-        for doc_id in ok_docs:
-            sg = subgraphs[doc_id]
-            union_nodes.update(set(sg.nodes()))
-
-            new_graph = await merge_subgraph(
-                tenant_id,
-                kb_id,
-                doc_id,
-                sg,
-                embedding_model,
-                callback,
-            )
-            if new_graph is not None:
-                final_graph = new_graph
+        # All subgraphs are merged in memory and the graph is written once, not once per document.
+        final_graph = await merge_subgraphs(
+            tenant_id,
+            kb_id,
+            [subgraphs[doc_id] for doc_id in ok_docs],
+            embedding_model,
+            callback,
+        )
 
         if final_graph is None:
             callback(msg=f"[GraphRAG] kb:{kb_id} merge finished (no in-memory graph returned).")
@@ -476,24 +467,40 @@ async def merge_subgraph(
     embedding_model,
     callback,
 ):
+    return await merge_subgraphs(tenant_id, kb_id, [subgraph], embedding_model, callback)
+
+
+@timeout(60 * 30, 1)
+async def merge_subgraphs(
+    tenant_id: str,
+    kb_id: str,
+    subgraphs: list[nx.Graph],
+    embedding_model,
+    callback,
+):
+    """Merge the subgraphs of several documents into the global graph and persist it once."""
     start = asyncio.get_running_loop().time()
     change = GraphChange()
-    old_graph = await get_graph(tenant_id, kb_id, subgraph.graph["source_id"])
+    source_ids = [source for sg in subgraphs for source in sg.graph["source_id"]]
+    old_graph = await get_graph(tenant_id, kb_id, source_ids)
     if old_graph is not None:
         logging.info("Merge with an exiting graph...................")
         tidy_graph(old_graph, callback)
-        new_graph = graph_merge(old_graph, subgraph, change)
+        new_graph = old_graph
     else:
-        new_graph = subgraph
+        new_graph = subgraphs[0].copy()
         change.added_updated_nodes = set(new_graph.nodes())
         change.added_updated_edges = set(new_graph.edges())
+        subgraphs = subgraphs[1:]
+    for sg in subgraphs:
+        new_graph = graph_merge(new_graph, sg, change)
     pr = nx.pagerank(new_graph)
     for node_name, pagerank in pr.items():
         new_graph.nodes[node_name]["pagerank"] = pagerank
 
     await set_graph(tenant_id, kb_id, embedding_model, new_graph, change, callback)
     now = asyncio.get_running_loop().time()
-    callback(msg=f"merging subgraph for doc {doc_id} into the global graph done in {now - start:.2f} seconds.")
+    callback(msg=f"merging subgraph for doc {', '.join(source_ids)} into the global graph done in {now - start:.2f} seconds.")
     return new_graph
 
 
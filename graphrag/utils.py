@@ -19,7 +19,6 @@ from hashlib import md5
 from typing import Any, Callable, Set, Tuple
 
 import networkx as nx
-import numpy as np
 import xxhash
 from networkx.readwrite import json_graph
 
@@ -28,6 +27,7 @@ from common.connection_utils import timeout
 from rag.nlp import rag_tokenizer, search
 from rag.utils.doc_store_conn import OrderByExpr
 from rag.utils.redis_conn import REDIS_CONN
+from rag.utils.embed_cache import get_embed_cache, set_embed_cache, mget_embed_cache  # noqa: F401
 from common import settings
 
 GRAPH_FIELD_SEP = "<SEP>"
@@ -35,6 +35,7 @@ GRAPH_FIELD_SEP = "<SEP>"
 ErrorHandlerFn = Callable[[BaseException | None, str | None, dict | None], None]
 
 chat_limiter = asyncio.Semaphore(int(os.environ.get("MAX_CONCURRENT_CHATS", 10)))
+GRAPH_BULK_SIZE = int(os.environ.get("GRAPH_BULK_SIZE", 64))
 
 
 @dataclasses.dataclass
@@ -108,28 +109,6 @@ def set_llm_cache(llmnm, txt, v, history, genconf):
     REDIS_CONN.set(k, v.encode("utf-8"), 24 * 3600)
 
 
-def get_embed_cache(llmnm, txt):
-    hasher = xxhash.xxh64()
-    hasher.update(str(llmnm).encode("utf-8"))
-    hasher.update(str(txt).encode("utf-8"))
-
-    k = hasher.hexdigest()
-    bin = REDIS_CONN.get(k)
-    if not bin:
-        return
-    return np.array(json.loads(bin))
-
-
-def set_embed_cache(llmnm, txt, arr):
-    hasher = xxhash.xxh64()
-    hasher.update(str(llmnm).encode("utf-8"))
-    hasher.update(str(txt).encode("utf-8"))
-
-    k = hasher.hexdigest()
-    arr = json.dumps(arr.tolist() if isinstance(arr, np.ndarray) else arr)
-    REDIS_CONN.set(k, arr.encode("utf-8"), 24 * 3600)
-
-
 def get_tags_from_cache(kb_ids):
     hasher = xxhash.xxh64()
     hasher.update(str(kb_ids).encode("utf-8"))
@@ -294,7 +273,7 @@ def chunk_id(chunk):
     return xxhash.xxh64((chunk["content_with_weight"] + chunk["kb_id"]).encode("utf-8")).hexdigest()
 
 
-async def graph_node_to_chunk(kb_id, embd_mdl, ent_name, meta, chunks):
+async def graph_node_to_chunk(kb_id, embd_mdl, ent_name, meta, chunks, ebd=None):
     global chat_limiter
     enable_timeout_assertion = os.environ.get("ENABLE_TIMEOUT_ASSERTION")
     chunk = {
@@ -311,7 +290,8 @@ async def graph_node_to_chunk(kb_id, embd_mdl, ent_name, meta, chunks):
         "available_int": 0,
     }
     chunk["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(chunk["content_ltks"])
-    ebd = get_embed_cache(embd_mdl.llm_name, ent_name)
+    if ebd is None:
+        ebd = get_embed_cache(embd_mdl.llm_name, ent_name)
     if ebd is None:
         async with chat_limiter:
             timeout = 3 if enable_timeout_assertion else 30000000
@@ -348,7 +328,7 @@ def get_relation(tenant_id, kb_id, from_ent_name, to_ent_name, size=1):
     return res
 
 
-async def graph_edge_to_chunk(kb_id, embd_mdl, from_ent_name, to_ent_name, meta, chunks):
+async def graph_edge_to_chunk(kb_id, embd_mdl, from_ent_name, to_ent_name, meta, chunks, ebd=None):
     enable_timeout_assertion = os.environ.get("ENABLE_TIMEOUT_ASSERTION")
     chunk = {
         "id": get_uuid(),
@@ -365,7 +345,8 @@ async def graph_edge_to_chunk(kb_id, embd_mdl, from_ent_name, to_ent_name, meta,
     }
     chunk["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(chunk["content_ltks"])
     txt = f"{from_ent_name}->{to_ent_name}"
-    ebd = get_embed_cache(embd_mdl.llm_name, txt)
+    if ebd is None:
+        ebd = get_embed_cache(embd_mdl.llm_name, txt)
     if ebd is None:
         async with chat_limiter:
             timeout = 3 if enable_timeout_assertion else 300000000
@@ -442,16 +423,43 @@ async def get_graph(tenant_id, kb_id, exclude_rebuild=None):
     return result
 
 
+def affected_sources(graph: nx.Graph, change: GraphChange) -> set:
+    """Documents whose subgraph contains a node or an edge added or updated by `change`."""
+    sources = set()
+    for n in change.added_updated_nodes:
+        if graph.has_node(n):
+            sources.update(graph.nodes[n].get("source_id", []))
+    for f, t in change.added_updated_edges:
+        # An edge is part of every subgraph holding both of its ends.
+        if graph.has_edge(f, t):
+            sources.update(set(graph.nodes[f].get("source_id", [])) & set(graph.nodes[t].get("source_id", [])))
+    return sources
+
+
 async def set_graph(tenant_id: str, kb_id: str, embd_mdl, graph: nx.Graph, change: GraphChange, callback):
     global chat_limiter
     start = asyncio.get_running_loop().time()
 
+    # Only subgraphs of documents the change touched are rewritten. A removal may have
+    # taken nodes out of any subgraph, so then every subgraph is.
+    if change.removed_nodes or change.removed_edges:
+        sources = set(graph.graph.get("source_id", []))
+    else:
+        sources = affected_sources(graph, change)
+
     await asyncio.to_thread(
         settings.docStoreConn.delete,
-        {"knowledge_graph_kwd": ["graph", "subgraph"]},
+        {"knowledge_graph_kwd": ["graph"]},
         search.index_name(tenant_id),
         kb_id
     )
+    if sources:
+        await asyncio.to_thread(
+            settings.docStoreConn.delete,
+            {"knowledge_graph_kwd": ["subgraph"], "source_id": sorted(sources)},
+            search.index_name(tenant_id),
+            kb_id
+        )
 
     if change.removed_nodes:
         await asyncio.to_thread(
@@ -502,9 +510,15 @@ async def set_graph(tenant_id: str, kb_id: str, embd_mdl, graph: nx.Graph, chang
         }
     ]
 
-    # generate updated subgraphs
+    # generate updated subgraphs, indexing the nodes by source in a single pass
+    source_nodes = defaultdict(list)
+    for n, attr in graph.nodes(data=True):
+        for source in set(attr.get("source_id", [])) & sources:
+            source_nodes[source].append(n)
     for source in graph.graph["source_id"]:
-        subgraph = graph.subgraph([n for n in graph.nodes if source in graph.nodes[n]["source_id"]]).copy()
+        if source not in sources:
+            continue
+        subgraph = graph.subgraph(source_nodes.get(source, [])).copy()
         subgraph.graph["source_id"] = [source]
         for n in subgraph.nodes:
             subgraph.nodes[n]["source_id"] = [source]
@@ -520,11 +534,14 @@ async def set_graph(tenant_id: str, kb_id: str, embd_mdl, graph: nx.Graph, chang
             }
         )
 
+    # One MGET for every cached node vector instead of a round trip per node.
+    nodes = list(change.added_updated_nodes)
+    node_ebds = await asyncio.to_thread(mget_embed_cache, embd_mdl.llm_name, nodes)
     tasks = []
-    for ii, node in enumerate(change.added_updated_nodes):
+    for ii, node in enumerate(nodes):
         node_attrs = graph.nodes[node]
         tasks.append(asyncio.create_task(
-            graph_node_to_chunk(kb_id, embd_mdl, node, node_attrs, chunks)
+            graph_node_to_chunk(kb_id, embd_mdl, node, node_attrs, chunks, node_ebds[ii])
         ))
         if ii % 100 == 9 and callback:
             callback(msg=f"Get embedding of nodes: {ii}/{len(change.added_updated_nodes)}")
@@ -537,13 +554,15 @@ async def set_graph(tenant_id: str, kb_id: str, embd_mdl, graph: nx.Graph, chang
         await asyncio.gather(*tasks, return_exceptions=True)
         raise
 
+    edges = list(change.added_updated_edges)
+    edge_ebds = await asyncio.to_thread(mget_embed_cache, embd_mdl.llm_name, [f"{f}->{t}" for f, t in edges])
     tasks = []
-    for ii, (from_node, to_node) in enumerate(change.added_updated_edges):
+    for ii, (from_node, to_node) in enumerate(edges):
         edge_attrs = graph.get_edge_data(from_node, to_node)
         if not edge_attrs:
             continue
         tasks.append(asyncio.create_task(
-            graph_edge_to_chunk(kb_id, embd_mdl, from_node, to_node, edge_attrs, chunks)
+            graph_edge_to_chunk(kb_id, embd_mdl, from_node, to_node, edge_attrs, chunks, edge_ebds[ii])
         ))
         if ii % 100 == 9 and callback:
             callback(msg=f"Get embedding of edges: {ii}/{len(change.added_updated_edges)}")
@@ -562,7 +581,7 @@ async def set_graph(tenant_id: str, kb_id: str, embd_mdl, graph: nx.Graph, chang
     start = now
 
     enable_timeout_assertion = os.environ.get("ENABLE_TIMEOUT_ASSERTION")
-    es_bulk_size = 4
+    es_bulk_size = GRAPH_BULK_SIZE
     for b in range(0, len(chunks), es_bulk_size):
         timeout = 3 if enable_timeout_assertion else 30000000
         doc_store_result = await asyncio.wait_for(
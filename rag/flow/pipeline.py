@@ -17,7 +17,9 @@ import asyncio
 import datetime
 import json
 import logging
+import os
 import random
+import threading
 from timeit import default_timer as timer
 from agent.canvas import Graph
 from api.db.services.document_service import DocumentService
@@ -25,6 +27,32 @@ from api.db.services.task_service import has_canceled, TaskService, CANVAS_DEBUG
 from rag.utils.redis_conn import REDIS_CONN
 
 
+PIPELINE_LOG_MAXLEN = int(os.environ.get("PIPELINE_LOG_MAXLEN", 10000))
+PIPELINE_LOG_TTL = 60 * 30
+
+
+def pipeline_log_key(flow_id, task_id) -> str:
+    return f"{flow_id}-{task_id}-trace"
+
+
+def read_pipeline_logs(flow_id, task_id, after: str | None = None, count: int | None = None) -> list[dict]:
+    """
+    Trace entries of a pipeline run, grouped by component as consecutive entries of one component.
+
+    Each entry carries its stream `id`; passing the last one as `after` returns the
+    entries logged since. `count` limits the number of entries read.
+    """
+    logs = []
+    for entry_id, fields in REDIS_CONN.xrange(pipeline_log_key(flow_id, task_id), f"({after}" if after else "-", "+", count) or []:
+        trace = json.loads(fields["trace"])
+        trace["id"] = entry_id
+        if logs and logs[-1]["component_id"] == fields["component_id"]:
+            logs[-1]["trace"].append(trace)
+        else:
+            logs.append({"component_id": fields["component_id"], "trace": [trace]})
+    return logs
+
+
 class Pipeline(Graph):
     def __init__(self, dsl: str|dict, tenant_id=None, doc_id=None, task_id=None, flow_id=None):
         if isinstance(dsl, dict):
@@ -35,6 +63,12 @@ class Pipeline(Graph):
         self._doc_id = doc_id
         self._flow_id = flow_id
         self._kb_id = None
+        self._trace_lock = threading.Lock()
+        # The last traced component and time, and the progress of each component, for `callback`.
+        self._last_trace = None
+        self._progress = {}
+        self._finished = 0.0
+        self._failed = False
         if self._doc_id:
             self._kb_id = DocumentService.get_knowledgebase_id(doc_id)
             if not self._kb_id:
@@ -42,60 +76,41 @@ class Pipeline(Graph):
 
     def callback(self, component_name: str, progress: float | int | None = None, message: str = "") -> None:
         from common.exceptions import TaskCanceledException
-        log_key = f"{self._flow_id}-{self.task_id}-logs"
         timestamp = timer()
         if has_canceled(self.task_id):
             progress = -1
             message += "[CANCEL]"
         try:
-            bin = REDIS_CONN.get(log_key)
-            obj = json.loads(bin.encode("utf-8"))
-            if obj:
-                if obj[-1]["component_id"] == component_name:
-                    obj[-1]["trace"].append(
-                        {
-                            "progress": progress,
-                            "message": message,
-                            "datetime": datetime.datetime.now().strftime("%H:%M:%S"),
-                            "timestamp": timestamp,
-                            "elapsed_time": timestamp - obj[-1]["trace"][-1]["timestamp"],
-                        }
-                    )
-                else:
-                    obj.append(
-                        {
-                            "component_id": component_name,
-                            "trace": [{"progress": progress, "message": message, "datetime": datetime.datetime.now().strftime("%H:%M:%S"), "timestamp": timestamp, "elapsed_time": 0}],
-                        }
-                    )
-            else:
-                obj = [
-                    {
-                        "component_id": component_name,
-                        "trace": [{"progress": progress, "message": message, "datetime": datetime.datetime.now().strftime("%H:%M:%S"), "timestamp": timestamp, "elapsed_time": 0}],
-                    }
-                ]
-            if component_name != "END" and self._doc_id and self.task_id:
-                percentage = 1.0 / len(self.components.items())
-                finished = 0.0
-                for o in obj:
-                    for t in o["trace"]:
-                        if t["progress"] < 0:
-                            finished = -1
-                            break
-                    if finished < 0:
-                        break
-                    finished += o["trace"][-1]["progress"] * percentage
-
-                msg = ""
-                if len(obj[-1]["trace"]) == 1:
-                    msg += f"\n-------------------------------------\n[{self.get_component_name(o['component_id'])}]:\n"
-                t = obj[-1]["trace"][-1]
-                msg += "%s: %s\n" % (t["datetime"], t["message"])
-                TaskService.update_progress(self.task_id, {"progress": finished, "progress_msg": msg})
-            elif component_name == "END" and not self._doc_id:
-                obj[-1]["trace"][-1]["dsl"] = json.loads(str(self))
-            REDIS_CONN.set_obj(log_key, obj, 60 * 30)
+            with self._trace_lock:
+                # A component's consecutive messages are grouped under one entry by read_pipeline_logs.
+                first = not self._last_trace or self._last_trace[0] != component_name
+                trace = {
+                    "progress": progress,
+                    "message": message,
+                    "datetime": datetime.datetime.now().strftime("%H:%M:%S"),
+                    "timestamp": timestamp,
+                    "elapsed_time": 0 if first else timestamp - self._last_trace[1],
+                }
+                self._last_trace = (component_name, timestamp)
+                if component_name == "END" and not self._doc_id:
+                    trace["dsl"] = json.loads(str(self))
+                REDIS_CONN.xadd(pipeline_log_key(self._flow_id, self.task_id),
+                                {"component_id": component_name, "trace": json.dumps(trace, ensure_ascii=False)},
+                                PIPELINE_LOG_MAXLEN, PIPELINE_LOG_TTL)
+
+                if component_name != "END" and self._doc_id and self.task_id:
+                    if progress is not None:
+                        if progress < 0:
+                            self._failed = True
+                        percentage = 1.0 / len(self.components.items())
+                        self._finished += (progress - self._progress.get(component_name, 0)) * percentage
+                        self._progress[component_name] = progress
+
+                    msg = ""
+                    if first:
+                        msg += f"\n-------------------------------------\n[{self.get_component_name(component_name)}]:\n"
+                    msg += "%s: %s\n" % (trace["datetime"], message)
+                    TaskService.update_progress(self.task_id, {"progress": -1 if self._failed else self._finished, "progress_msg": msg})
 
         except Exception as e:
             logging.exception(e)
@@ -103,23 +118,15 @@ class Pipeline(Graph):
         if has_canceled(self.task_id):
             raise TaskCanceledException(message)
 
-    def fetch_logs(self):
-        log_key = f"{self._flow_id}-{self.task_id}-logs"
-        try:
-            bin = REDIS_CONN.get(log_key)
-            if bin:
-                return json.loads(bin.encode("utf-8"))
-        except Exception as e:
-            logging.exception(e)
-        return []
-
+    def fetch_logs(self, after: str | None = None, count: int | None = None):
+        return read_pipeline_logs(self._flow_id, self.task_id, after, count)
 
     async def run(self, **kwargs):
-        log_key = f"{self._flow_id}-{self.task_id}-logs"
-        try:
-            REDIS_CONN.set_obj(log_key, [], 60 * 10)
-        except Exception as e:
-            logging.exception(e)
+        REDIS_CONN.delete(pipeline_log_key(self._flow_id, self.task_id))
+        self._last_trace = None
+        self._progress = {}
+        self._finished = 0.0
+        self._failed = False
         self.error = ""
         if not self.path:
             self.path.append("File")
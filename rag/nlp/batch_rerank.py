@@ -0,0 +1,125 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Vectorized scoring for the rerank stage of retrieval.
+
+Candidate vectors are decoded once into a single float32 matrix and cosine
+similarity is computed with one matrix-vector product.  Term similarity only
+depends on which query terms occur in a candidate (candidate term weights never
+enter the score), so query terms are interned into a vocabulary with a dense
+weight array and every candidate is reduced to the sparse set of vocabulary ids
+it hits.  The overlap score is then a sparse dot product over those ids.
+"""
+
+import numpy as np
+
+from common.float_utils import get_float
+
+
+def decode_vector(v, dim: int) -> np.ndarray:
+    """Decode one stored vector (list of floats or a tab separated string)."""
+    if isinstance(v, str):
+        arr = np.fromstring(v, dtype=np.float32, sep="\t")
+        if arr.shape[0] != dim:
+            # Malformed entries fall back to the lenient scalar parser.
+            arr = np.array([get_float(t) for t in v.split("\t")], dtype=np.float32)
+        return arr
+    return np.asarray(v, dtype=np.float32)
+
+
+def decode_vectors(fields: dict, ids: list, column: str, dim: int) -> np.ndarray:
+    """
+    Gather the `column` vector of every chunk in `ids` into one (n, dim) float32
+    matrix. Chunks without a vector get a zero row, as before.
+    """
+    mat = np.zeros((len(ids), dim), dtype=np.float32)
+    for i, chunk_id in enumerate(ids):
+        v = fields[chunk_id].get(column)
+        if v is None:
+            continue
+        mat[i] = decode_vector(v, dim)
+    return mat
+
+
+def as_matrix(vecs) -> np.ndarray:
+    if isinstance(vecs, np.ndarray) and vecs.dtype == np.float32 and vecs.ndim == 2:
+        return vecs
+    return np.asarray(vecs, dtype=np.float32).reshape(len(vecs), -1)
+
+
+def cosine_similarities(qvec, mat: np.ndarray) -> np.ndarray:
+    """Cosine similarity between `qvec` and every row of `mat`; zero vectors score 0."""
+    q = np.asarray(qvec, dtype=np.float32)
+    dots = mat @ q
+    denom = np.linalg.norm(mat, axis=1) * np.linalg.norm(q)
+    sims = np.zeros(mat.shape[0], dtype=np.float64)
+    np.divide(dots, denom, out=sims, where=denom > 0)
+    return sims
+
+
+class TermOverlap:
+    """
+    Query side of the token similarity.
+
+    `weighted_terms` is the output of `term_weight.Dealer.weights` for the query
+    tokens. Repeated terms accumulate, exactly like the per-candidate dicts used
+    to.
+    """
+
+    def __init__(self, weighted_terms):
+        self.vocab = {}
+        weights = []
+        for t, w in weighted_terms:
+            idx = self.vocab.get(t)
+            if idx is None:
+                self.vocab[t] = len(weights)
+                weights.append(w)
+            else:
+                weights[idx] += w
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.total = 1e-9 + float(self.weights.sum())
+
+    def hits(self, candidates):
+        """
+        Sparse (row, col) coordinates of query terms present in each candidate.
+        Every pair is unique, so the matrix is a binary presence matrix.
+        """
+        vocab = self.vocab
+        keys = vocab.keys()
+        rows, cols = [], []
+        for i, tks in enumerate(candidates):
+            if isinstance(tks, str):
+                tks = tks.split()
+            for t in keys & tks:
+                rows.append(i)
+                cols.append(vocab[t])
+        return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+    def scores(self, candidates) -> np.ndarray:
+        n = len(candidates)
+        if not self.vocab:
+            return np.ones(n, dtype=np.float64)
+        rows, cols = self.hits(candidates)
+        overlap = np.bincount(rows, weights=self.weights[cols], minlength=n)
+        return (1e-9 + overlap) / self.total
+
+
+def hybrid_scores(qvec, mat: np.ndarray, tksim: np.ndarray, tkweight=0.3, vtweight=0.7):
+    """Combine vector and term similarity the way `FulltextQueryer.hybrid_similarity` does."""
+    vtsim = cosine_similarities(qvec, mat)
+    if np.sum(vtsim) == 0:
+        return tksim.copy(), tksim, vtsim
+    return vtsim * vtweight + tksim * tkweight, tksim, vtsim
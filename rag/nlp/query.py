@@ -16,17 +16,61 @@
 
 import logging
 import json
+import os
 import re
-from collections import defaultdict
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
 
 from rag.utils.doc_store_conn import MatchTextExpr
-from rag.nlp import rag_tokenizer, term_weight, synonym
+from rag.nlp import rag_tokenizer, term_weight, synonym, batch_rerank
+
+QUERY_ANALYSIS_CACHE_SIZE = int(os.environ.get("QUERY_ANALYSIS_CACHE_SIZE", 1024))
+
+
+@dataclass
+class QueryAnalysis:
+    """
+    What FulltextQueryer derives from a question: its keywords and full-text query.
+
+    One analysis serves every min_match; `match_text` builds the expression for one.
+    Treat it as read-only, it is shared by all retrievals of the same question.
+    """
+    original_query: str
+    fields: list[str]
+    query: str | None
+    keywords: list[str]
+    uses_min_match: bool
+
+    def match_text(self, min_match: float = 0.6) -> MatchTextExpr | None:
+        if self.query is None:
+            return None
+        extra_options = {"original_query": self.original_query}
+        if self.uses_min_match:
+            extra_options = {"minimum_should_match": min_match, **extra_options}
+        return MatchTextExpr(self.fields, self.query, 100, extra_options)
+
+    @cached_property
+    def highlight_keywords(self) -> list[str]:
+        """Keywords and their fine-grained tokens, as highlighted in search results."""
+        kwds = set([])
+        for k in self.keywords:
+            kwds.add(k)
+            for kk in rag_tokenizer.fine_grained_tokenize(k).split():
+                if len(kk) < 2:
+                    continue
+                kwds.add(kk)
+        return list(kwds)
 
 
 class FulltextQueryer:
     def __init__(self):
         self.tw = term_weight.Dealer()
         self.syn = synonym.Dealer()
+        self._analyses = OrderedDict()
+        self._analyses_lock = threading.Lock()
+        self._analyses_synonyms = self.syn.dictionary
         self.query_fields = [
             "title_tks^10",
             "title_sm_tks^5",
@@ -83,6 +127,29 @@ class FulltextQueryer:
         return txt
 
     def question(self, txt, tbl="qa", min_match: float = 0.6):
+        analysis = self.analyze(txt)
+        return analysis.match_text(min_match), list(analysis.keywords)
+
+    def analyze(self, txt) -> QueryAnalysis:
+        """Analyzes `txt`, reusing the analysis of a recent identical question."""
+        with self._analyses_lock:
+            # Synonyms were reloaded: analyses made with the old ones are stale.
+            if self._analyses_synonyms is not self.syn.dictionary:
+                self._analyses.clear()
+                self._analyses_synonyms = self.syn.dictionary
+            analysis = self._analyses.get(txt)
+            if analysis is not None:
+                self._analyses.move_to_end(txt)
+                return analysis
+        analysis = self._analyze(txt)
+        if QUERY_ANALYSIS_CACHE_SIZE > 0:
+            with self._analyses_lock:
+                self._analyses[txt] = analysis
+                while len(self._analyses) > QUERY_ANALYSIS_CACHE_SIZE:
+                    self._analyses.popitem(last=False)
+        return analysis
+
+    def _analyze(self, txt) -> QueryAnalysis:
         original_query = txt
         txt = FulltextQueryer.add_space_between_eng_zh(txt)
         txt = re.sub(
@@ -127,9 +194,7 @@ class FulltextQueryer:
             if not q:
                 q.append(txt)
             query = " ".join(q)
-            return MatchTextExpr(
-                self.query_fields, query, 100, {"original_query": original_query}
-            ), keywords
+            return QueryAnalysis(original_query, self.query_fields, query, keywords, False)
 
         def need_fine_grained_tokenize(tk):
             if len(tk) < 3:
@@ -208,38 +273,26 @@ class FulltextQueryer:
 
             qs.append(tms)
 
+        query = None
         if qs:
             query = " OR ".join([f"({t})" for t in qs if t])
             if not query:
                 query = otxt
-            return MatchTextExpr(
-                self.query_fields, query, 100, {"minimum_should_match": min_match, "original_query": original_query}
-            ), keywords
-        return None, keywords
+        return QueryAnalysis(original_query, self.query_fields, query, keywords, True)
 
     def hybrid_similarity(self, avec, bvecs, atks, btkss, tkweight=0.3, vtweight=0.7):
-        from sklearn.metrics.pairwise import cosine_similarity
-        import numpy as np
-
-        sims = cosine_similarity([avec], bvecs)
         tksim = self.token_similarity(atks, btkss)
-        if np.sum(sims[0]) == 0:
-            return np.array(tksim), tksim, sims[0]
-        return np.array(sims[0]) * vtweight + np.array(tksim) * tkweight, tksim, sims[0]
+        return batch_rerank.hybrid_scores(avec, batch_rerank.as_matrix(bvecs), tksim, tkweight, vtweight)
+
+    def term_overlap(self, atks):
+        if isinstance(atks, str):
+            atks = atks.split()
+        return batch_rerank.TermOverlap(self.tw.weights(atks, preprocess=False))
 
     def token_similarity(self, atks, btkss):
-        def to_dict(tks):
-            if isinstance(tks, str):
-                tks = tks.split()
-            d = defaultdict(int)
-            wts = self.tw.weights(tks, preprocess=False)
-            for i, (t, c) in enumerate(wts):
-                d[t] += c
-            return d
-
-        atks = to_dict(atks)
-        btkss = [to_dict(tks) for tks in btkss]
-        return [self.similarity(atks, btks) for btks in btkss]
+        # Only the presence of query terms in a candidate matters, so candidate
+        # terms are never weighted; see rag.nlp.batch_rerank.
+        return self.term_overlap(atks).scores(btkss)
 
     def similarity(self, qtwt, dtwt):
         if isinstance(dtwt, type("")):
@@ -18,11 +18,11 @@ import json
 import logging
 import re
 import math
-from collections import OrderedDict, defaultdict
+from collections import defaultdict
 from dataclasses import dataclass
 
 from rag.prompts.generator import relevant_chunks_with_toc
-from rag.nlp import rag_tokenizer, query
+from rag.nlp import rag_tokenizer, query, batch_rerank
 import numpy as np
 from rag.utils.doc_store_conn import DocStoreConnection, MatchDenseExpr, FusionExpr, OrderByExpr
 from common.string_utils import remove_redundant_spaces
@@ -111,7 +111,8 @@ class Dealer:
                 highlightFields = []
             elif isinstance(highlight, list):
                 highlightFields = highlight
-            matchText, keywords = self.qryr.question(qst, min_match=0.3)
+            analysis = self.qryr.analyze(qst)
+            matchText = analysis.match_text(min_match=0.3)
             if emb_mdl is None:
                 matchExprs = [matchText]
                 res = self.dataStore.search(src, highlightFields, filters, matchExprs, orderBy, offset, limit,
@@ -138,21 +139,14 @@ class Dealer:
                         res = self.dataStore.search(src, [], filters, [], orderBy, offset, limit, idx_names, kb_ids)
                         total = self.dataStore.get_total(res)
                     else:
-                        matchText, _ = self.qryr.question(qst, min_match=0.1)
+                        matchText = analysis.match_text(min_match=0.1)
                         matchDense.extra_options["similarity"] = 0.17
                         res = self.dataStore.search(src, highlightFields, filters, [matchText, matchDense, fusionExpr],
                                                     orderBy, offset, limit, idx_names, kb_ids, rank_feature=rank_feature)
                         total = self.dataStore.get_total(res)
                     logging.debug("Dealer.search 2 TOTAL: {}".format(total))
 
-            for k in keywords:
-                kwds.add(k)
-                for kk in rag_tokenizer.fine_grained_tokenize(k).split():
-                    if len(kk) < 2:
-                        continue
-                    if kk in kwds:
-                        continue
-                    kwds.add(kk)
+            kwds = analysis.highlight_keywords
 
         logging.debug(f"TOTAL: {total}")
         ids = self.dataStore.get_chunk_ids(res)
@@ -293,29 +287,23 @@ class Dealer:
                vtweight=0.7, cfield="content_ltks",
                rank_feature: dict | None = None
                ):
-        _, keywords = self.qryr.question(query)
-        vector_size = len(sres.query_vector)
-        vector_column = f"q_{vector_size}_vec"
-        zero_vector = [0.0] * vector_size
-        ins_embd = []
-        for chunk_id in sres.ids:
-            vector = sres.field[chunk_id].get(vector_column, zero_vector)
-            if isinstance(vector, str):
-                vector = [get_float(v) for v in vector.split("\t")]
-            ins_embd.append(vector)
-        if not ins_embd:
+        keywords = self.qryr.analyze(query).keywords
+        if not sres.ids:
             return [], [], []
+        vector_size = len(sres.query_vector)
+        ins_embd = batch_rerank.decode_vectors(sres.field, sres.ids, f"q_{vector_size}_vec", vector_size)
 
         for i in sres.ids:
             if isinstance(sres.field[i].get("important_kwd", []), str):
                 sres.field[i]["important_kwd"] = [sres.field[i]["important_kwd"]]
         ins_tw = []
         for i in sres.ids:
-            content_ltks = list(OrderedDict.fromkeys(sres.field[i][cfield].split()))
-            title_tks = [t for t in sres.field[i].get("title_tks", "").split() if t]
-            question_tks = [t for t in sres.field[i].get("question_tks", "").split() if t]
-            important_kwd = sres.field[i].get("important_kwd", [])
-            tks = content_ltks + title_tks * 2 + important_kwd * 5 + question_tks * 6
+            # Term similarity only looks at which query terms a chunk contains,
+            # so repeats (title x2, keywords x5, questions x6) add nothing.
+            tks = sres.field[i][cfield].split()
+            tks.extend(sres.field[i].get("title_tks", "").split())
+            tks.extend(sres.field[i].get("important_kwd", []))
+            tks.extend(sres.field[i].get("question_tks", "").split())
             ins_tw.append(tks)
 
         ## For rank feature(tag_fea) scores.
@@ -331,7 +319,7 @@ class Dealer:
     def rerank_by_model(self, rerank_mdl, sres, query, tkweight=0.3,
                         vtweight=0.7, cfield="content_ltks",
                         rank_feature: dict | None = None):
-        _, keywords = self.qryr.question(query)
+        keywords = self.qryr.analyze(query).keywords
 
         for i in sres.ids:
             if isinstance(sres.field[i].get("important_kwd", []), str):
@@ -374,10 +362,53 @@ class Dealer:
         highlight=False,
         rank_feature: dict | None = {PAGERANK_FLD: 10},
     ):
-        ranks = {"total": 0, "chunks": [], "doc_aggs": {}}
         if not question:
+            return {"total": 0, "chunks": [], "doc_aggs": {}}
+        # Imported here: common.settings imports this module, and the cache needs
+        # REDIS_CONN which is configured from common.settings.
+        from rag.utils.retrieval_cache import retrieval_cache, model_identity
+
+        if isinstance(tenant_ids, str):
+            tenant_ids = tenant_ids.split(",")
+
+        cache_key = retrieval_cache.key(
+            question, tenant_ids, kb_ids,
+            page=page, page_size=page_size,
+            similarity_threshold=similarity_threshold,
+            vector_similarity_weight=vector_similarity_weight,
+            top=top, doc_ids=sorted(doc_ids) if doc_ids else doc_ids,
+            aggs=aggs, highlight=highlight, rank_feature=rank_feature,
+            embd_mdl=model_identity(embd_mdl), rerank_mdl=model_identity(rerank_mdl),
+        )
+        ranks = retrieval_cache.get(cache_key)
+        if ranks is not None:
             return ranks
 
+        ranks = self._retrieval(question, embd_mdl, tenant_ids, kb_ids, page, page_size,
+                                similarity_threshold, vector_similarity_weight, top,
+                                doc_ids, aggs, rerank_mdl, highlight, rank_feature)
+        retrieval_cache.set(cache_key, ranks)
+        return ranks
+
+    def _retrieval(
+        self,
+        question,
+        embd_mdl,
+        tenant_ids,
+        kb_ids,
+        page,
+        page_size,
+        similarity_threshold,
+        vector_similarity_weight,
+        top,
+        doc_ids,
+        aggs,
+        rerank_mdl,
+        highlight,
+        rank_feature,
+    ):
+        ranks = {"total": 0, "chunks": [], "doc_aggs": {}}
+
         # Ensure RERANK_LIMIT is multiple of page_size
         RERANK_LIMIT = math.ceil(64 / page_size) * page_size if page_size > 1 else 1
         req = {
@@ -392,9 +423,6 @@ class Dealer:
             "available_int": 1,
         }
 
-        if isinstance(tenant_ids, str):
-            tenant_ids = tenant_ids.split(",")
-
         sres = self.search(req, [index_name(tid) for tid in tenant_ids], kb_ids, embd_mdl, highlight, rank_feature=rank_feature)
 
         if rerank_mdl and sres.total > 0:
@@ -15,10 +15,13 @@
 #
 import asyncio
 import logging
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import umap
+from sklearn.decomposition import PCA
 from sklearn.mixture import GaussianMixture
 
 from api.db.services.task_service import has_canceled
@@ -33,6 +36,17 @@ from graphrag.utils import (
     set_llm_cache,
 )
 
+# Worker processes fitting the candidate mixtures of the "fast" cluster search; 0 fits in process.
+RAPTOR_CLUSTER_WORKERS = int(os.environ.get("RAPTOR_CLUSTER_WORKERS", 0))
+# Cluster counts tried per round of the "fast" search.
+RAPTOR_SEARCH_POINTS = 8
+
+
+def _fit_gmm(embeddings, n_components, random_state, init_params="kmeans"):
+    gm = GaussianMixture(n_components=n_components, random_state=random_state, init_params=init_params)
+    gm.fit(embeddings)
+    return gm, gm.bic(embeddings)
+
 
 class RecursiveAbstractiveProcessing4TreeOrganizedRetrieval:
     def __init__(
@@ -44,6 +58,8 @@ class RecursiveAbstractiveProcessing4TreeOrganizedRetrieval:
         max_token=512,
         threshold=0.1,
         max_errors=3,
+        clustering="exhaustive",
+        reducer="umap",
     ):
         self._max_cluster = max_cluster
         self._llm_model = llm_model
@@ -53,6 +69,8 @@ class RecursiveAbstractiveProcessing4TreeOrganizedRetrieval:
         self._max_token = max_token
         self._max_errors = max(1, max_errors)
         self._error_count = 0
+        self._clustering = clustering
+        self._reducer = reducer
 
     @timeout(60 * 20)
     async def _chat(self, system, history, gen_conf):
@@ -89,21 +107,67 @@ class RecursiveAbstractiveProcessing4TreeOrganizedRetrieval:
         await asyncio.to_thread(set_embed_cache, self._embd_model.llm_name, txt, embds)
         return embds
 
+    def _check_canceled(self, task_id, stage):
+        if task_id and has_canceled(task_id):
+            logging.info(f"Task {task_id} cancelled during {stage}.")
+            raise TaskCanceledException(f"Task {task_id} was cancelled")
+
     def _get_optimal_clusters(self, embeddings: np.ndarray, random_state: int, task_id: str = ""):
+        """The cluster count with the lowest BIC, and the mixture fitted for it."""
+        if self._clustering == "fast":
+            return self._search_optimal_clusters(embeddings, random_state, task_id)
         max_clusters = min(self._max_cluster, len(embeddings))
         n_clusters = np.arange(1, max_clusters)
         bics = []
+        best = None
         for n in n_clusters:
-            if task_id:
-                if has_canceled(task_id):
-                    logging.info(f"Task {task_id} cancelled during get optimal clusters.")
-                    raise TaskCanceledException(f"Task {task_id} was cancelled")
-
-            gm = GaussianMixture(n_components=n, random_state=random_state)
-            gm.fit(embeddings)
-            bics.append(gm.bic(embeddings))
+            self._check_canceled(task_id, "get optimal clusters")
+            gm, bic = _fit_gmm(embeddings, n, random_state)
+            if best is None or bic < min(bics):
+                best = gm
+            bics.append(bic)
         optimal_clusters = n_clusters[np.argmin(bics)]
-        return optimal_clusters
+        return optimal_clusters, best
+
+    def _search_optimal_clusters(self, embeddings: np.ndarray, random_state: int, task_id: str = ""):
+        """
+        Coarse-to-fine search of the BIC curve: try RAPTOR_SEARCH_POINTS counts spread over
+        the range, then narrow the range around the best one until the step is 1.
+        Mixtures use k-means++ seeding instead of a full k-means initialization.
+        """
+        lo, hi = 1, max(1, min(self._max_cluster, len(embeddings)) - 1)
+        fitted = {}
+        step = max(1, (hi - lo) // RAPTOR_SEARCH_POINTS)
+        pool = ProcessPoolExecutor(max_workers=RAPTOR_CLUSTER_WORKERS) if RAPTOR_CLUSTER_WORKERS > 1 else None
+        try:
+            while True:
+                self._check_canceled(task_id, "get optimal clusters")
+                todo = [n for n in sorted({*range(lo, hi + 1, step), hi}) if n not in fitted]
+                args = ([embeddings] * len(todo), todo, [random_state] * len(todo), ["k-means++"] * len(todo))
+                for n, res in zip(todo, (pool.map if pool else map)(_fit_gmm, *args)):
+                    fitted[n] = res
+                best = min((n for n in fitted if lo <= n <= hi), key=lambda n: (fitted[n][1], n))
+                if step == 1:
+                    break
+                lo, hi = max(lo, best - step + 1), min(hi, best + step - 1)
+                step = max(1, step // 4)
+        finally:
+            if pool:
+                pool.shutdown()
+        return best, fitted[best][0]
+
+    def _reduce(self, embeddings, random_state):
+        n_components = min(12, len(embeddings) - 2)
+        if self._reducer == "pca":
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+            return PCA(n_components=min(n_components, embeddings.shape[1]), random_state=random_state).fit_transform(embeddings)
+        n_neighbors = int((len(embeddings) - 1) ** 0.8)
+        return umap.UMAP(
+            n_neighbors=max(2, n_neighbors),
+            n_components=n_components,
+            metric="cosine",
+        ).fit_transform(embeddings)
 
     async def __call__(self, chunks, random_state, callback=None, task_id: str = ""):
         if len(chunks) <= 1:
@@ -182,18 +246,11 @@ class RecursiveAbstractiveProcessing4TreeOrganizedRetrieval:
                 end = len(chunks)
                 continue
 
-            n_neighbors = int((len(embeddings) - 1) ** 0.8)
-            reduced_embeddings = umap.UMAP(
-                n_neighbors=max(2, n_neighbors),
-                n_components=min(12, len(embeddings) - 2),
-                metric="cosine",
-            ).fit_transform(embeddings)
-            n_clusters = self._get_optimal_clusters(reduced_embeddings, random_state, task_id=task_id)
+            reduced_embeddings = await asyncio.to_thread(self._reduce, embeddings, random_state)
+            n_clusters, gm = await asyncio.to_thread(self._get_optimal_clusters, reduced_embeddings, random_state, task_id)
             if n_clusters == 1:
                 lbls = [0 for _ in range(len(reduced_embeddings))]
             else:
-                gm = GaussianMixture(n_components=n_clusters, random_state=random_state)
-                gm.fit(reduced_embeddings)
                 probs = gm.predict_proba(reduced_embeddings)
                 lbls = [np.where(prob > self._threshold)[0] for prob in probs]
                 lbls = [lbl[0] if isinstance(lbl, np.ndarray) else lbl for lbl in lbls]
@@ -20,6 +20,7 @@
 
 
 import asyncio
+import concurrent.futures
 import copy
 import faulthandler
 import logging
@@ -52,6 +53,9 @@ from box_sdk_gen import BoxOAuth, OAuthConfig, AccessToken
 
 MAX_CONCURRENT_TASKS = int(os.environ.get("MAX_CONCURRENT_TASKS", "5"))
 task_limiter = asyncio.Semaphore(MAX_CONCURRENT_TASKS)
+# Connector batches waiting to be ingested, and batches ingested at once, per sync task.
+SYNC_BATCH_QUEUE_SIZE = int(os.environ.get("SYNC_BATCH_QUEUE_SIZE", "2"))
+SYNC_BATCH_CONCURRENCY = int(os.environ.get("SYNC_BATCH_CONCURRENCY", "2"))
 
 
 class SyncBase:
@@ -70,6 +74,10 @@ class SyncBase:
             except asyncio.TimeoutError:
                 msg = f"Task timeout after {task['timeout_secs']} seconds"
                 SyncLogsService.update_by_id(task["id"], {"status": TaskStatus.FAIL, "error_msg": msg})
+                # Connectors do not yield documents in update order, so the next sync starts over from
+                # this one's poll_range_start; documents ingested already are skipped by duplicate_and_parse.
+                logging.info(f"{self._get_source_prefix()}{msg}, rescheduled from {task['poll_range_start']}")
+                SyncLogsService.schedule(task["connector_id"], task["kb_id"], task["poll_range_start"])
                 return
 
             except Exception as ex:
@@ -87,6 +95,14 @@ class SyncBase:
         SyncLogsService.schedule(task["connector_id"], task["kb_id"], task["poll_range_start"])
 
     async def _run_task_logic(self, task: dict):
+        """
+        Ingests the batches of the connector's generator.
+
+        A synchronous generator is iterated in a thread, so that its network calls
+        do not block the event loop. Batches go through a queue of
+        SYNC_BATCH_QUEUE_SIZE to SYNC_BATCH_CONCURRENCY consumers, each ingesting
+        one batch at a time in a thread; the generator waits while the queue is full.
+        """
         document_batch_generator = await self._generate(task)
 
         doc_num = 0
@@ -96,55 +112,75 @@ class SyncBase:
         if task["poll_range_start"]:
             next_update = task["poll_range_start"]
 
-        for document_batch in document_batch_generator: 
-            if not document_batch:
-                continue
-
-            min_update = min(doc.doc_updated_at for doc in document_batch)
-            max_update = max(doc.doc_updated_at for doc in document_batch)
-            next_update = max(next_update, max_update)
-
-            docs = []
-            for doc in document_batch:
-                d = {
-                    "id": doc.id,
-                    "connector_id": task["connector_id"],
-                    "source": self.SOURCE_NAME,
-                    "semantic_identifier": doc.semantic_identifier,
-                    "extension": doc.extension,
-                    "size_bytes": doc.size_bytes,
-                    "doc_updated_at": doc.doc_updated_at,
-                    "blob": doc.blob,
-                }
-                if doc.metadata:
-                    d["metadata"] = doc.metadata
-                docs.append(d)
-
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SYNC_BATCH_QUEUE_SIZE)
+        stopped = threading.Event()
+
+        def put(item) -> bool:
+            fut = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while not stopped.is_set():
+                try:
+                    fut.result(timeout=1)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    continue
+            fut.cancel()
+            return False
+
+        def produce():
+            for document_batch in document_batch_generator:
+                if document_batch and not put(document_batch):
+                    return
+
+        async def producer():
+            cancelled = False
             try:
-                e, kb = KnowledgebaseService.get_by_id(task["kb_id"])
-                err, dids = SyncLogsService.duplicate_and_parse(
-                    kb, docs, task["tenant_id"],
-                    f"{self.SOURCE_NAME}/{task['connector_id']}",
-                    task["auto_parse"]
-                )
-                SyncLogsService.increase_docs(
-                    task["id"], min_update, max_update,
-                    len(docs), "\n".join(err), len(err)
-                )
-
-                doc_num += len(docs)
-
-            except Exception as batch_ex:
-                msg = str(batch_ex)
-                code = getattr(batch_ex, "args", [None])[0]
-
-                if code == 1267 or "collation" in msg.lower():
-                    logging.warning(f"Skipping {len(docs)} document(s) due to collation conflict")
+                if hasattr(document_batch_generator, "__aiter__"):
+                    async for document_batch in document_batch_generator:
+                        if document_batch:
+                            await queue.put(document_batch)
                 else:
-                    logging.error(f"Error processing batch: {msg}")
-
-                failed_docs += len(docs)
-                continue
+                    await asyncio.to_thread(produce)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            finally:
+                # Consumers finish the queued batches first.
+                if not cancelled:
+                    for _ in range(SYNC_BATCH_CONCURRENCY):
+                        await queue.put(None)
+
+        async def consumer():
+            nonlocal doc_num, failed_docs, next_update
+            while True:
+                document_batch = await queue.get()
+                if document_batch is None:
+                    return
+                max_update = max(doc.doc_updated_at for doc in document_batch)
+                next_update = max(next_update, max_update)
+                try:
+                    ingested = await asyncio.to_thread(self._ingest_batch, task, document_batch)
+                    doc_num += ingested
+                except Exception as batch_ex:
+                    msg = str(batch_ex)
+                    code = getattr(batch_ex, "args", [None])[0]
+
+                    if code == 1267 or "collation" in msg.lower():
+                        logging.warning(f"Skipping {len(document_batch)} document(s) due to collation conflict")
+                    else:
+                        logging.error(f"Error processing batch: {msg}")
+
+                    failed_docs += len(document_batch)
+
+                del document_batch
+
+        tasks = [asyncio.create_task(producer()), *[asyncio.create_task(consumer()) for _ in range(SYNC_BATCH_CONCURRENCY)]]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            stopped.set()
+            for t in tasks:
+                t.cancel()
 
         prefix = self._get_source_prefix()
         if failed_docs > 0:
@@ -155,6 +191,38 @@ class SyncBase:
         SyncLogsService.done(task["id"], task["connector_id"])
         task["poll_range_start"] = next_update
 
+    def _ingest_batch(self, task: dict, document_batch) -> int:
+        min_update = min(doc.doc_updated_at for doc in document_batch)
+        max_update = max(doc.doc_updated_at for doc in document_batch)
+
+        docs = []
+        for doc in document_batch:
+            d = {
+                "id": doc.id,
+                "connector_id": task["connector_id"],
+                "source": self.SOURCE_NAME,
+                "semantic_identifier": doc.semantic_identifier,
+                "extension": doc.extension,
+                "size_bytes": doc.size_bytes,
+                "doc_updated_at": doc.doc_updated_at,
+                "blob": doc.blob,
+            }
+            if doc.metadata:
+                d["metadata"] = doc.metadata
+            docs.append(d)
+
+        e, kb = KnowledgebaseService.get_by_id(task["kb_id"])
+        err, dids = SyncLogsService.duplicate_and_parse(
+            kb, docs, task["tenant_id"],
+            f"{self.SOURCE_NAME}/{task['connector_id']}",
+            task["auto_parse"]
+        )
+        SyncLogsService.increase_docs(
+            task["id"], min_update, max_update,
+            len(docs), "\n".join(err), len(err)
+        )
+        return len(docs)
+
     async def _generate(self, task: dict):
         raise NotImplementedError
 
@@ -297,12 +365,8 @@ class Confluence(SyncBase):
             if pending_docs:
                 yield pending_docs
 
-        async def async_wrapper():
-            for batch in document_batches():
-                yield batch
-        
         logging.info("Connect to Confluence: {} {}".format(self.conf["wiki_base"], begin_info))
-        return async_wrapper()
+        return document_batches()
 
 
 class Notion(SyncBase):
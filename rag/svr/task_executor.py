@@ -64,6 +64,9 @@ from rag.nlp import search, rag_tokenizer, add_positions
 from rag.raptor import RecursiveAbstractiveProcessing4TreeOrganizedRetrieval as Raptor
 from common.token_utils import num_tokens_from_string, truncate
 from rag.utils.redis_conn import REDIS_CONN, RedisDistributedLock
+from rag.utils.retrieval_cache import bump_index_generation
+from rag.utils.doc_store_conn import doc_bulks
+from rag.utils.embedding_batcher import EMBEDDING_BATCHER_ENABLED, get_embedding_batcher, embedding_batcher_stats
 from graphrag.utils import chat_limiter
 from common.signal_utils import start_tracemalloc_and_snapshot, stop_tracemalloc
 from common.exceptions import TaskCanceledException
@@ -119,6 +122,9 @@ embed_limiter = asyncio.Semaphore(MAX_CONCURRENT_CHUNK_BUILDERS)
 minio_limiter = asyncio.Semaphore(MAX_CONCURRENT_MINIO)
 kg_limiter = asyncio.Semaphore(2)
 WORKER_HEARTBEAT_TIMEOUT = int(os.environ.get('WORKER_HEARTBEAT_TIMEOUT', '120'))
+# Overlap embedding and indexing of a document's chunks instead of running them one after the other.
+STREAMING_INGESTION = os.environ.get('STREAMING_INGESTION', '0').lower() in ['1', 'true', 'yes']
+STREAMING_QUEUE_SIZE = int(os.environ.get('STREAMING_QUEUE_SIZE', '4'))
 stop_event = threading.Event()
 
 
@@ -509,12 +515,9 @@ def init_kb(row, vector_size: int):
     return settings.docStoreConn.createIdx(idxnm, row.get("kb_id", ""), vector_size)
 
 
-async def embedding(docs, mdl, parser_config=None, callback=None):
-    if parser_config is None:
-        parser_config = {}
-    tts, cnts = [], []
+def embedding_contents(docs):
+    cnts = []
     for d in docs:
-        tts.append(d.get("docnm_kwd", "Title"))
         c = "\n".join(d.get("question_kwd", []))
         if not c:
             c = d["content_with_weight"]
@@ -522,22 +525,55 @@ async def embedding(docs, mdl, parser_config=None, callback=None):
         if not c:
             c = "None"
         cnts.append(c)
+    return cnts
+
+
+def title_weight(parser_config):
+    filename_embd_weight = parser_config.get("filename_embd_weight", 0.1) # due to the db support none value
+    if not filename_embd_weight:
+        filename_embd_weight = 0.1
+    return float(filename_embd_weight)
 
-    tk_count = 0
-    if len(tts) == len(cnts):
-        vts, c = await asyncio.to_thread(mdl.encode, tts[0:1])
-        tts = np.tile(vts[0], (len(cnts), 1))
-        tk_count += c
 
+def assign_vectors(docs, vects):
+    assert len(vects) == len(docs)
+    vector_size = 0
+    for i, d in enumerate(docs):
+        v = vects[i].tolist()
+        vector_size = len(v)
+        d["q_%d_vec" % len(v)] = v
+    return vector_size
+
+
+async def encode_batch(mdl, txts):
     @timeout(60)
     def batch_encode(txts):
         nonlocal mdl
         return mdl.encode([truncate(c, mdl.max_length-10) for c in txts])
 
+    if EMBEDDING_BATCHER_ENABLED:
+        # Shares provider batches with the other tasks embedding with the same model.
+        batcher = get_embedding_batcher(mdl, batch_encode, settings.EMBEDDING_BATCH_SIZE, embed_limiter)
+        return await batcher.encode(txts)
+    async with embed_limiter:
+        return await asyncio.to_thread(batch_encode, txts)
+
+
+async def embedding(docs, mdl, parser_config=None, callback=None):
+    if parser_config is None:
+        parser_config = {}
+    tts = [d.get("docnm_kwd", "Title") for d in docs]
+    cnts = embedding_contents(docs)
+
+    tk_count = 0
+    if len(tts) == len(cnts):
+        vts, c = await encode_batch(mdl, tts[0:1])
+        tts = np.tile(vts[0], (len(cnts), 1))
+        tk_count += c
+
     cnts_ = np.array([])
     for i in range(0, len(cnts), settings.EMBEDDING_BATCH_SIZE):
-        async with embed_limiter:
-            vts, c = await asyncio.to_thread(batch_encode, cnts[i : i + settings.EMBEDDING_BATCH_SIZE])
+        vts, c = await encode_batch(mdl, cnts[i : i + settings.EMBEDDING_BATCH_SIZE])
         if len(cnts_) == 0:
             cnts_ = vts
         else:
@@ -545,21 +581,13 @@ async def embedding(docs, mdl, parser_config=None, callback=None):
         tk_count += c
         callback(prog=0.7 + 0.2 * (i + 1) / len(cnts), msg="")
     cnts = cnts_
-    filename_embd_weight = parser_config.get("filename_embd_weight", 0.1) # due to the db support none value
-    if not filename_embd_weight:
-        filename_embd_weight = 0.1
-    title_w = float(filename_embd_weight)
+    title_w = title_weight(parser_config)
     if tts.ndim == 2 and cnts.ndim == 2 and tts.shape == cnts.shape:
         vects = title_w * tts + (1 - title_w) * cnts
     else:
         vects = cnts
 
-    assert len(vects) == len(docs)
-    vector_size = 0
-    for i, d in enumerate(docs):
-        v = vects[i].tolist()
-        vector_size = len(v)
-        d["q_%d_vec" % len(v)] = v
+    vector_size = assign_vectors(docs, vects)
     return tk_count, vector_size
 
 
@@ -610,17 +638,12 @@ async def run_dataflow(task: dict):
             e, kb = KnowledgebaseService.get_by_id(task["kb_id"])
             embedding_id = kb.embd_id
             embedding_model = LLMBundle(task["tenant_id"], LLMType.EMBEDDING, llm_name=embedding_id)
-            @timeout(60)
-            def batch_encode(txts):
-                nonlocal embedding_model
-                return embedding_model.encode([truncate(c, embedding_model.max_length - 10) for c in txts])
             vects = np.array([])
             texts = [o.get("questions", o.get("summary", o["text"])) for o in chunks]
             delta = 0.20/(len(texts)//settings.EMBEDDING_BATCH_SIZE+1)
             prog = 0.8
             for i in range(0, len(texts), settings.EMBEDDING_BATCH_SIZE):
-                async with embed_limiter:
-                    vts, c = await asyncio.to_thread(batch_encode, texts[i : i + settings.EMBEDDING_BATCH_SIZE])
+                vts, c = await encode_batch(embedding_model, texts[i : i + settings.EMBEDDING_BATCH_SIZE])
                 if len(vects) == 0:
                     vects = vts
                 else:
@@ -718,6 +741,8 @@ async def run_raptor_for_kb(row, kb_parser_config, chat_mdl, embd_mdl, vector_si
             raptor_config["max_token"],
             raptor_config["threshold"],
             max_errors=max_errors,
+            clustering=raptor_config.get("clustering", "exhaustive"),
+            reducer=raptor_config.get("reducer", "umap"),
         )
         original_length = len(chunks)
         chunks = await raptor(chunks, kb_parser_config["raptor"]["random_seed"], callback, row["id"])
@@ -774,9 +799,9 @@ async def delete_image(kb_id, chunk_id):
         raise
 
 
-async def insert_es(task_id, task_tenant_id, task_dataset_id, chunks, progress_callback):
+def mother_chunks(chunks, mother_ids: set):
+    """Parent chunks referenced by `chunks` and not yet in `mother_ids`; sets `mom_id` on each child."""
     mothers = []
-    mother_ids = set([])
     for ck in chunks:
         mom = ck.get("mom") or ck.get("mom_with_weight") or ""
         if not mom:
@@ -795,47 +820,164 @@ async def insert_es(task_id, task_tenant_id, task_dataset_id, chunks, progress_c
             if fld not in ["id", "content_with_weight", "doc_id", "docnm_kwd", "kb_id", "available_int", "position_int"]:
                 del mom_ck[fld]
         mothers.append(mom_ck)
+    return mothers
 
-    for b in range(0, len(mothers), settings.DOC_BULK_SIZE):
-        await asyncio.to_thread(settings.docStoreConn.insert,mothers[b:b + settings.DOC_BULK_SIZE],search.index_name(task_tenant_id),task_dataset_id,)
-        task_canceled = has_canceled(task_id)
-        if task_canceled:
-            progress_callback(-1, msg="Task has been canceled.")
-            return False
 
-    for b in range(0, len(chunks), settings.DOC_BULK_SIZE):
-        doc_store_result = await asyncio.to_thread(settings.docStoreConn.insert,chunks[b:b + settings.DOC_BULK_SIZE],search.index_name(task_tenant_id),task_dataset_id,)
-        task_canceled = has_canceled(task_id)
-        if task_canceled:
-            progress_callback(-1, msg="Task has been canceled.")
-            return False
-        if b % 128 == 0:
-            progress_callback(prog=0.8 + 0.1 * (b + 1) / len(chunks), msg="")
-        if doc_store_result:
-            error_message = f"Insert chunk error: {doc_store_result}, please check log file and Elasticsearch/Infinity status!"
-            progress_callback(-1, msg=error_message)
-            raise Exception(error_message)
-        chunk_ids = [chunk["id"] for chunk in chunks[:b + settings.DOC_BULK_SIZE]]
-        chunk_ids_str = " ".join(chunk_ids)
+async def record_chunk_ids(task_id, task_tenant_id, task_dataset_id, chunk_ids, progress_callback):
+    chunk_ids_str = " ".join(chunk_ids)
+    try:
+        TaskService.update_chunk_ids(task_id, chunk_ids_str)
+        return True
+    except DoesNotExist:
+        logging.warning(f"do_handle_task update_chunk_ids failed since task {task_id} is unknown.")
+        await asyncio.to_thread(settings.docStoreConn.delete,{"id": chunk_ids},search.index_name(task_tenant_id),task_dataset_id,)
+        tasks = []
+        for chunk_id in chunk_ids:
+            tasks.append(asyncio.create_task(delete_image(task_dataset_id, chunk_id)))
         try:
-            TaskService.update_chunk_ids(task_id, chunk_ids_str)
-        except DoesNotExist:
-            logging.warning(f"do_handle_task update_chunk_ids failed since task {task_id} is unknown.")
-            doc_store_result = await asyncio.to_thread(settings.docStoreConn.delete,{"id": chunk_ids},search.index_name(task_tenant_id),task_dataset_id,)
-            tasks = []
-            for chunk_id in chunk_ids:
-                tasks.append(asyncio.create_task(delete_image(task_dataset_id, chunk_id)))
-            try:
-                await asyncio.gather(*tasks, return_exceptions=False)
-            except Exception as e:
-                logging.error(f"delete_image failed: {e}")
-                for t in tasks:
-                    t.cancel()
-                await asyncio.gather(*tasks, return_exceptions=True)
-                raise
-            progress_callback(-1, msg=f"Chunk updates failed since task {task_id} is unknown.")
-            return False
-    return True
+            await asyncio.gather(*tasks, return_exceptions=False)
+        except Exception as e:
+            logging.error(f"delete_image failed: {e}")
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        progress_callback(-1, msg=f"Chunk updates failed since task {task_id} is unknown.")
+        return False
+
+
+async def insert_es(task_id, task_tenant_id, task_dataset_id, chunks, progress_callback):
+    try:
+        mothers = mother_chunks(chunks, set([]))
+        for b, e in doc_bulks(mothers, settings.DOC_BULK_MAX_BYTES, settings.DOC_BULK_SIZE):
+            await asyncio.to_thread(settings.docStoreConn.insert,mothers[b:e],search.index_name(task_tenant_id),task_dataset_id,)
+            task_canceled = has_canceled(task_id)
+            if task_canceled:
+                progress_callback(-1, msg="Task has been canceled.")
+                return False
+
+        last_report = -1
+        for b, e in doc_bulks(chunks, settings.DOC_BULK_MAX_BYTES, settings.DOC_BULK_SIZE):
+            doc_store_result = await asyncio.to_thread(settings.docStoreConn.insert,chunks[b:e],search.index_name(task_tenant_id),task_dataset_id,)
+            task_canceled = has_canceled(task_id)
+            if task_canceled:
+                progress_callback(-1, msg="Task has been canceled.")
+                return False
+            if b // 128 != last_report:
+                last_report = b // 128
+                progress_callback(prog=0.8 + 0.1 * (b + 1) / len(chunks), msg="")
+            if doc_store_result:
+                error_message = f"Insert chunk error: {doc_store_result}, please check log file and Elasticsearch/Infinity status!"
+                progress_callback(-1, msg=error_message)
+                raise Exception(error_message)
+            chunk_ids = [chunk["id"] for chunk in chunks[:e]]
+            if not await record_chunk_ids(task_id, task_tenant_id, task_dataset_id, chunk_ids, progress_callback):
+                return False
+        return True
+    finally:
+        # Make cached retrieval results of this dataset unreachable, even after partial inserts.
+        # The index is refreshed first, or a search in between would cache the old chunks under the new generation.
+        await asyncio.to_thread(settings.docStoreConn.refresh, search.index_name(task_tenant_id), task_dataset_id)
+        bump_index_generation(task_dataset_id)
+
+
+async def stream_embed_and_insert(task, chunks, mdl, progress_callback, release_vectors=True):
+    """
+    Embed and index `chunks` as a pipeline instead of in two full passes.
+
+    Batches of EMBEDDING_BATCH_SIZE chunks are encoded and handed to the indexer
+    through a bounded queue, so the doc store writes batch N while the embedding
+    model works on batch N+1 and at most STREAMING_QUEUE_SIZE embedded batches wait
+    in memory. With `release_vectors`, vectors are dropped from the chunk dicts once
+    they are indexed.
+
+    Returns (ok, token_count); ok is False when the task got canceled or is gone.
+    """
+    task_id, task_tenant_id, task_dataset_id = task["id"], task["tenant_id"], task["kb_id"]
+    idxnm = search.index_name(task_tenant_id)
+    batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+    queue = asyncio.Queue(maxsize=STREAMING_QUEUE_SIZE)
+    tk_count = 0
+
+    async def embed_stage():
+        nonlocal tk_count
+        try:
+            vts, c = await encode_batch(mdl, [chunks[0].get("docnm_kwd", "Title")])
+            title_vec = vts[0]
+            tk_count += c
+            title_w = title_weight(task["parser_config"])
+            for b in range(0, len(chunks), batch_size):
+                batch = chunks[b:b + batch_size]
+                vts, c = await encode_batch(mdl, embedding_contents(batch))
+                tk_count += c
+                if vts.ndim == 2 and vts.shape[1] == len(title_vec):
+                    vts = title_w * title_vec + (1 - title_w) * vts
+                assign_vectors(batch, vts)
+                await queue.put(batch)
+        except Exception as e:
+            error_message = "Generate embedding error:{}".format(str(e))
+            progress_callback(-1, error_message)
+            logging.exception(error_message)
+            raise
+        await queue.put(None)
+
+    async def index_stage():
+        mother_ids = set([])
+        chunk_ids = []
+        pending = []
+        last_report = -1
+        while True:
+            batch = await queue.get()
+            if batch is not None:
+                pending.extend(batch)
+            while pending:
+                _, e = next(doc_bulks(pending, settings.DOC_BULK_MAX_BYTES, settings.DOC_BULK_SIZE))
+                bulk, pending = pending[:e], pending[e:]
+                mothers = mother_chunks(bulk, mother_ids)
+                if mothers:
+                    await asyncio.to_thread(settings.docStoreConn.insert, mothers, idxnm, task_dataset_id)
+                doc_store_result = await asyncio.to_thread(settings.docStoreConn.insert, bulk, idxnm, task_dataset_id)
+                if doc_store_result:
+                    error_message = f"Insert chunk error: {doc_store_result}, please check log file and Elasticsearch/Infinity status!"
+                    progress_callback(-1, msg=error_message)
+                    raise Exception(error_message)
+                chunk_ids.extend([ck["id"] for ck in bulk])
+                if release_vectors:
+                    for ck in bulk:
+                        for fld in [k for k in ck.keys() if k.startswith("q_") and k.endswith("_vec")]:
+                            del ck[fld]
+                if has_canceled(task_id):
+                    progress_callback(-1, msg="Task has been canceled.")
+                    return False
+                if len(chunk_ids) // 128 != last_report:
+                    last_report = len(chunk_ids) // 128
+                    progress_callback(prog=0.7 + 0.2 * len(chunk_ids) / len(chunks), msg="")
+                if not await record_chunk_ids(task_id, task_tenant_id, task_dataset_id, chunk_ids, progress_callback):
+                    return False
+            if batch is None:
+                return True
+
+    embedder = asyncio.create_task(embed_stage())
+    indexer = asyncio.create_task(index_stage())
+    try:
+        done, _ = await asyncio.wait([embedder, indexer], return_when=asyncio.FIRST_COMPLETED)
+        if indexer in done:
+            ok = indexer.result()
+            if ok:
+                await embedder
+        else:
+            embedder.result()
+            ok = await indexer
+    finally:
+        # Whichever stage failed or stopped early, the other one must not linger.
+        for t in [embedder, indexer]:
+            t.cancel()
+        await asyncio.gather(embedder, indexer, return_exceptions=True)
+        # Make cached retrieval results of this dataset unreachable, even after partial inserts.
+        # The index is refreshed first, or a search in between would cache the old chunks under the new generation.
+        await asyncio.to_thread(settings.docStoreConn.refresh, idxnm, task_dataset_id)
+        bump_index_generation(task_dataset_id)
+    return ok, tk_count
 
 
 @timeout(60*60*3, 1)
@@ -859,6 +1001,7 @@ async def do_handle_task(task):
     task_parser_config = task["parser_config"]
     task_start_ts = timer()
     toc_thread = None
+    streaming = False
     executor = concurrent.futures.ThreadPoolExecutor()
 
     # prepare the progress callback function
@@ -980,17 +1123,22 @@ async def do_handle_task(task):
         with_community = graphrag_conf.get("community", False)
         async with kg_limiter:
             # await run_graphrag(task, task_language, with_resolution, with_community, chat_model, embedding_model, progress_callback)
-            result = await run_graphrag_for_kb(
-                row=task,
-                doc_ids=task.get("doc_ids", []),
-                language=task_language,
-                kb_parser_config=kb_parser_config,
-                chat_model=chat_model,
-                embedding_model=embedding_model,
-                callback=progress_callback,
-                with_resolution=with_resolution,
-                with_community=with_community,
-            )
+            try:
+                result = await run_graphrag_for_kb(
+                    row=task,
+                    doc_ids=task.get("doc_ids", []),
+                    language=task_language,
+                    kb_parser_config=kb_parser_config,
+                    chat_model=chat_model,
+                    embedding_model=embedding_model,
+                    callback=progress_callback,
+                    with_resolution=with_resolution,
+                    with_community=with_community,
+                )
+            finally:
+                # The graph, entity, relation and community report chunks of the dataset were rewritten.
+                await asyncio.to_thread(settings.docStoreConn.refresh, search.index_name(task_tenant_id), task_dataset_id)
+                bump_index_generation(task_dataset_id)
             logging.info(f"GraphRAG task result for task {task}:\n{result}")
         progress_callback(prog=1.0, msg="Knowledge Graph done ({:.2f}s)".format(timer() - start_ts))
         return
@@ -1008,19 +1156,22 @@ async def do_handle_task(task):
             return
         progress_callback(msg="Generate {} chunks".format(len(chunks)))
         start_ts = timer()
-        try:
-            token_count, vector_size = await embedding(chunks, embedding_model, task_parser_config, progress_callback)
-        except Exception as e:
-            error_message = "Generate embedding error:{}".format(str(e))
-            progress_callback(-1, error_message)
-            logging.exception(error_message)
-            token_count = 0
-            raise
-        progress_message = "Embedding chunks ({:.2f}s)".format(timer() - start_ts)
-        logging.info(progress_message)
-        progress_callback(msg=progress_message)
-        if task["parser_id"].lower() == "naive" and task["parser_config"].get("toc_extraction", False):
-            toc_thread = executor.submit(build_TOC, task, chunks, progress_callback)
+        streaming = STREAMING_INGESTION
+        with_toc = task["parser_id"].lower() == "naive" and task["parser_config"].get("toc_extraction", False)
+        if not streaming:
+            try:
+                token_count, vector_size = await embedding(chunks, embedding_model, task_parser_config, progress_callback)
+            except Exception as e:
+                error_message = "Generate embedding error:{}".format(str(e))
+                progress_callback(-1, error_message)
+                logging.exception(error_message)
+                token_count = 0
+                raise
+            progress_message = "Embedding chunks ({:.2f}s)".format(timer() - start_ts)
+            logging.info(progress_message)
+            progress_callback(msg=progress_message)
+            if with_toc:
+                toc_thread = executor.submit(build_TOC, task, chunks, progress_callback)
 
     chunk_count = len(set([chunk["id"] for chunk in chunks]))
     start_ts = timer()
@@ -1032,7 +1183,16 @@ async def do_handle_task(task):
         return bool(e)
     
     try:
-        if not await _maybe_insert_es(chunks):
+        if streaming:
+            if has_canceled(task_id):
+                return
+            # The TOC chunk reuses the vector of a content chunk, so keep them when it is wanted.
+            ok, token_count = await stream_embed_and_insert(task, chunks, embedding_model, progress_callback, release_vectors=not with_toc)
+            if not ok:
+                return
+            if with_toc:
+                toc_thread = executor.submit(build_TOC, task, chunks, progress_callback)
+        elif not await _maybe_insert_es(chunks):
             return
 
         logging.info(
@@ -1079,6 +1239,7 @@ async def do_handle_task(task):
                         search.index_name(task_tenant_id),
                         task_dataset_id,
                     )
+                    bump_index_generation(task_dataset_id)
             except Exception:
                 logging.exception(
                     f"Remove doc({task_doc_id}) from docStore failed when task({task_id}) canceled."
@@ -1161,6 +1322,7 @@ async def report_status():
                 "done": DONE_TASKS,
                 "failed": FAILED_TASKS,
                 "current": current,
+                "embedding_batcher": embedding_batcher_stats(),
             })
             REDIS_CONN.zadd(CONSUMER_NAME, heartbeat, now.timestamp())
             logging.info(f"{CONSUMER_NAME} reported heartbeat: {heartbeat}")
@@ -23,6 +23,39 @@ DEFAULT_MATCH_SPARSE_TOPN = 10
 VEC = list | np.ndarray
 
 
+def estimated_size(doc: dict) -> int:
+    """Rough size of `doc` once serialized for the doc store, a vector component counting as 20 bytes."""
+    n = 0
+    for v in doc.values():
+        if isinstance(v, str):
+            n += len(v)
+        elif isinstance(v, (list, tuple, np.ndarray)):
+            n += 20 * len(v)
+        else:
+            n += 16
+    return n
+
+
+def doc_bulks(docs: list[dict], max_bytes: int, max_docs: int):
+    """
+    Consecutive (start, end) slices of `docs` to insert per `DocStoreConnection.insert`:
+    as many docs as fit in `max_bytes`, or `max_docs` docs when `max_bytes` is 0.
+    """
+    if max_bytes <= 0:
+        for b in range(0, len(docs), max_docs):
+            yield b, min(b + max_docs, len(docs))
+        return
+    start, size = 0, 0
+    for i, d in enumerate(docs):
+        n = estimated_size(d)
+        if i > start and size + n > max_bytes:
+            yield start, i
+            start, size = i, 0
+        size += n
+    if start < len(docs):
+        yield start, len(docs)
+
+
 @dataclass
 class SparseVector:
     indices: list[int]
@@ -185,6 +218,12 @@ class DocStoreConnection(ABC):
         """
         raise NotImplementedError("Not implemented")
 
+    def refresh(self, indexName: str, knowledgebaseId: str):
+        """
+        Make rows written so far visible to search. Stores whose writes are searchable at once need not override it.
+        """
+        pass
+
     """
     CRUD operations
     """
@@ -0,0 +1,85 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Redis cache of embedding vectors.
+
+Vectors are stored as raw little-endian float32 bytes (or float16 with
+EMBEDDING_CACHE_DTYPE=float16) instead of JSON lists, which is 3-5x smaller and
+needs no parsing. Whole batches are read with a single MGET and written with one
+pipeline round trip.
+
+GraphRAG and RAPTOR always use it; `LLMBundle.encode` consults it too when
+EMBEDDING_CACHE_ENABLED is set.
+"""
+
+import os
+
+import numpy as np
+import xxhash
+
+from rag.utils.redis_conn import REDIS_CONN
+
+# Lets LLMBundle.encode serve repeated texts from the cache.
+EMBEDDING_CACHE_ENABLED = os.environ.get("EMBEDDING_CACHE_ENABLED", "0").lower() in ["1", "true", "yes"]
+EMBEDDING_CACHE_DTYPE = os.environ.get("EMBEDDING_CACHE_DTYPE", "float32").lower()
+EMBEDDING_CACHE_TTL = int(os.environ.get("EMBEDDING_CACHE_TTL", 24 * 3600))
+
+_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+
+
+def _dtype() -> np.dtype:
+    return _DTYPES.get(EMBEDDING_CACHE_DTYPE, _DTYPES["float32"])
+
+
+def embed_cache_key(llmnm, txt) -> str:
+    hasher = xxhash.xxh64()
+    hasher.update(str(llmnm).encode("utf-8"))
+    hasher.update(str(txt).encode("utf-8"))
+    # The dtype is part of the key so that switching it never misreads old bytes.
+    return f"embd:{_dtype().str}:{hasher.hexdigest()}"
+
+
+def pack_embedding(arr) -> bytes:
+    return np.asarray(arr, dtype=_dtype()).tobytes()
+
+
+def unpack_embedding(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype=_dtype()).astype(np.float32)
+
+
+def mget_embed_cache(llmnm, txts: list) -> list[np.ndarray | None]:
+    """Cached vectors of `txts`, None where the cache has no entry."""
+    if not txts:
+        return []
+    raws = REDIS_CONN.mget_bytes([embed_cache_key(llmnm, t) for t in txts])
+    if not raws:
+        return [None] * len(txts)
+    return [unpack_embedding(r) if r else None for r in raws]
+
+
+def mset_embed_cache(llmnm, txts: list, arrs, exp: int = EMBEDDING_CACHE_TTL) -> bool:
+    if not len(txts):
+        return True
+    mapping = {embed_cache_key(llmnm, t): pack_embedding(a) for t, a in zip(txts, arrs)}
+    return REDIS_CONN.mset_bytes(mapping, exp)
+
+
+def get_embed_cache(llmnm, txt) -> np.ndarray | None:
+    return mget_embed_cache(llmnm, [txt])[0]
+
+
+def set_embed_cache(llmnm, txt, arr) -> bool:
+    return mset_embed_cache(llmnm, [txt], [arr])
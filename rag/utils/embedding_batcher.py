@@ -0,0 +1,174 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Coalesces concurrent embedding requests on one model into full batches.
+
+Every task of the executor embeds its own chunks, so with many small documents in
+flight the provider receives lots of half-empty batches. Callers of
+`EmbeddingBatcher.encode` instead put their texts into a shared window which is
+sent as soon as it holds `batch_size` distinct texts, or after `max_wait` seconds
+at the latest. Identical texts inside a window are embedded once.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from itertools import islice
+
+import numpy as np
+
+EMBEDDING_BATCHER_ENABLED = os.environ.get("EMBEDDING_BATCHER_ENABLED", "0").lower() in ["1", "true", "yes"]
+EMBEDDING_BATCH_WAIT_MS = int(os.environ.get("EMBEDDING_BATCH_WAIT_MS", 20))
+
+
+class _Slot:
+    __slots__ = ("future", "enqueued_at", "refs")
+
+    def __init__(self, future, enqueued_at):
+        self.future = future
+        self.enqueued_at = enqueued_at
+        self.refs = 0
+
+
+class EmbeddingBatcher:
+    def __init__(self, encode, batch_size: int, max_wait: float = EMBEDDING_BATCH_WAIT_MS / 1000, limiter=None):
+        """
+        `encode` is a blocking callable mapping a list of texts to (vectors, token_count);
+        it runs in a worker thread, under `limiter` when given.
+        """
+        self._encode = encode
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max_wait
+        self._limiter = limiter
+        self._window: dict[str, _Slot] = {}
+        self._timer = None
+        self._running = set()
+        self._submitted = 0
+        self._deduped = 0
+        self._batches = 0
+        self._dispatched = 0
+        self._wait_total = 0.
+        self._wait_max = 0.
+
+    async def encode(self, texts: list[str]):
+        """Same contract as `LLMBundle.encode`, with the batch's token count apportioned to its callers."""
+        if not texts:
+            return np.array([]), 0
+        loop = asyncio.get_running_loop()
+        now = time.perf_counter()
+        slots = []
+        for t in texts:
+            slot = self._window.get(t)
+            if slot is None:
+                slot = self._window[t] = _Slot(loop.create_future(), now)
+            else:
+                self._deduped += 1
+            slot.refs += 1
+            slots.append(slot)
+        self._submitted += len(texts)
+
+        while len(self._window) >= self.batch_size:
+            self._dispatch(self.batch_size)
+        if self._window and self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        elif not self._window and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # A slot's future is shared by every caller of its text, so one caller being
+        # cancelled must not cancel it for the others.
+        res = await asyncio.gather(*[asyncio.shield(s.future) for s in slots], return_exceptions=True)
+        for r in res:
+            if isinstance(r, BaseException):
+                raise r
+        vects = np.stack([v for v, _ in res])
+        return vects, int(round(sum(c for _, c in res)))
+
+    def _flush(self):
+        self._timer = None
+        while self._window:
+            self._dispatch(self.batch_size)
+
+    def _dispatch(self, n: int):
+        items = [(t, self._window.pop(t)) for t in list(islice(self._window, n))]
+        task = asyncio.create_task(self._run(items))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, items):
+        texts = [t for t, _ in items]
+        now = time.perf_counter()
+        for _, s in items:
+            self._wait_total += now - s.enqueued_at
+            self._wait_max = max(self._wait_max, now - s.enqueued_at)
+        self._batches += 1
+        self._dispatched += len(items)
+        try:
+            if self._limiter is not None:
+                async with self._limiter:
+                    vects, used_tokens = await asyncio.to_thread(self._encode, texts)
+            else:
+                vects, used_tokens = await asyncio.to_thread(self._encode, texts)
+            assert len(vects) == len(texts), "Embedding model returned {} vectors for {} texts".format(len(vects), len(texts))
+        except BaseException as e:
+            logging.warning(f"EmbeddingBatcher batch of {len(texts)} failed: {e}")
+            for _, s in items:
+                if not s.future.done():
+                    s.future.set_exception(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return
+
+        # Tokens are shared out by text length, and a deduplicated text splits its share among its requesters.
+        total_len = sum(max(len(t), 1) for t in texts)
+        for (t, s), v in zip(items, vects):
+            if not s.future.done():
+                s.future.set_result((v, used_tokens * max(len(t), 1) / total_len / s.refs))
+
+    def stats(self) -> dict:
+        return {
+            "submitted": self._submitted,
+            "deduped": self._deduped,
+            "batches": self._batches,
+            "batch_fill": round(self._dispatched / (self._batches * self.batch_size), 3) if self._batches else 0,
+            "avg_wait_ms": round(self._wait_total / self._dispatched * 1000, 2) if self._dispatched else 0,
+            "max_wait_ms": round(self._wait_max * 1000, 2),
+            "pending": len(self._window),
+        }
+
+
+_batchers: dict[tuple, EmbeddingBatcher] = {}
+
+
+def get_embedding_batcher(mdl, encode, batch_size: int, limiter=None) -> EmbeddingBatcher:
+    """
+    The batcher shared by every caller of the same tenant's embedding model `mdl`.
+
+    Batches are sent with the `encode` of the latest caller, so a model
+    re-configured by the tenant is picked up by the next batch.
+    """
+    key = (getattr(mdl, "tenant_id", None), getattr(mdl, "llm_name", None) or id(mdl))
+    batcher = _batchers.get(key)
+    if batcher is None:
+        batcher = _batchers[key] = EmbeddingBatcher(encode, batch_size, limiter=limiter)
+    else:
+        batcher._encode = encode
+    return batcher
+
+
+def embedding_batcher_stats() -> dict:
+    return {"{}/{}".format(*k): b.stats() for k, b in _batchers.items()}
@@ -21,6 +21,9 @@ import time
 import os
 
 import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from elasticsearch import Elasticsearch, NotFoundError
 from elasticsearch_dsl import UpdateByQuery, Q, Search, Index
 from elastic_transport import ConnectionTimeout
@@ -34,11 +37,47 @@ from common.float_utils import get_float
 from common import settings
 from common.constants import PAGERANK_FLD, TAG_FLD
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 ATTEMPT_TIME = 2
+# Bulk requests of one insert call are cut at this many bytes and sent concurrently.
+ES_BULK_MAX_BYTES = int(os.environ.get("ES_BULK_MAX_BYTES", 8 * 1024 * 1024))
+ES_BULK_CONCURRENCY = int(os.environ.get("ES_BULK_CONCURRENCY", 4))
+# Item statuses worth sending again: the cluster was busy, not the document wrong.
+RETRIABLE_BULK_STATUS = {429, 502, 503, 504}
+VECTOR_FIELDS = "q_*_vec"
 
 logger = logging.getLogger('ragflow.es_conn')
 
 
+def _json_default(o):
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _ndjson_line(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, ensure_ascii=False, default=_json_default).encode("utf-8") + b"\n"
+
+
+def _bulk_batches(operations: list[tuple[str, bytes]], max_bytes: int) -> list[list[tuple[str, bytes]]]:
+    batches, size = [[]], 0
+    for op in operations:
+        if batches[-1] and size + len(op[1]) > max_bytes:
+            batches.append([])
+            size = 0
+        batches[-1].append(op)
+        size += len(op[1])
+    return batches
+
+
 @singleton
 class ESConnection(DocStoreConnection):
     def __init__(self):
@@ -135,6 +174,13 @@ class ESConnection(DocStoreConnection):
                 break
         return False
 
+    def refresh(self, indexName: str, knowledgebaseId: str):
+        # Bulk inserts are sent with refresh=False and only become searchable at the next refresh_interval.
+        try:
+            self.es.indices.refresh(index=indexName, allow_no_indices=True)
+        except Exception as e:
+            logger.warning(f"ESConnection.refresh {indexName} got exception: {e}")
+
     """
     CRUD operations
     """
@@ -244,6 +290,7 @@ class ESConnection(DocStoreConnection):
         if limit > 0:
             s = s[offset:offset + limit]
         q = s.to_dict()
+        q["_source"] = self._source_filter(selectFields)
         logger.debug(f"ESConnection.search {str(indexNames)} query: " + json.dumps(q))
 
         for i in range(ATTEMPT_TIME):
@@ -253,8 +300,7 @@ class ESConnection(DocStoreConnection):
                                      body=q,
                                      timeout="600s",
                                      # search_type="dfs_query_then_fetch",
-                                     track_total_hits=True,
-                                     _source=True)
+                                     track_total_hits=True)
                 if str(res.get("timed_out", "")).lower() == "true":
                     raise Exception("Es Timeout.")
                 logger.debug(f"ESConnection.search {str(indexNames)} res: " + str(res))
@@ -270,6 +316,16 @@ class ESConnection(DocStoreConnection):
         logger.error(f"ESConnection.search timeout for {ATTEMPT_TIME} times!")
         raise Exception("ESConnection.search timeout.")
 
+    @staticmethod
+    def _source_filter(selectFields: list[str]):
+        """
+        The `_source` of search hits: just the selected fields, or everything but the
+        vectors when none are selected. Vectors are returned only when selected by name.
+        """
+        if not selectFields or "*" in selectFields:
+            return {"excludes": [VECTOR_FIELDS]}
+        return {"includes": list(dict.fromkeys(selectFields))}
+
     def get(self, chunkId: str, indexName: str, knowledgebaseIds: list[str]) -> dict | None:
         for i in range(ATTEMPT_TIME):
             try:
@@ -290,40 +346,63 @@ class ESConnection(DocStoreConnection):
 
     def insert(self, documents: list[dict], indexName: str, knowledgebaseId: str = None) -> list[str]:
         # Refers to https://www.elastic.co/guide/en/elasticsearch/reference/current/docs-bulk.html
+        # Each document is serialized once, straight from a shallow copy, and the
+        # resulting bulk body is cut into requests of at most ES_BULK_MAX_BYTES.
         operations = []
         for d in documents:
             assert "_id" not in d
             assert "id" in d
-            d_copy = copy.deepcopy(d)
-            d_copy["kb_id"] = knowledgebaseId
-            meta_id = d_copy.pop("id", "")
-            operations.append(
-                {"index": {"_index": indexName, "_id": meta_id}})
-            operations.append(d_copy)
+            source = {k: v for k, v in d.items() if k != "id"}
+            source["kb_id"] = knowledgebaseId
+            meta_id = d["id"]
+            operations.append((meta_id, _ndjson_line({"index": {"_index": indexName, "_id": meta_id}}) + _ndjson_line(source)))
+        if not operations:
+            return []
+
+        batches = _bulk_batches(operations, ES_BULK_MAX_BYTES)
+        if len(batches) == 1 or ES_BULK_CONCURRENCY <= 1:
+            results = [self._bulk(b, indexName) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(ES_BULK_CONCURRENCY, len(batches))) as pool:
+                results = list(pool.map(lambda b: self._bulk(b, indexName), batches))
+        return [e for r in results for e in r]
 
+    def _bulk(self, operations: list[tuple[str, bytes]], indexName: str) -> list[str]:
+        """Send one bulk request; items rejected with a retriable status are sent again on their own."""
         res = []
-        for _ in range(ATTEMPT_TIME):
+        for attempt in range(ATTEMPT_TIME):
+            last = attempt == ATTEMPT_TIME - 1
             try:
-                res = []
-                r = self.es.bulk(index=(indexName), operations=operations,
+                r = self.es.bulk(index=(indexName), operations=[op for _, op in operations],
                                  refresh=False, timeout="60s")
-                if re.search(r"False", str(r["errors"]), re.IGNORECASE):
-                    return res
-
-                for item in r["items"]:
-                    for action in ["create", "delete", "index", "update"]:
-                        if action in item and "error" in item[action]:
-                            res.append(str(item[action]["_id"]) + ":" + str(item[action]["error"]))
-                return res
-            except ConnectionTimeout:
+            except ConnectionTimeout as e:
                 logger.exception("ES request timeout")
+                if last:
+                    return res + [f"{meta_id}:{e}" for meta_id, _ in operations]
                 time.sleep(3)
                 self._connect()
                 continue
             except Exception as e:
-                res.append(str(e))
                 logger.warning("ESConnection.insert got exception: " + str(e))
+                if last:
+                    return res + [str(e)]
+                continue
 
+            if not r["errors"]:
+                return res
+            retry = []
+            for op, item in zip(operations, r["items"]):
+                for action in ["create", "delete", "index", "update"]:
+                    if action in item and "error" in item[action]:
+                        if item[action].get("status") in RETRIABLE_BULK_STATUS and not last:
+                            retry.append(op)
+                        else:
+                            res.append(str(item[action]["_id"]) + ":" + str(item[action]["error"]))
+            if not retry:
+                return res
+            logger.warning(f"ESConnection.insert retries {len(retry)} of {len(operations)} rejected items")
+            operations = retry
+            time.sleep(1)
         return res
 
     def update(self, condition: dict, newValue: dict, indexName: str, knowledgebaseId: str) -> bool:
@@ -124,6 +124,13 @@ class OSConnection(DocStoreConnection):
                 break
         return False
 
+    def refresh(self, indexName: str, knowledgebaseId: str):
+        # Bulk inserts are sent with refresh=False and only become searchable at the next refresh_interval.
+        try:
+            self.os.indices.refresh(index=indexName, allow_no_indices=True)
+        except Exception as e:
+            logger.warning(f"OSConnection.refresh {indexName} got exception: {e}")
+
     """
     CRUD operations
     """
@@ -0,0 +1,163 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Content-addressed cache of intermediate parser output.
+
+DeepDoc stores what OCR, layout and table structure recognition produced for a
+file under a key made of the xxhash of its bytes, the page range and the settings
+of the stage. Re-parsing the same file, for instance with another chunk_token_num
+or delimiter, restores those results instead of running the vision models again.
+
+PARSE_CACHE selects the backend: "local" keeps zlib-compressed JSON files under
+PARSE_CACHE_DIR and evicts the least recently used ones beyond
+PARSE_CACHE_MAX_BYTES; "storage" puts them into STORAGE_IMPL, where expiry is
+left to the bucket's lifecycle rules; "off" disables the cache.
+"""
+
+import json
+import logging
+import os
+import threading
+import zlib
+
+import numpy as np
+import xxhash
+
+from common import settings
+from common.file_utils import get_project_base_directory
+
+PARSE_CACHE = os.environ.get("PARSE_CACHE", "local").lower()
+PARSE_CACHE_DIR = os.environ.get("PARSE_CACHE_DIR", os.path.join(get_project_base_directory(), "rag/res/parse_cache"))
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("PARSE_CACHE_MAX_BYTES", 4 * 1024 * 1024 * 1024))
+PARSE_CACHE_BUCKET = "parse-cache"
+# Bump when the models or the stored state change, so older entries are not read.
+PARSE_CACHE_VERSION = 1
+
+_local_bytes = None
+_local_lock = threading.Lock()
+
+
+def parse_cache_enabled() -> bool:
+    return PARSE_CACHE in ["local", "storage"]
+
+
+def parse_cache_key(binary: bytes, *parts) -> str:
+    hasher = xxhash.xxh64()
+    hasher.update(binary)
+    hasher.update(json.dumps([PARSE_CACHE_VERSION, *parts], default=str).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def state_digest(obj) -> str:
+    """Hash of a stage's input state, such as the boxes a stage starts from."""
+    return xxhash.xxh64(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _json_default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    raise TypeError(f"{type(o).__name__} is not cacheable")
+
+
+def get_parse_cache(key: str) -> dict | None:
+    if not parse_cache_enabled():
+        return None
+    try:
+        blob = _local_get(key) if PARSE_CACHE == "local" else _storage_get(key)
+        return json.loads(zlib.decompress(blob)) if blob else None
+    except Exception:
+        logging.exception(f"get_parse_cache {key} got exception")
+        return None
+
+
+def set_parse_cache(key: str, state: dict):
+    if not parse_cache_enabled():
+        return
+    try:
+        blob = zlib.compress(json.dumps(state, default=_json_default).encode("utf-8"), 1)
+        if PARSE_CACHE == "local":
+            _local_put(key, blob)
+        else:
+            settings.STORAGE_IMPL.put(PARSE_CACHE_BUCKET, key, blob)
+    except Exception:
+        logging.exception(f"set_parse_cache {key} got exception")
+
+
+def _storage_get(key):
+    if not settings.STORAGE_IMPL.obj_exist(PARSE_CACHE_BUCKET, key):
+        return None
+    return settings.STORAGE_IMPL.get(PARSE_CACHE_BUCKET, key)
+
+
+def _local_path(key):
+    return os.path.join(PARSE_CACHE_DIR, key[:2], key)
+
+
+def _local_get(key):
+    path = _local_path(key)
+    try:
+        with open(path, "rb") as f:
+            blob = f.read()
+    except FileNotFoundError:
+        return None
+    # The modification time orders entries for eviction.
+    os.utime(path)
+    return blob
+
+
+def _local_put(key, blob):
+    global _local_bytes
+    path = _local_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
+    with _local_lock:
+        if _local_bytes is None:
+            _local_bytes = sum(size for _, size, _ in _local_entries())
+        else:
+            _local_bytes += len(blob)
+        if _local_bytes > PARSE_CACHE_MAX_BYTES:
+            _local_bytes = _evict(PARSE_CACHE_MAX_BYTES * 0.9)
+
+
+def _local_entries():
+    for root, _, files in os.walk(PARSE_CACHE_DIR):
+        for fnm in files:
+            path = os.path.join(root, fnm)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield path, st.st_size, st.st_mtime
+
+
+def _evict(target_bytes):
+    """Removes the least recently used entries until at most `target_bytes` remain; returns what remains."""
+    entries = sorted(_local_entries(), key=lambda e: e[2])
+    total = sum(size for _, size, _ in entries)
+    for path, size, _ in entries:
+        if total <= target_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
@@ -112,6 +112,8 @@ class RedisDB:
 
     def __init__(self):
         self.REDIS = None
+        # Client without response decoding, for values stored as raw bytes.
+        self.REDIS_BIN = None
         self.config = REDIS
         self.__open__()
 
@@ -137,6 +139,8 @@ class RedisDB:
                 conn_params["password"] = password
 
             self.REDIS = redis.StrictRedis(**conn_params)
+            conn_params["decode_responses"] = False
+            self.REDIS_BIN = redis.StrictRedis(**conn_params)
 
             self.register_scripts()
         except Exception as e:
@@ -205,6 +209,48 @@ class RedisDB:
             self.__open__()
         return False
 
+    def mget(self, keys: list[str]):
+        if not self.REDIS:
+            return None
+        try:
+            return self.REDIS.mget(keys)
+        except Exception as e:
+            logging.warning("RedisDB.mget " + str(keys[:3]) + " got exception: " + str(e))
+            self.__open__()
+        return None
+
+    def incrby(self, key: str, amount: int = 1):
+        try:
+            return self.REDIS.incrby(key, amount)
+        except Exception as e:
+            logging.warning("RedisDB.incrby " + str(key) + " got exception: " + str(e))
+            self.__open__()
+        return None
+
+    def mget_bytes(self, keys: list[str]) -> list[bytes | None] | None:
+        if not self.REDIS_BIN:
+            return None
+        try:
+            return self.REDIS_BIN.mget(keys)
+        except Exception as e:
+            logging.warning("RedisDB.mget_bytes " + str(keys[:3]) + " got exception: " + str(e))
+            self.__open__()
+        return None
+
+    def mset_bytes(self, mapping: dict[str, bytes], exp=3600) -> bool:
+        if not self.REDIS_BIN:
+            return False
+        try:
+            pipeline = self.REDIS_BIN.pipeline(transaction=False)
+            for k, v in mapping.items():
+                pipeline.set(k, v, exp)
+            pipeline.execute()
+            return True
+        except Exception as e:
+            logging.warning("RedisDB.mset_bytes " + str(list(mapping.keys())[:3]) + " got exception: " + str(e))
+            self.__open__()
+        return False
+
     def sadd(self, key: str, member: str):
         try:
             self.REDIS.sadd(key, member)
@@ -409,6 +455,26 @@ class RedisDB:
                 self.__open__()
         return None
 
+    def xadd(self, key: str, fields: dict, maxlen: int | None = None, exp=3600) -> str | None:
+        """Appends an entry to the stream `key`, trimming it to about `maxlen` entries, and returns its id."""
+        try:
+            pipeline = self.REDIS.pipeline(transaction=False)
+            pipeline.xadd(key, fields, maxlen=maxlen, approximate=True)
+            pipeline.expire(key, exp)
+            return pipeline.execute()[0]
+        except Exception as e:
+            logging.warning("RedisDB.xadd " + str(key) + " got exception: " + str(e))
+            self.__open__()
+        return None
+
+    def xrange(self, key: str, start="-", end="+", count: int | None = None) -> list:
+        try:
+            return self.REDIS.xrange(key, start, end, count)
+        except Exception as e:
+            logging.warning("RedisDB.xrange " + str(key) + " got exception: " + str(e))
+            self.__open__()
+        return []
+
     def delete_if_equal(self, key: str, expected_value: str) -> bool:
         """
         Do following atomically:
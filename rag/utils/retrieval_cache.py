@@ -0,0 +1,176 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Two-tier cache for `Dealer.retrieval` results.
+
+Entries live in a per-process LRU and, when Redis is reachable, in Redis so that
+all API workers share them. Every knowledge base has an "index generation"
+counter in Redis which is bumped whenever its chunks change (indexing, chunk
+edits, document deletion). The generations of the searched KBs are part of the
+cache key, so a bump makes every older entry unreachable and stale results are
+never served. Without Redis there is no way to observe bumps made by other
+processes (e.g. the task executor), so the cache is bypassed entirely.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import xxhash
+
+from rag.utils.redis_conn import REDIS_CONN
+
+GENERATION_PREFIX = "kb_index_gen:"
+ENTRY_PREFIX = "retrieval_cache:"
+
+RETRIEVAL_CACHE_ENABLED = os.environ.get("RETRIEVAL_CACHE_ENABLED", "1").lower() in ["1", "true", "yes"]
+RETRIEVAL_CACHE_SIZE = int(os.environ.get("RETRIEVAL_CACHE_SIZE", 512))
+RETRIEVAL_CACHE_TTL = int(os.environ.get("RETRIEVAL_CACHE_TTL", 600))
+
+
+def normalize_question(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip()
+
+
+def model_identity(mdl) -> str:
+    if mdl is None:
+        return ""
+    return f"{getattr(mdl, 'tenant_id', '')}/{getattr(mdl, 'llm_name', None) or type(mdl).__name__}"
+
+
+def bump_index_generation(kb_ids: str | list[str]):
+    """Invalidate cached retrieval results of the given knowledge bases."""
+    if isinstance(kb_ids, str):
+        kb_ids = [kb_ids]
+    kb_ids = [kb_id for kb_id in kb_ids if kb_id]
+    if not kb_ids or not REDIS_CONN.is_alive():
+        return
+    try:
+        pipe = REDIS_CONN.REDIS.pipeline(transaction=False)
+        for kb_id in set(kb_ids):
+            pipe.incr(GENERATION_PREFIX + kb_id)
+        pipe.execute()
+    except Exception as e:
+        logging.warning(f"bump_index_generation {kb_ids} got exception: {e}")
+
+
+class RetrievalCache:
+    def __init__(self, capacity: int = RETRIEVAL_CACHE_SIZE, ttl: int = RETRIEVAL_CACHE_TTL, enabled: bool = RETRIEVAL_CACHE_ENABLED):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.enabled = enabled and capacity > 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def generations(self, kb_ids: list[str]) -> list[str] | None:
+        if not kb_ids or not REDIS_CONN.is_alive():
+            return None
+        gens = REDIS_CONN.mget([GENERATION_PREFIX + kb_id for kb_id in kb_ids])
+        if gens is None:
+            return None
+        return [g or "0" for g in gens]
+
+    def key(self, question: str, tenant_ids: list[str], kb_ids: list[str], **params) -> str | None:
+        """
+        Build the cache key, or return None when the cache can not be used for
+        this request.
+        """
+        if not self.enabled or not question:
+            self.bypasses += 1
+            return None
+        kb_ids = sorted(set(kb_ids or []))
+        gens = self.generations(kb_ids)
+        if gens is None:
+            self.bypasses += 1
+            return None
+        hasher = xxhash.xxh64()
+        hasher.update(normalize_question(question).encode("utf-8"))
+        hasher.update(json.dumps(sorted(tenant_ids or [])).encode("utf-8"))
+        hasher.update(json.dumps(list(zip(kb_ids, gens))).encode("utf-8"))
+        hasher.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+        return ENTRY_PREFIX + hasher.hexdigest()
+
+    def get(self, key: str | None) -> dict | None:
+        if key is None:
+            return None
+        payload = None
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                expire_at, payload = entry
+                if expire_at < time.time():
+                    del self._lru[key]
+                    payload = None
+                else:
+                    self._lru.move_to_end(key)
+                    self.local_hits += 1
+        if payload is None:
+            payload = REDIS_CONN.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self.redis_hits += 1
+            self._put_local(key, payload)
+        # Results are handed out as fresh objects: callers freely mutate them.
+        return json.loads(payload)
+
+    def set(self, key: str | None, ranks: dict):
+        if key is None:
+            return
+        try:
+            payload = json.dumps(ranks, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logging.debug(f"RetrievalCache: result is not serializable: {e}")
+            return
+        self._put_local(key, payload)
+        REDIS_CONN.set(key, payload, self.ttl)
+
+    def _put_local(self, key: str, payload: str):
+        with self._lock:
+            self._lru[key] = (time.time() + self.ttl, payload)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> dict:
+        hits = self.local_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._lru),
+            "capacity": self.capacity,
+            "hits": hits,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+retrieval_cache = RetrievalCache()
@@ -0,0 +1,170 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Concurrent agent sessions run in the "native" and "thread" canvas execution modes.
+
+The LLMs and Tavily are replaced by fakes that wait `--llm-latency` and
+`--tool-latency` seconds, so nothing needs the database or the network. The fake
+LLM first calls every tool an agent has, then completes the task, so the
+supervisor of deep_research.json fans out to its three sub-agents and two of them
+search the web. Per-component times come from `Canvas.component_timings`.
+
+An agent followed by a Message streams its answer, and the agent's work then
+happens while the canvas consumes the stream rather than in the component.
+`--no-message` drops the Message components so that it happens in the component.
+
+    python test/benchmark/bench_canvas_execution.py --sessions 32 --workers 8
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agent import canvas as canvas_module
+from agent.canvas import Canvas, compile_canvas, session_state
+from agent.component import agent_with_tools, llm
+from agent.tools import tavily
+from api.db.services.document_service import DocumentService
+from api.db.services.tenant_llm_service import TenantLLMService
+
+TOOL_NAME = re.compile(r"^## \d+\. (\S+)$", re.MULTILINE)
+
+
+class FakeChatModel:
+    llm_name = "fake"
+    max_length = 32768
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def bind_tools(self, *args, **kwargs):
+        pass
+
+    async def async_chat(self, system, history, gen_conf=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        tools = [t for t in TOOL_NAME.findall(system or "") if t != "complete_task"]
+        if not tools:
+            return "An answer."
+        if any(m["role"] == "assistant" for m in history):
+            return json.dumps([{"name": "complete_task", "arguments": {"answer": "An answer."}}])
+        args = {"user_prompt": "Look it up.", "reasoning": "", "context": "", "query": "agents", "urls": ["https://example.com"]}
+        return json.dumps([{"name": t, "arguments": args} for t in tools])
+
+    async def async_chat_streamly(self, system, history, gen_conf=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        ans = ""
+        for w in "A streamed answer of a few words.".split():
+            ans += w + " "
+            yield ans
+
+
+class FakeTavilyClient:
+    latency = 0.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def search(self, **kwargs):
+        time.sleep(self.latency)
+        return {"results": [{"title": "Result", "url": "https://example.com", "content": "Some content.", "raw_content": "", "score": 1.0}]}
+
+    def extract(self, **kwargs):
+        time.sleep(self.latency)
+        return {"results": [{"url": "https://example.com", "raw_content": "Some content."}]}
+
+
+def patch_models(llm_latency, tool_latency):
+    llm.LLMBundle = agent_with_tools.LLMBundle = lambda *args, **kwargs: FakeChatModel(llm_latency)
+    TenantLLMService.llm_id2llm_type = classmethod(lambda cls, llm_id: "chat")
+    DocumentService.get_by_ids = classmethod(lambda cls, ids: [])  # looked up when tool results are put into prompts
+    FakeTavilyClient.latency = tool_latency
+    tavily.TavilyClient = FakeTavilyClient
+
+
+async def run_session(compiled, state, question):
+    canvas = Canvas(None, "tenant", compiled=compiled, state=json.loads(json.dumps(state)))
+    canvas.reset()
+    async for _ in canvas.run(query=question):
+        pass
+    return canvas.component_timings
+
+
+async def run_sessions(compiled, state, sessions):
+    peak_threads = threading.active_count()
+    done = asyncio.Event()
+
+    async def sample():
+        nonlocal peak_threads
+        while not done.is_set():
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(sample())
+    st = time.perf_counter()
+    timings = await asyncio.gather(*[run_session(compiled, state, f"question {i}") for i in range(sessions)])
+    elapsed = time.perf_counter() - st
+    done.set()
+    await sampler
+    return elapsed, peak_threads, timings
+
+
+def report(mode, elapsed, peak_threads, timings):
+    print(f"{mode:>6}: {elapsed:.2f}s wall, {peak_threads} threads at peak")
+    per_cpn = {}
+    for t in timings:
+        for cpn_id, v in t.items():
+            per_cpn.setdefault(cpn_id, []).append(v)
+    for cpn_id, vs in per_cpn.items():
+        print(f"        {cpn_id:<28} {vs[0]['mode']:<6} queued {statistics.mean(v['queued'] for v in vs) * 1000:8.1f} ms, "
+              f"ran {statistics.mean(v['elapsed'] for v in vs) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAGFlow canvas execution benchmark")
+    parser.add_argument("--template", default=os.path.join(os.path.dirname(__file__), "../../agent/templates/deep_research.json"))
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=canvas_module.CANVAS_MAX_WORKERS, help="size of the shared canvas executor")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tool-latency", type=float, default=0.2)
+    parser.add_argument("--no-message", action="store_true", help="drop the Message components of the template")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    patch_models(args.llm_latency, args.tool_latency)
+    canvas_module._thread_pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="canvas")
+
+    with open(args.template, encoding="utf-8") as f:
+        dsl = json.load(f)["dsl"]
+    if args.no_message:
+        messages = [k for k, cpn in dsl["components"].items() if cpn["obj"]["component_name"] == "Message"]
+        for k in messages:
+            del dsl["components"][k]
+        for cpn in dsl["components"].values():
+            cpn["downstream"] = [d for d in cpn["downstream"] if d not in messages]
+    compiled = compile_canvas("benchmark", dsl)
+    state = session_state(dsl)
+
+    print(f"{args.sessions} concurrent sessions of {os.path.basename(args.template)}, {args.workers} canvas threads")
+    for mode in ["thread", "native"]:
+        canvas_module.CANVAS_EXECUTION_MODE = mode
+        asyncio.run(run_sessions(compiled, state, 1))  # warm up
+        report(mode, *asyncio.run(run_sessions(compiled, state, args.sessions)))
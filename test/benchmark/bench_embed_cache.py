@@ -0,0 +1,100 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Compare the JSON-per-key embedding cache with the binary batched one.
+
+Payload size and (de)serialization cost are always reported. Round-trip latency
+is measured against the Redis configured in service_conf.yaml when reachable.
+
+    python test/benchmark/bench_embed_cache.py --count 2000 --dim 1024
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import xxhash
+
+from rag.utils import embed_cache
+from rag.utils.redis_conn import REDIS_CONN
+
+
+def json_key(llmnm, txt):
+    hasher = xxhash.xxh64()
+    hasher.update(str(llmnm).encode("utf-8"))
+    hasher.update(str(txt).encode("utf-8"))
+    return "bench:" + hasher.hexdigest()
+
+
+def json_set_one_by_one(llmnm, txts, vecs):
+    for t, v in zip(txts, vecs):
+        REDIS_CONN.set(json_key(llmnm, t), json.dumps(v.tolist()).encode("utf-8"), 600)
+
+
+def json_get_one_by_one(llmnm, txts):
+    res = []
+    for t in txts:
+        b = REDIS_CONN.get(json_key(llmnm, t))
+        res.append(np.array(json.loads(b)) if b else None)
+    return res
+
+
+def timed(fn):
+    st = time.perf_counter()
+    res = fn()
+    return time.perf_counter() - st, res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAGFlow embedding cache benchmark")
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+
+    llmnm = "bench-embedding@Bench"
+    txts = [f"benchmark text {i}" for i in range(args.count)]
+    vecs = np.random.default_rng(0).standard_normal((args.count, args.dim))
+
+    json_bytes = sum(len(json.dumps(v.tolist())) for v in vecs)
+    t_json_codec, _ = timed(lambda: [np.array(json.loads(json.dumps(v.tolist()))) for v in vecs])
+    bin_bytes = sum(len(embed_cache.pack_embedding(v)) for v in vecs)
+    t_bin_codec, _ = timed(lambda: [embed_cache.unpack_embedding(embed_cache.pack_embedding(v)) for v in vecs])
+    print(f"{args.count} vectors x {args.dim} dims, cache dtype {embed_cache.EMBEDDING_CACHE_DTYPE}")
+    print(f"payload   json: {json_bytes / 1024 / 1024:.1f} MiB   binary: {bin_bytes / 1024 / 1024:.1f} MiB   ({json_bytes / bin_bytes:.1f}x smaller)")
+    print(f"codec     json: {t_json_codec * 1000:.0f} ms   binary: {t_bin_codec * 1000:.0f} ms")
+
+    try:
+        REDIS_CONN.REDIS.ping()
+    except Exception as e:
+        print(f"Redis is not reachable, skipping round-trip latency: {e}")
+        raise SystemExit(0)
+
+    t_json_set, _ = timed(lambda: json_set_one_by_one(llmnm, txts, vecs))
+    t_json_get, _ = timed(lambda: json_get_one_by_one(llmnm, txts))
+
+    def batched(fn):
+        res = []
+        for b in range(0, len(txts), args.batch):
+            res.append(fn(b))
+        return res
+
+    t_bin_set, _ = timed(lambda: batched(lambda b: embed_cache.mset_embed_cache(llmnm, txts[b:b + args.batch], vecs[b:b + args.batch], 600)))
+    t_bin_get, got = timed(lambda: batched(lambda b: embed_cache.mget_embed_cache(llmnm, txts[b:b + args.batch])))
+    assert all(v is not None for batch in got for v in batch)
+
+    print(f"set       json: {t_json_set * 1000:.0f} ms   binary: {t_bin_set * 1000:.0f} ms   ({t_json_set / t_bin_set:.1f}x)")
+    print(f"get       json: {t_json_get * 1000:.0f} ms   binary: {t_bin_get * 1000:.0f} ms   ({t_json_get / t_bin_get:.1f}x)")
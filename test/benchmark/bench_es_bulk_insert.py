@@ -0,0 +1,129 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Compare chunk indexing into Elasticsearch: deep copies in DOC_BULK_SIZE slices
+against shallow copies, byte-budget batches and concurrent bulk requests.
+
+A local stand-in replaces the cluster. It serializes request bodies the same way
+as the client, sleeps for a round trip plus transfer time, and can reject a share
+of the items with 429 to exercise the retry of failed items.
+
+    python test/benchmark/bench_es_bulk_insert.py --chunks 100000 --dim 1024
+"""
+import argparse
+import copy
+import random
+import time
+
+from elastic_transport import NdjsonSerializer
+
+from rag.utils import es_conn
+from rag.utils.doc_store_conn import doc_bulks
+
+
+class StandInES:
+    def __init__(self, rtt, bandwidth, reject):
+        self.rtt = rtt
+        self.bandwidth = bandwidth
+        self.reject = reject
+        self.serializer = NdjsonSerializer()
+        self.requests = 0
+        self.bytes = 0
+        self.indexed = set()
+
+    def bulk(self, index, operations, refresh, timeout):
+        body = self.serializer.dumps(operations)
+        self.requests += 1
+        self.bytes += len(body)
+        time.sleep(self.rtt + len(body) / self.bandwidth)
+        ids = [self.serializer.json_loads(line)["index"]["_id"] for line in body.split(b"\n")[:-1:2]]
+        items = []
+        for i in ids:
+            if random.random() < self.reject:
+                items.append({"index": {"_id": i, "status": 429, "error": {"type": "es_rejected_execution_exception"}}})
+            else:
+                self.indexed.add(i)
+                items.append({"index": {"_id": i, "status": 201}})
+        return {"errors": any("error" in it["index"] for it in items), "items": items}
+
+
+def deepcopy_insert(conn, documents, index_name, kb_id):
+    """The previous ESConnection.insert."""
+    operations = []
+    for d in documents:
+        d_copy = copy.deepcopy(d)
+        d_copy["kb_id"] = kb_id
+        meta_id = d_copy.pop("id", "")
+        operations.append({"index": {"_index": index_name, "_id": meta_id}})
+        operations.append(d_copy)
+    r = conn.es.bulk(index=index_name, operations=operations, refresh=False, timeout="60s")
+    return [str(it["index"]["_id"]) for it in r["items"] if "error" in it["index"]]
+
+
+def synthetic_chunks(n, dim, seed=0):
+    rnd = random.Random(seed)
+    vectors = [[rnd.uniform(-1, 1) for _ in range(dim)] for _ in range(256)]
+    text = "RAGFlow 基于深度文档理解的检索增强生成引擎。" * 20
+    return [{
+        "id": f"chunk{i}",
+        "doc_id": "doc",
+        "docnm_kwd": "bench.pdf",
+        "content_with_weight": text,
+        "content_ltks": text,
+        "content_sm_ltks": text,
+        "page_num_int": [1],
+        "position_int": [[1, 0, 100, 0, 100]],
+        f"q_{dim}_vec": vectors[i % len(vectors)],
+    } for i in range(n)]
+
+
+def run(label, conn, chunks, insert, bulks):
+    st = time.perf_counter()
+    errors = []
+    for b, e in bulks:
+        errors.extend(insert(chunks[b:e], "ragflow_bench", "kb"))
+    elapsed = time.perf_counter() - st
+    print(f"{label:>28}: {elapsed:7.2f}s, {conn.es.requests:6d} requests, "
+          f"{conn.es.bytes / 2**20:8.1f} MiB, indexed {len(conn.es.indexed)}, failed {len(errors)}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAGFlow Elasticsearch bulk insert benchmark")
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="stand-in round trip per bulk request")
+    parser.add_argument("--mbps", type=float, default=200.0, help="stand-in ingest bandwidth, MiB/s per request")
+    parser.add_argument("--reject", type=float, default=0.0, help="share of items the stand-in rejects with 429")
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.chunks, args.dim)
+    cls = next(c.cell_contents for c in es_conn.ESConnection.__closure__ if isinstance(c.cell_contents, type))
+
+    def connection():
+        conn = cls.__new__(cls)
+        conn.es = StandInES(args.rtt_ms / 1000, args.mbps * 2**20, args.reject)
+        return conn
+
+    conn = connection()
+    run("deepcopy, DOC_BULK_SIZE=4", conn, chunks, lambda *a: deepcopy_insert(conn, *a),
+        ((b, min(b + 4, len(chunks))) for b in range(0, len(chunks), 4)))
+    conn = connection()
+    run("shallow, DOC_BULK_SIZE=4", conn, chunks, conn.insert,
+        ((b, min(b + 4, len(chunks))) for b in range(0, len(chunks), 4)))
+    for concurrency in [1, es_conn.ES_BULK_CONCURRENCY]:
+        es_conn.ES_BULK_CONCURRENCY = concurrency
+        conn = connection()
+        run(f"byte budget, concurrency={concurrency}", conn, chunks, conn.insert, doc_bulks(chunks, 32 * 2**20, 4))
@@ -0,0 +1,87 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Compare CPU OCR throughput of per-page text recognition against RecognitionBatcher.
+
+Inputs are loaded as in deepdoc/vision/t_ocr.py. Text lines are detected and cropped
+once per page; recognition then runs either page by page, as
+RAGFlowPdfParser did, or through RecognitionBatcher across pages. Throughput is
+reported in pages per minute, detection included.
+
+    python test/benchmark/bench_ocr_recognition.py --inputs some.pdf --pages 8 --batch-size 32
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+os.environ["CUDA_VISIBLE_DEVICES"] = ""
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../")))
+
+import numpy as np  # noqa: E402
+
+from deepdoc.vision import OCR, RecognitionBatcher, init_in_out  # noqa: E402
+
+
+def crops_of(ocr, images):
+    crops, st = [], time.perf_counter()
+    for img in images:
+        img = np.array(img)
+        bxs = ocr.detect(img)
+        if isinstance(bxs, tuple):  # nothing detected
+            bxs = []
+        crops.append([ocr.get_rotate_crop_image(img, copy.deepcopy(np.array(b, dtype=np.float32))) for b, _ in bxs])
+    return crops, time.perf_counter() - st
+
+
+def per_page(ocr, crops):
+    return [ocr.recognize_batch(page) if page else [] for page in crops]
+
+
+def cross_page(ocr, crops, batch_size, max_pages):
+    texts = [None] * len(crops)
+    batcher = RecognitionBatcher(ocr, 0, batch_size, max_pages)
+    for i, page in enumerate(crops):
+        batcher.add(page, lambda t, i=i: texts.__setitem__(i, t))
+    batcher.flush()
+    return texts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAGFlow OCR recognition batching benchmark")
+    parser.add_argument("--inputs", required=True, help="Directory of images or PDFs, or a single image or PDF")
+    parser.add_argument("--output_dir", default="./ocr_outputs")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--pages", type=int, default=8, help="pages whose text lines are recognized together")
+    args = parser.parse_args()
+
+    ocr = OCR()
+    images, _ = init_in_out(args)
+    crops, t_det = crops_of(ocr, images)
+    print(f"{len(images)} pages, {sum(map(len, crops))} text lines, detection {t_det:.1f}s")
+
+    st = time.perf_counter()
+    expected = per_page(ocr, crops)
+    t_page = time.perf_counter() - st
+    st = time.perf_counter()
+    got = cross_page(ocr, crops, args.batch_size, args.pages)
+    t_cross = time.perf_counter() - st
+
+    same = sum(a == b for e, g in zip(expected, got) for a, b in zip(e, g))
+    for name, t in [("per page", t_page), ("cross page", t_cross)]:
+        print(f"{name:>10}: recognition {t:.1f}s, {len(images) * 60 / (t_det + t):.1f} pages/min")
+    print(f"{same}/{sum(map(len, crops))} lines recognized identically")
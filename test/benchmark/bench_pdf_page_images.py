@@ -0,0 +1,111 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Compare peak memory of rendering PDF pages eagerly against PdfPageImages.
+
+A synthetic PDF is written with reportlab. Each mode runs in its own process and
+walks the pages the way RAGFlowPdfParser does: one pass for OCR, then a pass in
+batches of 16 numpy arrays for layout recognition. Peak RSS is read from
+getrusage; with fewer pages in the window than in the document, the second pass
+renders pages again.
+
+    python test/benchmark/bench_pdf_page_images.py --pages 300 --zoomin 3
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+def synthetic_pdf(path, pages):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=A4)
+    for p in range(pages):
+        c.setFont("Helvetica", 10)
+        for line in range(60):
+            c.drawString(40, 800 - line * 12, f"Page {p + 1} line {line + 1}: the quick brown fox jumps over the lazy dog {p * line}")
+        c.rect(40, 40, 200, 40)
+        c.showPage()
+    c.save()
+
+
+def walk(images):
+    checksum = 0
+    for img in images:
+        checksum += int(np.array(img)[::97, ::97].sum())
+    for s in range(0, len(images), 16):
+        batch = [np.array(im) for im in images[s:s + 16]]
+        checksum += sum(int(b[::97, ::97].sum()) for b in batch)
+    return checksum
+
+
+def run(mode, path, zoomin, window):
+    import pdfplumber
+
+    # Imported in both modes so that they start from the same baseline.
+    from deepdoc.parser.pdf_page_images import PdfPageImages
+
+    st = time.perf_counter()
+    if mode == "eager":
+        with pdfplumber.open(path) as pdf:
+            images = [p.to_image(resolution=72 * zoomin, antialias=True).annotated for p in pdf.pages]
+        checksum = walk(images)
+    else:
+        images = PdfPageImages(path, 72 * zoomin, 0, 100000, threading.Lock(), window=window)
+        checksum = walk(images)
+        images.close()
+    elapsed = time.perf_counter() - st
+    print(json.dumps({"rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "seconds": elapsed, "checksum": checksum}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAGFlow PDF page rendering memory benchmark")
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--zoomin", type=int, default=3)
+    parser.add_argument("--window", type=int, default=32)
+    parser.add_argument("--mode", choices=["eager", "streaming"])
+    parser.add_argument("--pdf")
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args.mode, args.pdf, args.zoomin, args.window)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.pdf")
+        synthetic_pdf(path, args.pages)
+        results = {}
+        for mode in ["eager", "streaming"]:
+            proc = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--pdf", path, "--zoomin", str(args.zoomin), "--window", str(args.window)],
+                capture_output=True, text=True,
+            )
+            if proc.returncode:
+                print(f"{mode:>9}: exited with {proc.returncode}, likely out of memory")
+                continue
+            results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{mode:>9}: peak RSS {results[mode]['rss_mb']:.0f} MB, {results[mode]['seconds']:.1f}s")
+        if len(results) == 2:
+            assert results["eager"]["checksum"] == results["streaming"]["checksum"], "page images differ"
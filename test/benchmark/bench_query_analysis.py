@@ -0,0 +1,98 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+CPU time of the query analysis done by one `Dealer.retrieval`, before and after QueryAnalysis.
+
+Before, `search` ran `FulltextQueryer.question` with min_match 0.3, again with 0.1
+when nothing matched, and `rerank` ran it a third time; `search` then tokenized
+the keywords again for highlighting. Now the question is analyzed once and the
+analysis is reused, from the LRU when the question was asked recently.
+"Cold" questions are new to the cache, "warm" ones are asked again.
+
+    python test/benchmark/bench_query_analysis.py --questions questions.txt --repeat 5
+"""
+import argparse
+import time
+
+from rag.nlp import rag_tokenizer
+from rag.nlp.query import FulltextQueryer
+
+QUESTIONS = [
+    "What are the side effects of long-term ibuprofen use in elderly patients?",
+    "How do I configure horizontal pod autoscaling in a Kubernetes cluster?",
+    "如何在集群中配置自动扩缩容以及监控资源使用情况",
+    "长期服用布洛芬对老年患者有哪些副作用",
+    "检索增强生成流水线如何根据混合相似度对文本块排序",
+]
+
+
+def uncached_question(qryr, question, min_match=0.6):
+    analysis = qryr._analyze(question)
+    return analysis.match_text(min_match), analysis.keywords
+
+
+def per_call(qryr, question, fallback):
+    _, keywords = uncached_question(qryr, question, min_match=0.3)
+    if fallback:
+        uncached_question(qryr, question, min_match=0.1)
+    kwds = set()
+    for k in keywords:
+        kwds.add(k)
+        for kk in rag_tokenizer.fine_grained_tokenize(k).split():
+            if len(kk) >= 2:
+                kwds.add(kk)
+    uncached_question(qryr, question)
+
+
+def analyzed_once(qryr, question, fallback):
+    analysis = qryr.analyze(question)
+    analysis.match_text(min_match=0.3)
+    if fallback:
+        analysis.match_text(min_match=0.1)
+    analysis.highlight_keywords  # noqa: B018
+    qryr.analyze(question)
+
+
+def cpu_ms(fn, qryr, questions, fallback):
+    st = time.process_time()
+    for q in questions:
+        fn(qryr, q, fallback)
+    return (time.process_time() - st) * 1000 / len(questions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAGFlow query analysis benchmark")
+    parser.add_argument("--questions", help="file with one question per line")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fallback", action="store_true", help="include the min_match 0.1 retry of an empty search")
+    args = parser.parse_args()
+
+    questions = QUESTIONS
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    # The uncached path does not touch the LRU, so one queryer serves both.
+    qryr = FulltextQueryer()
+    uncached_question(qryr, questions[0])  # load dictionaries and models
+    before = [cpu_ms(per_call, qryr, questions, args.fallback) for _ in range(args.repeat)]
+    cold = cpu_ms(analyzed_once, qryr, questions, args.fallback)
+    warm = [cpu_ms(analyzed_once, qryr, questions, args.fallback) for _ in range(args.repeat)]
+
+    print(f"{len(questions)} questions, CPU per retrieval")
+    print(f"before:         {min(before):.3f} ms")
+    print(f"analysis, cold: {cold:.3f} ms")
+    print(f"analysis, warm: {min(warm):.3f} ms")
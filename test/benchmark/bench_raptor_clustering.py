@@ -0,0 +1,71 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Compare RAPTOR clustering modes on synthetic chunk embeddings.
+
+For every mode the reduction and the cluster count search are timed, and the BIC
+of the chosen mixture is reported on that mode's reduced embeddings. UMAP runs are
+not reproducible, so the fast search is also run on the exhaustive mode's
+reduction, where both BICs are directly comparable. The first UMAP run includes
+its JIT compilation.
+
+    python test/benchmark/bench_raptor_clustering.py --chunks 1000 3000 --max-cluster 64
+"""
+import argparse
+import time
+
+import numpy as np
+
+from rag.raptor import RecursiveAbstractiveProcessing4TreeOrganizedRetrieval as Raptor
+
+MODES = [("exhaustive", "umap"), ("fast", "umap"), ("fast", "pca")]
+
+
+def synthetic_embeddings(n, dim, topics, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim))
+    x = centers[rng.integers(0, topics, n)] + 0.6 * rng.standard_normal((n, dim))
+    return list(x / np.linalg.norm(x, axis=1, keepdims=True))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAGFlow RAPTOR clustering benchmark")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 3000])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--topics", type=int, default=24)
+    parser.add_argument("--max-cluster", type=int, default=64)
+    args = parser.parse_args()
+
+    for n in args.chunks:
+        embeddings = synthetic_embeddings(n, args.dim, args.topics)
+        reference = None
+        for clustering, reducer in MODES:
+            raptor = Raptor(args.max_cluster, None, None, "", clustering=clustering, reducer=reducer)
+            st = time.perf_counter()
+            reduced = raptor._reduce(embeddings, 0)
+            t_reduce = time.perf_counter() - st
+            st = time.perf_counter()
+            k, gm = raptor._get_optimal_clusters(reduced, 0)
+            t_search = time.perf_counter() - st
+            line = f"{n} chunks {clustering:>10}/{reducer:<4}: reduce {t_reduce:6.2f}s, search {t_search:6.2f}s, clusters {k:3d}, BIC {gm.bic(reduced):12.1f}"
+            if reducer == "umap":
+                if reference is None:
+                    reference = reduced
+                else:
+                    # Same cluster count search, on the reduction of the exhaustive mode.
+                    k, gm = raptor._get_optimal_clusters(reference, 0)
+                    line += f", on exhaustive's reduction: clusters {k:3d}, BIC {gm.bic(reference):12.1f}"
+            print(line, flush=True)
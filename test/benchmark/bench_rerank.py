@@ -0,0 +1,102 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+"""
+Micro-benchmark of the rerank stage: the per-candidate term weighting path that
+`FulltextQueryer.hybrid_similarity` used to take versus `rag.nlp.batch_rerank`.
+
+    python test/benchmark/bench_rerank.py --candidates 1024 --dim 1024
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from common.float_utils import get_float
+from rag.nlp import batch_rerank
+from rag.nlp.query import FulltextQueryer
+
+
+def legacy_hybrid_similarity(qryr, avec, vec_strs, atks, btkss, tkweight=0.3, vtweight=0.7):
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    bvecs = [[get_float(v) for v in s.split("\t")] for s in vec_strs]
+
+    def to_dict(tks):
+        d = defaultdict(int)
+        for t, c in qryr.tw.weights(tks, preprocess=False):
+            d[t] += c
+        return d
+
+    qd = to_dict(atks)
+    tksim = [qryr.similarity(qd, to_dict(tks)) for tks in btkss]
+    sims = cosine_similarity([avec], bvecs)
+    if np.sum(sims[0]) == 0:
+        return np.array(tksim), tksim, sims[0]
+    return np.array(sims[0]) * vtweight + np.array(tksim) * tkweight, tksim, sims[0]
+
+
+def vectorized_hybrid_similarity(qryr, avec, vec_strs, atks, btkss, tkweight=0.3, vtweight=0.7):
+    fields = {str(i): {"v": s} for i, s in enumerate(vec_strs)}
+    mat = batch_rerank.decode_vectors(fields, list(fields.keys()), "v", len(avec))
+    return qryr.hybrid_similarity(avec, mat, atks, btkss, tkweight, vtweight)
+
+
+def synthetic(n, dim, vocab_size=20000, chunk_tokens=256, seed=0):
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    query_tks = rng.sample(vocab, 12)
+    btkss = []
+    for _ in range(n):
+        tks = rng.sample(vocab, chunk_tokens)
+        tks.extend(rng.sample(query_tks, rng.randint(0, len(query_tks))))
+        btkss.append(tks)
+    vecs = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    vec_strs = ["\t".join(f"{x:.6f}" for x in row) for row in vecs]
+    avec = np.random.default_rng(seed + 1).standard_normal(dim).tolist()
+    return avec, vec_strs, query_tks, btkss
+
+
+def timeit(fn, repeat):
+    best = float("inf")
+    res = None
+    for _ in range(repeat):
+        st = time.perf_counter()
+        res = fn()
+        best = min(best, time.perf_counter() - st)
+    return best, res
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAGFlow rerank micro-benchmark")
+    parser.add_argument("--candidates", type=int, default=1024)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    qryr = FulltextQueryer()
+    avec, vec_strs, query_tks, btkss = synthetic(args.candidates, args.dim)
+
+    t_old, old = timeit(lambda: legacy_hybrid_similarity(qryr, avec, vec_strs, query_tks, btkss), args.repeat)
+    t_new, new = timeit(lambda: vectorized_hybrid_similarity(qryr, avec, vec_strs, query_tks, btkss), args.repeat)
+
+    for name, a, b in zip(("sim", "tksim", "vtsim"), old, new):
+        print(f"max |{name} diff|: {np.max(np.abs(np.asarray(a) - np.asarray(b))):.2e}")
+    print(f"candidates={args.candidates} dim={args.dim}")
+    print(f"legacy:     {t_old * 1000:.1f} ms")
+    print(f"vectorized: {t_new * 1000:.1f} ms")
+    print(f"speedup:    {t_old / t_new:.1f}x")
@@ -0,0 +1,60 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import itertools
+import random
+import string
+
+import pytest
+
+from graphrag.entity_resolution_blocking import candidate_pairs, is_similarity
+
+
+def all_pairs(names, probes):
+    return [(a, b) for a, b in itertools.combinations(names, 2) if (a in probes or b in probes) and is_similarity(a, b)]
+
+
+def random_names(seed, n=400):
+    rnd = random.Random(seed)
+    cjk = [chr(c) for c in range(0x4E00, 0x4E00 + 30)]
+    names = set()
+    while len(names) < n:
+        kind = rnd.random()
+        if kind < 0.4:
+            names.add("".join(rnd.choices("abcdeXYZ", k=rnd.randint(1, 9))))
+        elif kind < 0.6:
+            names.add("".join(rnd.choices("ab1 2", k=rnd.randint(2, 6))))
+        elif kind < 0.9:
+            names.add("".join(rnd.choices(cjk, k=rnd.randint(1, 6))))
+        else:
+            names.add("".join(rnd.choices(string.ascii_letters + "中文-", k=rnd.randint(2, 8))))
+    return sorted(names)
+
+
+class TestCandidatePairs:
+
+    @pytest.mark.parametrize("seed", range(4))
+    def test_same_pairs_as_all_pairs_scan(self, seed):
+        names = random_names(seed)
+        probes = set(random.Random(seed).sample(names, 60))
+        assert candidate_pairs(names, probes, workers=0) == all_pairs(names, probes)
+
+    def test_only_pairs_touching_probes(self):
+        names = ["ALICE", "ALICES", "BOB", "BOBS"]
+        assert candidate_pairs(names, {"ALICE"}) == [("ALICE", "ALICES")]
+
+    def test_digits_keep_entities_apart(self):
+        assert candidate_pairs(["Model 1", "Model 2"], {"Model 1"}) == []
@@ -0,0 +1,105 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import math
+import random
+from collections import defaultdict
+
+import numpy as np
+
+from rag.nlp.batch_rerank import (
+    TermOverlap,
+    cosine_similarities,
+    decode_vector,
+    decode_vectors,
+    hybrid_scores,
+)
+
+
+def dict_similarity(qtwt, tks):
+    """The per-candidate dict based score the engine replaces."""
+    dtwt = set(tks)
+    s = 1e-9
+    for k, v in qtwt.items():
+        if k in dtwt:
+            s += v
+    q = 1e-9
+    for v in qtwt.values():
+        q += v
+    return s / q
+
+
+class TestTermOverlap:
+
+    def test_matches_dict_similarity(self):
+        rng = random.Random(7)
+        vocab = [f"t{i}" for i in range(200)]
+        query = [(t, rng.random()) for t in rng.sample(vocab, 10)] + [("t1", 0.5), ("t1", 0.25)]
+        qd = defaultdict(float)
+        for t, w in query:
+            qd[t] += w
+        candidates = [rng.sample(vocab, 30) for _ in range(100)] + [[]]
+
+        scores = TermOverlap(query).scores(candidates)
+        expected = [dict_similarity(qd, c) for c in candidates]
+        assert np.allclose(scores, expected, rtol=0, atol=1e-12)
+
+    def test_duplicate_candidate_terms_count_once(self):
+        overlap = TermOverlap([("a", 0.5), ("b", 0.5)])
+        assert np.allclose(overlap.scores([["a", "a", "a"]]), overlap.scores([["a"]]))
+
+    def test_string_candidates_are_split(self):
+        overlap = TermOverlap([("a", 0.5), ("b", 0.5)])
+        assert np.allclose(overlap.scores(["a b c"]), [1.0])
+
+    def test_empty_query_scores_one(self):
+        assert np.allclose(TermOverlap([]).scores([["a"], []]), [1.0, 1.0])
+
+
+class TestVectors:
+
+    def test_decode_tab_separated(self):
+        assert np.allclose(decode_vector("0.5\t-1\t2", 3), [0.5, -1.0, 2.0])
+
+    def test_decode_malformed_falls_back(self):
+        v = decode_vector("1\tbad\t3", 3)
+        assert v[0] == 1.0 and v[1] == -math.inf and v[2] == 3.0
+
+    def test_decode_missing_vectors_are_zero(self):
+        fields = {"a": {"v": [1.0, 2.0]}, "b": {}, "c": {"v": "3\t4"}}
+        mat = decode_vectors(fields, ["a", "b", "c"], "v", 2)
+        assert mat.dtype == np.float32
+        assert np.allclose(mat, [[1, 2], [0, 0], [3, 4]])
+
+    def test_cosine_similarity(self):
+        mat = np.array([[1, 0], [0, 2], [0, 0], [-3, 0]], dtype=np.float32)
+        assert np.allclose(cosine_similarities([1.0, 0.0], mat), [1.0, 0.0, 0.0, -1.0])
+
+
+class TestHybridScores:
+
+    def test_weighted_sum(self):
+        mat = np.array([[1, 0], [0, 1]], dtype=np.float32)
+        tksim = np.array([0.2, 0.8])
+        sim, tk, vt = hybrid_scores([1.0, 0.0], mat, tksim, 0.3, 0.7)
+        assert np.allclose(sim, [0.7 + 0.06, 0.24])
+        assert np.allclose(vt, [1.0, 0.0])
+
+    def test_falls_back_to_term_similarity(self):
+        mat = np.zeros((2, 2), dtype=np.float32)
+        tksim = np.array([0.2, 0.8])
+        sim, _, _ = hybrid_scores([1.0, 0.0], mat, tksim, 0.3, 0.7)
+        assert np.allclose(sim, tksim)
@@ -0,0 +1,90 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import warnings
+from types import SimpleNamespace
+
+import pytest
+
+from common.constants import LLMType
+
+with warnings.catch_warnings():
+    # Third-party SDKs imported by the model clients warn at import time.
+    warnings.simplefilter("ignore")
+    from api.db.services import tenant_llm_service as tls
+    from api.db.services.tenant_llm_service import TenantLLMService, TokenUsageBuffer
+
+
+@pytest.fixture
+def tenant(monkeypatch):
+    tenant = SimpleNamespace(llm_id="chat-a", embd_id="embd-a", asr_id="asr-a", img2txt_id="cv-a", rerank_id="", tts_id="")
+    monkeypatch.setattr(tls.TenantService, "get_by_id", classmethod(lambda cls, tid: (tid == "t1", tenant)))
+    return tenant
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    buf = TokenUsageBuffer(3600)
+    monkeypatch.setattr(tls, "token_usage_buffer", buf)
+    monkeypatch.setattr(tls, "TOKEN_USAGE_FLUSH_INTERVAL", 3600)
+    buf.applied = []
+
+    def apply(cls, deltas):
+        buf.applied.append(dict(deltas))
+        return {}
+
+    monkeypatch.setattr(TenantLLMService, "apply_usage_deltas", classmethod(apply))
+    yield buf
+    buf.flush()
+
+
+class TestTokenUsageBuffer:
+
+    def test_usage_is_buffered_until_flush(self, tenant, buffer):
+        assert TenantLLMService.increase_usage("t1", LLMType.CHAT.value, 10)
+        assert TenantLLMService.increase_usage("t1", LLMType.CHAT.value, 5)
+        assert buffer.applied == [] and buffer.pending() == 15
+
+        buffer.flush()
+        assert buffer.applied == [{("t1", "chat-a"): 15}]
+        assert buffer.pending() == 0
+
+    def test_usage_is_charged_to_the_model_of_the_call(self, tenant, buffer):
+        TenantLLMService.increase_usage("t1", LLMType.CHAT.value, 10)
+        TenantLLMService.increase_usage("t1", LLMType.CHAT.value, 7, "chat-b")
+        TenantLLMService.increase_usage("t1", LLMType.EMBEDDING.value, 3)
+        # A default changed before the flush does not move usage recorded earlier.
+        tenant.llm_id = "chat-c"
+        TenantLLMService.increase_usage("t1", LLMType.CHAT.value, 1)
+
+        buffer.flush()
+        assert buffer.applied == [{("t1", "chat-a"): 10, ("t1", "chat-b"): 7, ("t1", "embd-a"): 3, ("t1", "chat-c"): 1}]
+
+    def test_unattributable_usage_is_rejected(self, tenant, buffer):
+        assert not TenantLLMService.increase_usage("unknown", LLMType.CHAT.value, 10)
+        assert not TenantLLMService.increase_usage("t1", LLMType.OCR.value, 10)
+        assert buffer.pending() == 0
+
+    def test_failed_flush_is_retried(self, tenant, buffer, monkeypatch):
+        TenantLLMService.increase_usage("t1", LLMType.CHAT.value, 10)
+        monkeypatch.setattr(TenantLLMService, "apply_usage_deltas", classmethod(lambda cls, deltas: dict(deltas)))
+        buffer.flush()
+        assert buffer.pending() == 10
+
+        monkeypatch.setattr(TenantLLMService, "apply_usage_deltas", classmethod(lambda cls, deltas: buffer.applied.append(dict(deltas)) or {}))
+        TenantLLMService.increase_usage("t1", LLMType.CHAT.value, 2)
+        buffer.flush()
+        assert buffer.applied == [{("t1", "chat-a"): 12}]
@@ -0,0 +1,88 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import numpy as np
+import pytest
+
+from rag.utils import embed_cache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.kv = {}
+        self.round_trips = 0
+
+    def mget_bytes(self, keys):
+        self.round_trips += 1
+        return [self.kv.get(k) for k in keys]
+
+    def mset_bytes(self, mapping, exp=3600):
+        self.round_trips += 1
+        self.kv.update(mapping)
+        return True
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(embed_cache, "REDIS_CONN", fake)
+    return fake
+
+
+class TestEmbedCache:
+
+    def test_pack_is_raw_float32(self):
+        v = np.arange(4, dtype=np.float64)
+        raw = embed_cache.pack_embedding(v)
+        assert len(raw) == 4 * 4
+        assert np.array_equal(embed_cache.unpack_embedding(raw), v.astype(np.float32))
+
+    def test_float16(self, monkeypatch):
+        monkeypatch.setattr(embed_cache, "EMBEDDING_CACHE_DTYPE", "float16")
+        v = np.array([0.5, -1.25, 3.0])
+        raw = embed_cache.pack_embedding(v)
+        assert len(raw) == 3 * 2
+        assert np.allclose(embed_cache.unpack_embedding(raw), v)
+        assert embed_cache.unpack_embedding(raw).dtype == np.float32
+
+    def test_dtype_is_part_of_key(self, monkeypatch):
+        k32 = embed_cache.embed_cache_key("m", "t")
+        monkeypatch.setattr(embed_cache, "EMBEDDING_CACHE_DTYPE", "float16")
+        assert embed_cache.embed_cache_key("m", "t") != k32
+
+    def test_batch_roundtrip(self, redis):
+        txts = ["a", "b", "c"]
+        vecs = np.random.default_rng(0).standard_normal((3, 8))
+        assert embed_cache.mget_embed_cache("m", txts) == [None, None, None]
+        embed_cache.mset_embed_cache("m", txts[:2], vecs[:2])
+        got = embed_cache.mget_embed_cache("m", txts)
+        assert np.allclose(got[0], vecs[0], atol=1e-6)
+        assert np.allclose(got[1], vecs[1], atol=1e-6)
+        assert got[2] is None
+        assert redis.round_trips == 3
+
+    def test_model_is_part_of_key(self, redis):
+        embed_cache.set_embed_cache("m1", "a", np.ones(4))
+        assert embed_cache.get_embed_cache("m2", "a") is None
+        assert np.allclose(embed_cache.get_embed_cache("m1", "a"), np.ones(4))
+
+    def test_unreachable_redis(self, monkeypatch):
+        class Down(FakeRedis):
+            def mget_bytes(self, keys):
+                return None
+
+        monkeypatch.setattr(embed_cache, "REDIS_CONN", Down())
+        assert embed_cache.mget_embed_cache("m", ["a", "b"]) == [None, None]
@@ -0,0 +1,119 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import asyncio
+
+import numpy as np
+
+from rag.utils.embedding_batcher import EmbeddingBatcher
+
+
+class FakeModel:
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        if self.fail:
+            raise RuntimeError("provider down")
+        return np.array([[float(len(t)), 1.0] for t in texts]), 10 * len(texts)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestEmbeddingBatcher:
+
+    def test_concurrent_callers_share_a_batch(self):
+        mdl = FakeModel()
+
+        async def go():
+            batcher = EmbeddingBatcher(mdl.encode, batch_size=4, max_wait=0.05)
+            res = await asyncio.gather(batcher.encode(["a", "bb"]), batcher.encode(["ccc", "dddd"]))
+            return batcher, res
+
+        batcher, ((v1, c1), (v2, c2)) = run(go())
+        assert mdl.calls == [["a", "bb", "ccc", "dddd"]]
+        assert v1[:, 0].tolist() == [1, 2] and v2[:, 0].tolist() == [3, 4]
+        assert c1 + c2 == 40
+        assert batcher.stats()["batch_fill"] == 1
+
+    def test_partial_batch_is_sent_after_max_wait(self):
+        mdl = FakeModel()
+
+        async def go():
+            batcher = EmbeddingBatcher(mdl.encode, batch_size=16, max_wait=0.01)
+            return await batcher.encode(["a", "b", "c"])
+
+        vects, _ = run(go())
+        assert len(vects) == 3
+        assert mdl.calls == [["a", "b", "c"]]
+
+    def test_identical_texts_are_embedded_once(self):
+        mdl = FakeModel()
+
+        async def go():
+            batcher = EmbeddingBatcher(mdl.encode, batch_size=8, max_wait=0.01)
+            res = await asyncio.gather(batcher.encode(["x", "y"]), batcher.encode(["x", "x"]))
+            return batcher, res
+
+        batcher, ((v1, c1), (v2, c2)) = run(go())
+        assert mdl.calls == [["x", "y"]]
+        assert np.array_equal(v2[0], v1[0]) and np.array_equal(v2[1], v1[0])
+        assert c1 + c2 == 20
+        assert batcher.stats()["deduped"] == 2
+
+    def test_large_request_is_split(self):
+        mdl = FakeModel()
+
+        async def go():
+            batcher = EmbeddingBatcher(mdl.encode, batch_size=2, max_wait=0.01)
+            return await batcher.encode(["a", "b", "c", "d", "e"])
+
+        vects, _ = run(go())
+        assert len(vects) == 5
+        assert [len(c) for c in mdl.calls] == [2, 2, 1]
+
+    def test_errors_reach_every_caller(self):
+        mdl = FakeModel(fail=True)
+
+        async def go():
+            batcher = EmbeddingBatcher(mdl.encode, batch_size=4, max_wait=0.01)
+            return await asyncio.gather(batcher.encode(["a"]), batcher.encode(["b"]), return_exceptions=True)
+
+        res = run(go())
+        assert all(isinstance(r, RuntimeError) for r in res)
+
+    def test_cancelled_caller_does_not_cancel_shared_texts(self):
+        mdl = FakeModel()
+
+        async def go():
+            batcher = EmbeddingBatcher(mdl.encode, batch_size=8, max_wait=0.05)
+            first = asyncio.create_task(batcher.encode(["x", "y"]))
+            second = asyncio.create_task(batcher.encode(["x", "z"]))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        vects, _ = run(go())
+        assert vects[:, 0].tolist() == [1, 1]
+        assert mdl.calls == [["x", "y", "z"]]
+
+    def test_empty_input(self):
+        vects, c = run(EmbeddingBatcher(FakeModel().encode, batch_size=4).encode([]))
+        assert len(vects) == 0 and c == 0
@@ -0,0 +1,119 @@
+#
+#  Copyright 2025 The InfiniFlow Authors. All Rights Reserved.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+#
+
+import pytest
+
+from rag.utils import retrieval_cache as rc
+
+
+class FakeRedis:
+    """In-memory stand-in for the few RedisDB calls the cache makes."""
+
+    def __init__(self):
+        self.kv = {}
+
+    def is_alive(self):
+        return True
+
+    def mget(self, keys):
+        return [self.kv.get(k) for k in keys]
+
+    def get(self, k):
+        return self.kv.get(k)
+
+    def set(self, k, v, exp=3600):
+        self.kv[k] = v
+        return True
+
+    @property
+    def REDIS(self):
+        return self
+
+    def pipeline(self, transaction=False):
+        return self
+
+    def incr(self, k):
+        self.kv[k] = str(int(self.kv.get(k) or 0) + 1)
+
+    def execute(self):
+        pass
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(rc, "REDIS_CONN", fake)
+    return fake
+
+
+def ranks(n):
+    return {"total": n, "chunks": [{"chunk_id": str(i)} for i in range(n)], "doc_aggs": []}
+
+
+class TestRetrievalCache:
+
+    def test_roundtrip_and_counters(self, redis):
+        cache = rc.RetrievalCache(capacity=4, ttl=60)
+        key = cache.key("what is  ragflow ", ["t"], ["kb1"], page=1)
+        assert cache.get(key) is None
+        cache.set(key, ranks(2))
+        assert cache.get(cache.key("what is ragflow", ["t"], ["kb1"], page=1)) == ranks(2)
+        stats = cache.stats()
+        assert stats["misses"] == 1 and stats["local_hits"] == 1
+
+    def test_results_are_independent_copies(self, redis):
+        cache = rc.RetrievalCache(capacity=4, ttl=60)
+        key = cache.key("q", ["t"], ["kb1"])
+        cache.set(key, ranks(1))
+        cache.get(key)["chunks"].clear()
+        assert cache.get(key) == ranks(1)
+
+    def test_parameters_are_part_of_key(self, redis):
+        cache = rc.RetrievalCache(capacity=4, ttl=60)
+        assert cache.key("q", ["t"], ["kb1"], page=1) != cache.key("q", ["t"], ["kb1"], page=2)
+        assert cache.key("q", ["t"], ["kb1", "kb2"]) == cache.key("q", ["t"], ["kb2", "kb1"])
+
+    def test_generation_bump_invalidates(self, redis):
+        cache = rc.RetrievalCache(capacity=4, ttl=60)
+        key = cache.key("q", ["t"], ["kb1", "kb2"])
+        cache.set(key, ranks(1))
+        rc.bump_index_generation("kb2")
+        new_key = cache.key("q", ["t"], ["kb1", "kb2"])
+        assert new_key != key
+        assert cache.get(new_key) is None
+
+    def test_redis_tier_is_shared(self, redis):
+        writer = rc.RetrievalCache(capacity=4, ttl=60)
+        reader = rc.RetrievalCache(capacity=4, ttl=60)
+        writer.set(writer.key("q", ["t"], ["kb1"]), ranks(3))
+        assert reader.get(reader.key("q", ["t"], ["kb1"])) == ranks(3)
+        assert reader.stats()["redis_hits"] == 1
+
+    def test_lru_eviction(self, redis):
+        cache = rc.RetrievalCache(capacity=2, ttl=60)
+        for q in ["a", "b", "c"]:
+            cache._put_local(q, "{}")
+        assert list(cache._lru.keys()) == ["b", "c"]
+
+    def test_bypass_without_redis(self, monkeypatch):
+        class Dead(FakeRedis):
+            def is_alive(self):
+                return False
+
+        monkeypatch.setattr(rc, "REDIS_CONN", Dead())
+        cache = rc.RetrievalCache(capacity=4, ttl=60)
+        assert cache.key("q", ["t"], ["kb1"]) is None
+        assert cache.stats()["bypasses"] == 1